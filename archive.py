@@ -0,0 +1,230 @@
+"""节点历史归档 (SQLite)
+
+public/ 下每天写出的 dataN-YYYYMMDD.json 增量导入 .cache/archive.sqlite3:
+- nodes      每个节点指纹一行: 首次/最后出现日期、出现天数, 按 server 建索引
+- sightings  只追加的出现记录 (指纹, 日期, 快照), 按日期建索引
+- snapshots  已导入的文件及其大小/mtime, 未变化的文件不会重复导入
+
+"某个服务器何时首次出现"、"存活了多少天" 都只查 nodes 表, 不需要再读历史 JSON。
+
+    python archive.py ingest [--dir public]
+    python archive.py server 1.2.3.4
+    python archive.py node <指纹>
+    python archive.py stats
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+from pathlib import Path
+
+from breaker import CACHE_DIR
+from pipeline import OUTPUT_DIR, fingerprint
+from serialization import read_json
+
+ARCHIVE_FILE = Path(os.environ.get("GETIP_ARCHIVE", CACHE_DIR / "archive.sqlite3"))
+
+SNAPSHOT_FILE_RE = re.compile(r'^(data\d*)-(\d{4})(\d{2})(\d{2})\.json$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    fingerprint TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    server TEXT NOT NULL,
+    port INTEGER,
+    name TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    days INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS nodes_server ON nodes(server);
+CREATE INDEX IF NOT EXISTS nodes_first_seen ON nodes(first_seen);
+
+CREATE TABLE IF NOT EXISTS sightings (
+    fingerprint TEXT NOT NULL,
+    day TEXT NOT NULL,
+    snapshot TEXT NOT NULL,
+    PRIMARY KEY (fingerprint, day, snapshot)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sightings_day ON sightings(day);
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    file TEXT PRIMARY KEY,
+    snapshot TEXT NOT NULL,
+    day TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    nodes INTEGER NOT NULL
+);
+"""
+
+NODE_COLUMNS = "fingerprint, type, server, port, name, first_seen, last_seen, days"
+
+
+class Archive:
+    def __init__(self, path=ARCHIVE_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA cache_size=-32768")  # 32 MiB, 整年导入时索引页常驻内存
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS batch ("
+            "fingerprint TEXT PRIMARY KEY, type TEXT, server TEXT, port INTEGER, name TEXT)"
+        )
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def ingest_items(self, day, snapshot, items):
+        """导入一天的一份快照 (day 为 YYYY-MM-DD), 返回导入的节点数"""
+        with self.conn:
+            return self._ingest(day, snapshot, items)
+
+    def _ingest(self, day, snapshot, items):
+        rows = {}
+        for item in items:
+            if isinstance(item, dict) and item.get('server'):
+                rows.setdefault(fingerprint(item), (
+                    item.get('type', ''), item['server'], item.get('port'), item.get('name')))
+        params = {"day": day, "snapshot": snapshot}
+        self.conn.execute("DELETE FROM batch")
+        self.conn.executemany(
+            "INSERT INTO batch VALUES (?, ?, ?, ?, ?)",
+            ((fp, *row) for fp, row in rows.items()),
+        )
+        self.conn.execute(
+            f"INSERT INTO nodes ({NODE_COLUMNS}) "
+            "SELECT fingerprint, type, server, port, name, :day, :day, 0 FROM batch WHERE true "
+            "ON CONFLICT(fingerprint) DO UPDATE SET "
+            "name = CASE WHEN excluded.last_seen >= nodes.last_seen THEN excluded.name ELSE nodes.name END, "
+            "first_seen = min(nodes.first_seen, excluded.first_seen), "
+            "last_seen = max(nodes.last_seen, excluded.last_seen)",
+            params,
+        )
+        # 同一天出现在多份快照里只算一天
+        self.conn.execute(
+            "UPDATE nodes SET days = days + 1 WHERE fingerprint IN ("
+            "SELECT fingerprint FROM batch b WHERE NOT EXISTS ("
+            "SELECT 1 FROM sightings s WHERE s.fingerprint = b.fingerprint AND s.day = :day))",
+            params,
+        )
+        self.conn.execute(
+            "INSERT OR IGNORE INTO sightings SELECT fingerprint, :day, :snapshot FROM batch",
+            params,
+        )
+        self.conn.execute("DELETE FROM batch")
+        return len(rows)
+
+    def ingest_directory(self, directory=OUTPUT_DIR):
+        """导入目录中新增或有变化的快照文件, 返回 {文件名: 节点数}"""
+        known = {row["file"]: (row["size"], row["mtime_ns"])
+                 for row in self.conn.execute("SELECT file, size, mtime_ns FROM snapshots")}
+        ingested = {}
+        with self.conn:  # 整批只提交一次
+            for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+                match = SNAPSHOT_FILE_RE.match(entry.name)
+                if not match:
+                    continue
+                stat = entry.stat()
+                if known.get(entry.name) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                snapshot, year, month, day = match.groups()
+                try:
+                    items = read_json(entry.path)
+                except (OSError, ValueError) as e:
+                    print(f"跳过无法读取的快照 {entry.name}: {e}")
+                    continue
+                day = f"{year}-{month}-{day}"
+                count = self._ingest(day, snapshot, items if isinstance(items, list) else [])
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?)",
+                    (entry.name, snapshot, day, stat.st_size, stat.st_mtime_ns, count),
+                )
+                ingested[entry.name] = count
+        return ingested
+
+    def server_history(self, server):
+        """某个服务器上出现过的所有节点, 按首次出现排序"""
+        return self.conn.execute(
+            f"SELECT {NODE_COLUMNS} FROM nodes WHERE server = ? ORDER BY first_seen", (server,)
+        ).fetchall()
+
+    def node(self, fp):
+        return self.conn.execute(f"SELECT {NODE_COLUMNS} FROM nodes WHERE fingerprint = ?", (fp,)).fetchone()
+
+    def node_days(self, fp):
+        """节点出现过的日期列表"""
+        return [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT day FROM sightings WHERE fingerprint = ? ORDER BY day", (fp,))]
+
+    def day_counts(self, day):
+        """返回 (当天出现的节点数, 当天首次出现的节点数)"""
+        seen = self.conn.execute(
+            "SELECT COUNT(DISTINCT fingerprint) FROM sightings WHERE day = ?", (day,)).fetchone()[0]
+        new = self.conn.execute("SELECT COUNT(*) FROM nodes WHERE first_seen = ?", (day,)).fetchone()[0]
+        return seen, new
+
+    def survival(self):
+        """存活天数分布: [(天数, 节点数)]"""
+        return [tuple(row) for row in self.conn.execute(
+            "SELECT days, COUNT(*) FROM nodes GROUP BY days ORDER BY days")]
+
+
+def _print_nodes(rows):
+    for row in rows:
+        print(f"{row['fingerprint']}  {row['type']:<7} {row['server']}:{row['port']}  "
+              f"{row['first_seen']} ~ {row['last_seen']}  {row['days']} 天  {row['name']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="节点历史归档")
+    parser.add_argument("--db", default=str(ARCHIVE_FILE), help="归档数据库路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = sub.add_parser("ingest", help="增量导入 data*-YYYYMMDD.json")
+    ingest_parser.add_argument("--dir", default=OUTPUT_DIR)
+    server_parser = sub.add_parser("server", help="查询某个服务器的历史节点")
+    server_parser.add_argument("server")
+    node_parser = sub.add_parser("node", help="查询单个节点的出现日期")
+    node_parser.add_argument("fingerprint")
+    sub.add_parser("stats", help="存活天数分布")
+    args = parser.parse_args(argv)
+
+    with Archive(args.db) as archive:
+        if args.command == "ingest":
+            ingested = archive.ingest_directory(args.dir)
+            for name, count in ingested.items():
+                print(f"已导入 {name}: {count} 个节点")
+            print(f"共导入 {len(ingested)} 份快照")
+        elif args.command == "server":
+            rows = archive.server_history(args.server)
+            if not rows:
+                print(f"归档中没有服务器 {args.server}")
+                return 1
+            _print_nodes(rows)
+        elif args.command == "node":
+            row = archive.node(args.fingerprint)
+            if row is None:
+                print(f"归档中没有节点 {args.fingerprint}")
+                return 1
+            _print_nodes([row])
+            print("出现日期: " + ", ".join(archive.node_days(args.fingerprint)))
+        else:
+            for days, count in archive.survival():
+                print(f"{days:>4} 天: {count} 个节点")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
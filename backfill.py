@@ -0,0 +1,171 @@
+"""多日回填: 抓取每个来源最近 N 篇文章中的节点 (getip run --backfill N)
+
+普通运行只取最新一篇文章, 但前几天文章中的节点往往仍然可用。回填模式先并发访问各来源主页列出最近的
+文章, 再把所有文章的抓取一起提交到线程池 (同一主机的请求节奏仍由共享限速器控制):
+- 最新一篇与普通运行相同, 在熔断器保护下抓取
+- 更早的文章已在文章索引中时直接复用索引里的节点, 不再请求; 否则抓取并写入索引
+- 来源熔断器未闭合时不抓取旧文章, 只用索引中已有的部分
+- 不支持列出文章 (SourceSpec.articles 为空) 或列出失败的来源退回普通抓取
+
+文章索引保存在 .cache/articles.json, 每个来源只保留最近 N 篇; 抓取失败或没有节点的文章不记录,
+下次运行重试。合并后的节点新文章在前, 交给 publish 按常规去重, 同一节点保留最新文章中的版本。
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from breaker import CACHE_DIR, CLOSED, atomic_write_json
+from budget import use_budget, submit as budget_submit
+from checkpoint import remembered
+from pipeline import fetch_source, today_suffix
+from profiling import stage
+from sources import article_date
+
+ARTICLE_INDEX_FILE = CACHE_DIR / "articles.json"
+MAX_ARTICLE_WORKERS = 8
+
+
+class ArticleIndex:
+    """已处理文章的持久化索引 {来源: {文章URL: {"fetched_at": 时间戳, "items": 节点列表}}}"""
+
+    def __init__(self, path=ARTICLE_INDEX_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self.data = json.loads(path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            self.data = {}
+        except (OSError, ValueError) as e:
+            print(f"文章索引损坏, 已忽略: {e}")
+            self.data = {}
+
+    def get(self, source, url):
+        entry = self.data.get(source, {}).get(url)
+        return entry["items"] if entry else None
+
+    def record(self, source, url, items):
+        with self._lock:
+            self.data.setdefault(source, {})[url] = {"fetched_at": time.time(), "items": items}
+
+    def retain(self, source, urls):
+        """只保留该来源的指定文章, 其余条目删除"""
+        with self._lock:
+            entries = self.data.get(source, {})
+            self.data[source] = {url: entries[url] for url in urls if url in entries}
+
+    def save(self):
+        with self._lock:
+            atomic_write_json(self.path, self.data)
+
+
+def _date_suffix(url, default):
+    """节点名后缀使用文章自身的日期, URL 中没有日期时用当天"""
+    published = article_date(url)
+    return published.strftime("%m-%d") if published else default
+
+
+def _list_articles(spec, session, depth):
+    try:
+        return remembered("articles", f"{spec.name} {depth}", lambda: spec.load("articles")(session, depth), keep=bool)
+    except Exception as e:
+        print(f"[{spec.name}] 列出文章失败, 退回普通抓取: {e}")
+        return []
+
+
+def _fetch_article(spec, session, date_suffix, url, fetch=None):
+    """抓取一篇旧文章, 不经过熔断器 (不影响来源的失败计数与上次成功缓存)"""
+    fetch = fetch or spec.load("fetch")
+    with stage("fetch"):
+        try:
+            return remembered("source", f"{spec.name} {url}", lambda: fetch(session, date_suffix, article_url=url),
+                              keep=bool)
+        except Exception as e:
+            print(f"[{spec.name}] 抓取旧文章失败: {url}, 错误: {e}")
+            return []
+
+
+def collect_backfill(specs, session, breakers, run_budget, depth, index=None, coordinator=None):
+    """并发抓取每个来源最近 depth 篇文章, 返回 {来源名: 节点列表} (新文章在前)
+
+    coordinator 为 workqueue.Coordinator 时文章的抓取由队列上的 worker 执行, 列出文章仍在本进程。
+    """
+    index = index if index is not None else ArticleIndex()
+    date_suffix = today_suffix()
+    budgets = {spec.name: run_budget.child(spec.name) for spec in specs}
+
+    # 第一步: 并发列出各来源最近的文章
+    listable = [spec for spec in specs if spec.articles]
+    listings = {}
+    if listable:
+        executor = ThreadPoolExecutor(max_workers=len(listable))
+        futures = {}
+        for spec in listable:
+            with use_budget(budgets[spec.name]):
+                futures[spec.name] = budget_submit(executor, _list_articles, spec, session, depth)
+        wait(futures.values(), timeout=run_budget.remaining())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for name, future in futures.items():
+            if future.done() and not future.cancelled():
+                listings[name] = future.result()
+
+    # 第二步: 所有文章一起抓取, 已在索引中的旧文章直接复用
+    executor = ThreadPoolExecutor(max_workers=MAX_ARTICLE_WORKERS)
+    tasks = {}   # 来源名 -> [(文章URL 或 None, future 或 已复用的节点列表)]
+    for spec in specs:
+        urls = listings.get(spec.name)
+        fetch = coordinator.fetcher(spec) if coordinator is not None else None
+        with use_budget(budgets[spec.name]):
+            if not urls:
+                tasks[spec.name] = [(None, budget_submit(executor, fetch_source, spec, session, breakers, date_suffix,
+                                                         fetch=fetch))]
+                continue
+            newest, older = urls[0], urls[1:]
+            entries = [(newest, budget_submit(executor, fetch_source, spec, session, breakers,
+                                              _date_suffix(newest, date_suffix), newest, fetch=fetch))]
+            closed = breakers.get(spec.name).state == CLOSED
+            for url in older:
+                cached = index.get(spec.name, url)
+                if cached is not None:
+                    entries.append((url, cached))
+                elif closed:
+                    entries.append((url, budget_submit(executor, _fetch_article, spec, session,
+                                                       _date_suffix(url, date_suffix), url, fetch)))
+            tasks[spec.name] = entries
+            index.retain(spec.name, urls)
+    futures = [future for entries in tasks.values() for _, future in entries if not isinstance(future, list)]
+    done, not_done = wait(futures, timeout=run_budget.remaining())
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    results = {}
+    for spec in specs:
+        items, fetched, reused, abandoned = [], 0, 0, 0
+        for position, (url, future) in enumerate(tasks[spec.name]):
+            if isinstance(future, list):
+                items.extend(future)
+                reused += 1
+                continue
+            if future in not_done:
+                abandoned += 1
+                continue
+            if future.exception() is not None:
+                print(f"[{spec.name}] 抓取异常: {future.exception()}")
+                continue
+            article_items = future.result()
+            items.extend(article_items)
+            fetched += 1
+            # 最新一篇失败时 fetch_source 返回的是上次成功的缓存, 不能记到这篇文章名下
+            succeeded = position > 0 or breakers.get(spec.name).failures == 0
+            if url is not None and article_items and succeeded:
+                index.record(spec.name, url, article_items)
+        if abandoned:
+            print(f"[{spec.name}] 预算耗尽, 放弃 {abandoned} 篇文章")
+        if listings.get(spec.name):
+            print(f"[{spec.name}] 回填 {len(tasks[spec.name])} 篇文章: 抓取 {fetched} 篇, 复用索引 {reused} 篇")
+        results[spec.name] = items
+
+    try:
+        index.save()
+    except OSError as e:
+        print(f"保存文章索引失败: {e}")
+    return results
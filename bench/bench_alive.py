@@ -0,0 +1,93 @@
+"""订阅服务的存活过滤: 校验与建快照耗时
+
+data*.json 中的节点没有 alive 字段, 存活状态来自探测历史 (.cache/probes.json)。在合成节点上写一份临时的
+探测历史 (一部分最近探测成功、一部分最近探测失败、一部分只有过期的成功记录、其余没有记录), 检查:
+- /sub?alive=true 恰好返回最近探测成功的节点, alive=false 与 alive=unknown 同理
+- 探测历史更新后 NodeStore.update 建出的新快照使用新的历史
+并比较有无探测历史时建快照的耗时:
+
+    python bench/bench_alive.py
+    python bench/bench_alive.py --count 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from loadgen import synthetic_nodes  # noqa: E402
+from pipeline import fingerprint  # noqa: E402
+from ranking import ALIVE_MAX_AGE, ProbeHistory  # noqa: E402
+from server import NodeSnapshot, NodeStore, SubscriptionApp  # noqa: E402
+
+
+def query(app, query_string):
+    status, _, body = app.handle("GET", "/sub", query_string, {})
+    if status != 200:
+        raise RuntimeError(f"/sub?{query_string} 返回 {status}")
+    return {item["server"] for item in json.loads(body)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="存活过滤校验与基准")
+    parser.add_argument("--count", type=int, default=20000, help="节点数")
+    args = parser.parse_args(argv)
+
+    nodes = synthetic_nodes(args.count)
+    quarter = len(nodes) // 4
+    alive, dead, stale = nodes[:quarter], nodes[quarter:2 * quarter], nodes[2 * quarter:3 * quarter]
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        history = ProbeHistory(Path(tmp) / "probes.json")
+        for item in alive:
+            history.record(fingerprint(item), 120.0)
+        for item in dead:
+            history.record(fingerprint(item), None)
+        for item in stale:
+            history.record(fingerprint(item), 120.0)
+            history.data[fingerprint(item)][3] -= ALIVE_MAX_AGE + 60
+        history.save()
+
+        store = NodeStore(nodes, load_history=lambda: ProbeHistory(history.path))
+        app = SubscriptionApp(store)
+        expected = {
+            "true": {item["server"] for item in alive},
+            "false": {item["server"] for item in dead},
+            "unknown": {item["server"] for item in nodes[2 * quarter:]},
+        }
+        for value, servers in expected.items():
+            got = query(app, f"alive={value}&format=json")
+            if got != servers:
+                failed = True
+                print(f"alive={value}: 返回 {len(got)} 个节点, 应为 {len(servers)} 个")
+            else:
+                print(f"alive={value}: {len(got)} 个节点")
+
+        # 之前失败的节点重新探测成功后, 新快照里应变为存活
+        for item in dead:
+            for _ in range(3):
+                history.record(fingerprint(item), 150.0)
+        history.save()
+        store.update(nodes)
+        got = query(app, "alive=true&format=json")
+        if got != expected["true"] | expected["false"]:
+            failed = True
+            print(f"探测历史更新后 alive=true 返回 {len(got)} 个节点, 应为 {2 * quarter} 个")
+        else:
+            print(f"探测历史更新后 alive=true: {len(got)} 个节点")
+
+        loaded = ProbeHistory(history.path)
+        for label, snapshot_history in (("无探测历史", None), ("有探测历史", loaded)):
+            started = time.perf_counter()
+            NodeSnapshot(nodes, 0, snapshot_history)
+            print(f"建快照 ({label}): {(time.perf_counter() - started) * 1000:.1f} ms")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""历史归档基准
+
+在临时目录生成一年的每日快照 (data5/data6 各一份, 节点有随机的存活期), 测量全量导入、
+再次导入 (应全部跳过) 以及历史查询的耗时:
+
+    python bench/bench_archive.py
+    python bench/bench_archive.py --days 365 --per-day 3000
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from archive import Archive  # noqa: E402
+from pipeline import fingerprint  # noqa: E402
+from serialization import write_json  # noqa: E402
+
+
+def write_snapshots(directory, days, per_day, seed=0):
+    """生成 days 天的快照文件, 每天约 per_day 个节点, 返回所有节点"""
+    rng = random.Random(seed)
+    start = datetime.date.today() - datetime.timedelta(days=days)
+    alive = []
+    all_nodes = []
+    next_id = 0
+    for offset in range(days):
+        # 每天淘汰一部分节点, 再补充新节点到 per_day
+        alive = [node for node in alive if rng.random() > 0.15]
+        while len(alive) < per_day:
+            node = {
+                "type": rng.choice(["vless", "trojan", "ss", "vmess"]),
+                "server": f"{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.{next_id % 256}",
+                "port": rng.choice([443, 8443, 2053, 80]),
+                "name": f"节点 {next_id}",
+                "uuid": f"{next_id:032x}",
+            }
+            next_id += 1
+            alive.append(node)
+            all_nodes.append(node)
+        day = (start + datetime.timedelta(days=offset)).strftime("%Y%m%d")
+        half = len(alive) // 2
+        write_json(os.path.join(directory, f"data5-{day}.json"), alive[:half + per_day // 10], indent=2)
+        write_json(os.path.join(directory, f"data6-{day}.json"), alive[half:])
+    return all_nodes
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="历史归档基准")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--per-day", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, "public")
+        os.makedirs(data_dir)
+        nodes = write_snapshots(data_dir, args.days, args.per_day)
+        print(f"已生成 {args.days} 天快照, 共 {len(nodes)} 个不同节点")
+
+        with Archive(os.path.join(tmp, "archive.sqlite3")) as archive:
+            ingested, elapsed = timed(archive.ingest_directory, data_dir)
+            print(f"全量导入 {len(ingested)} 份快照: {elapsed:.0f} ms")
+            ingested, elapsed = timed(archive.ingest_directory, data_dir)
+            print(f"再次导入 (无变化, 导入 {len(ingested)} 份): {elapsed:.1f} ms")
+
+            rng = random.Random(1)
+            samples = rng.sample(nodes, min(args.queries, len(nodes)))
+            _, elapsed = timed(lambda: [archive.server_history(node["server"]) for node in samples])
+            print(f"按服务器查询历史: 平均 {elapsed / len(samples):.3f} ms/次")
+            _, elapsed = timed(lambda: [archive.node_days(fingerprint(node)) for node in samples])
+            print(f"按指纹查询出现日期: 平均 {elapsed / len(samples):.3f} ms/次")
+            day = (datetime.date.today() - datetime.timedelta(days=args.days // 2)).isoformat()
+            counts, elapsed = timed(archive.day_counts, day)
+            print(f"{day} 出现/新增: {counts}, {elapsed:.2f} ms")
+            distribution, elapsed = timed(archive.survival)
+            print(f"存活天数分布 ({len(distribution)} 档): {elapsed:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
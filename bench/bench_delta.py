@@ -0,0 +1,93 @@
+"""增量订阅的体积与正确性
+
+在合成节点上连续发布几个版本 (每个版本删除、新增、改名一小部分节点), 检查把增量应用到上一版本的节点表后
+与新版本的 full.json 完全一致, 并比较增量文件与完整 base64 订阅 (原始与 gzip 后) 的字节数。
+分两种场景: 名称不变; 逐日发布, 每个版本的节点名都换成当天的 "-MM-DD" 后缀 (与 sources.json 的 name_suffix 相同),
+后者的 changed 不能超过真正改名的节点数:
+
+    python bench/bench_delta.py
+    python bench/bench_delta.py --count 100000 --churn 0.05
+"""
+import argparse
+import datetime
+import gzip
+import os
+import random
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_links import synthetic_uris  # noqa: E402
+from delta import apply, delta_dir, publish_delta  # noqa: E402
+from pipeline import save_output_files  # noqa: E402
+from serialization import read_json  # noqa: E402
+from uriparse import parse_uri  # noqa: E402
+
+
+def publish_versions(items, spare, args, daily):
+    """连续发布 args.versions 个版本, 返回是否全部校验通过"""
+    rng = random.Random(0)
+    items, spare = [dict(item) for item in items], [dict(item) for item in spare]
+    step = max(1, int(len(items) * args.churn))
+    first_day = datetime.date(2026, 1, 1)
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = delta_dir("good5.txt", tmp)
+        previous = None
+        for number in range(args.versions):
+            published = items
+            if daily:
+                suffix = (first_day + datetime.timedelta(days=number)).strftime("-%m-%d")
+                published = [dict(item, name=item["name"] + suffix) for item in items]
+            unique = save_output_files(published, "good5.txt", tmp)
+            version = publish_delta("good5.txt", unique, tmp)
+            current = read_json(directory / "full.json")["nodes"]
+            if previous is not None:
+                delta_path = directory / f"{version}.json"
+                delta = read_json(delta_path)
+                if apply(dict(previous), delta) != current:
+                    ok = False
+                    print(f"版本 {version}: 应用增量后与 full.json 不一致")
+                if len(delta["changed"]) > step:
+                    ok = False
+                    print(f"版本 {version}: {len(delta['changed'])} 个节点记为 changed, 只改名了 {step} 个")
+                with open(os.path.join(tmp, "good5.txt"), 'rb') as f:
+                    full_bytes = f.read()
+                delta_bytes = delta_path.read_bytes()
+                print(f"版本 {version}: 新增 {len(delta['added'])}, 变化 {len(delta['changed'])}, "
+                      f"删除 {len(delta['removed'])}; 增量 {len(delta_bytes):,} B "
+                      f"(gzip {len(gzip.compress(delta_bytes)):,} B), "
+                      f"完整订阅 {len(full_bytes):,} B (gzip {len(gzip.compress(full_bytes)):,} B), "
+                      f"占 {len(delta_bytes) / len(full_bytes):.1%}")
+            previous = current
+
+            # 下一版本: 删除一部分、新增一部分、给一部分改名
+            rng.shuffle(items)
+            items = items[step:] + [spare.pop() for _ in range(min(step, len(spare)))]
+            for item in rng.sample(items, step):
+                item["name"] += " *"
+        print(f"增量目录: {', '.join(sorted(os.listdir(directory)))}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="增量订阅基准")
+    parser.add_argument("--count", type=int, default=20000, help="每个版本的节点数")
+    parser.add_argument("--churn", type=float, default=0.01, help="每个版本删除/新增/改名的比例 (各占一份)")
+    parser.add_argument("--versions", type=int, default=4, help="发布的版本数")
+    args = parser.parse_args(argv)
+
+    pool = [item for item in map(parse_uri, synthetic_uris(args.count * 2)) if item]
+    items, spare = pool[:args.count], pool[args.count:]
+    failed = False
+    for label, daily in (("名称不变", False), ("逐日发布, 名称带当天日期后缀", True)):
+        print(f"== {label} ==")
+        if not publish_versions(items, spare, args, daily):
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
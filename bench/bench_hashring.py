@@ -0,0 +1,106 @@
+"""个人订阅的一致性哈希: 重排比例、负载分布与渲染耗时
+
+在合成节点上 (健康度随机) 为 --tokens 个令牌各分配 --k 个节点:
+- 同样的输入重建哈希环后每个令牌的订阅不变
+- 新增一个节点、删除一个节点、改变 1% 节点的健康度后, 订阅发生变化的令牌比例
+  (增删一个节点的期望约为 K / 节点数, 健康度变化的影响与变化的虚拟点数成正比)
+- 全部节点的健康度小幅波动 (模拟每次运行的探测抖动) 时, 直接使用健康度与沿用上次权重 (stable_weights) 的重排比例
+- 各节点被分到的令牌数与健康度的关系, 以及负载最高的节点承担的令牌比例 (所有人用同一份订阅时为 100%)
+- 复用按节点编码一次的链接渲染全部订阅, 与每个令牌重新编码节点相比的耗时, 两者结果须逐字节相同:
+
+    python bench/bench_hashring.py
+    python bench/bench_hashring.py --count 20000 --tokens 20000 --k 30
+"""
+import argparse
+import base64
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_links import synthetic_uris  # noqa: E402
+from delta import node_links  # noqa: E402
+from hashring import HashRing, stable_weights  # noqa: E402
+from links import iter_links  # noqa: E402
+from pipeline import fingerprint  # noqa: E402
+from uriparse import parse_uri  # noqa: E402
+
+
+def changed_share(ring, other, tokens, k):
+    return sum(ring.lookup(token, k) != other.lookup(token, k) for token in tokens) / len(tokens)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="一致性哈希个人订阅基准")
+    parser.add_argument("--count", type=int, default=2000, help="节点数")
+    parser.add_argument("--tokens", type=int, default=5000, help="令牌数")
+    parser.add_argument("--k", type=int, default=20, help="每个令牌的节点数")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    pool = [item for item in map(parse_uri, synthetic_uris(args.count + 1)) if item]
+    items, spare = pool[:args.count], pool[args.count]
+    links = node_links(items)
+    by_key = {fingerprint(item): item for item in items}
+    weights = {key: rng.uniform(0.05, 1.0) for key in links}
+    tokens = [f"user{i:06d}" for i in range(args.tokens)]
+    failed = False
+
+    started = time.perf_counter()
+    ring = HashRing(weights)
+    print(f"{len(links)} 个节点, 环上 {len(ring._points)} 个虚拟点, 建环 {time.perf_counter() - started:.2f} s")
+    if changed_share(ring, HashRing(weights), tokens, args.k):
+        failed = True
+        print("同样的输入重建哈希环后订阅发生变化")
+
+    expected = args.k / len(links)
+    added = HashRing(dict(weights, **{fingerprint(spare): 0.5}))
+    removed = HashRing({key: weight for key, weight in weights.items() if key != next(iter(weights))})
+    reweighted = dict(weights)
+    for key in rng.sample(list(weights), max(1, len(weights) // 100)):
+        reweighted[key] = rng.uniform(0.05, 1.0)
+    for label, other in (("新增 1 个节点", added), ("删除 1 个节点", removed),
+                         ("1% 节点健康度变化", HashRing(reweighted))):
+        share = changed_share(ring, other, tokens, args.k)
+        print(f"{label}: {share:.2%} 的令牌订阅变化 (K / 节点数 = {expected:.2%})")
+    if changed_share(ring, added, tokens, args.k) > expected * 3:
+        failed = True
+    jittered = {key: min(1.0, max(0.05, weight + rng.uniform(-0.02, 0.02))) for key, weight in weights.items()}
+    raw = changed_share(ring, HashRing(jittered), tokens, args.k)
+    stable = changed_share(ring, HashRing(stable_weights(jittered, weights)), tokens, args.k)
+    print(f"全部节点健康度 ±0.02 波动: 直接使用健康度 {raw:.2%}, 沿用上次权重 {stable:.2%} 的令牌订阅变化")
+    if stable:
+        failed = True
+
+    load = Counter(key for token in tokens for key in ring.lookup(token, args.k))
+    first = Counter(ring.lookup(token, args.k)[0] for token in tokens)
+    print(f"负载最高的节点出现在 {max(load.values()) / len(tokens):.1%} 的令牌中, "
+          f"排在首位的令牌占 {max(first.values()) / len(tokens):.2%} (同一份订阅时均为 100%)")
+    for low, high in ((0.0, 0.25), (0.25, 0.5), (0.5, 0.75), (0.75, 1.0)):
+        bucket = [key for key, weight in weights.items() if low <= weight < high or weight == high == 1.0]
+        if bucket:
+            average = sum(load[key] for key in bucket) / len(bucket)
+            print(f"  健康度 {low:.2f}~{high:.2f}: 平均分到 {average:.1f} 个令牌")
+
+    chosen = {token: ring.lookup(token, args.k) for token in tokens}
+    started = time.perf_counter()
+    shared = [base64.b64encode("\n".join(links[key] for key in keys).encode('utf-8')) for keys in chosen.values()]
+    shared_time = time.perf_counter() - started
+    started = time.perf_counter()
+    encoded = [base64.b64encode("\n".join(iter_links(by_key[key] for key in keys)).encode('utf-8'))
+               for keys in chosen.values()]
+    encoded_time = time.perf_counter() - started
+    if shared != encoded:
+        failed = True
+        print("复用链接与重新编码的订阅不同")
+    print(f"渲染 {len(tokens)} 份订阅: 复用已编码链接 {shared_time:.2f} s, 每个令牌重新编码 {encoded_time:.2f} s "
+          f"({encoded_time / shared_time:.1f}x)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""分享链接编码基准与往返校验
+
+先把合成的分享链接用 scraper5.parse_generic_uri 解析为节点, 再用 links.create_link 编码,
+重新解析后必须与原节点完全一致 (sni / 公钥 / flow / security 等字段不能丢失或被改写),
+几条 vless 链接 (security=none / tls / 无 security) 编码后须与原链接逐字相同, 然后统计编码吞吐:
+
+    python bench/bench_links.py
+    python bench/bench_links.py --count 200000 --runs 5
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import time
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from links import create_link, create_links  # noqa: E402
+from scraper5 import parse_generic_uri  # noqa: E402
+
+REGIONS = ["🇭🇰 香港", "🇯🇵 日本", "🇸🇬 新加坡", "🇺🇸 美国", "🇹🇼 台湾", "US", "德国 Frankfurt"]
+SNIS = ["www.microsoft.com", "www.apple.com", "addons.mozilla.org", "dl.google.com"]
+PUBLIC_KEYS = [
+    "0XqnX5cXAa6isFhTW4eIM_CaAHTXJJ8tbMs9XabxJ1A",
+    "Ckb6Nt5kgvV8RHA2Pj4ZPaEoLQ4VYuBwB5MsVeAgJ1E",
+    "jNXHt1yRo0vDuchQlIP6Z0ZvjT3KtzVI-T4E7RoLJS0",
+]
+FLOWS = ["xtls-rprx-vision", "xtls-rprx-vision-udp443"]
+# 编码后必须与原链接逐字相同: security=none 不能被改写为 tls, 没有 security 时也不能凭空加上
+SECURITY_LINKS = [
+    "vless://0000abcd-0000-4000-8000-000000000001@none.example.com:80?security=none#none",
+    "vless://0000abcd-0000-4000-8000-000000000002@tls.example.com:443?security=tls#tls",
+    "vless://0000abcd-0000-4000-8000-000000000003@plain.example.com:8080#plain",
+]
+
+
+def synthetic_uris(count, seed=0):
+    """生成各协议混合的分享链接, 参数取值各不相同"""
+    rng = random.Random(seed)
+    uris = []
+    for i in range(count):
+        server = f"node{i}.example.com"
+        port = rng.choice([443, 443, 8443, 2053, 80])
+        name = quote(f"{rng.choice(REGIONS)} {i:05d} (mibei77.com)")
+        uuid = f"{rng.getrandbits(32):08x}-0000-4000-8000-{i:012x}"
+        kind = rng.choice(["reality", "reality", "vless", "trojan", "ss", "vmess"])
+        if kind == "reality":
+            uris.append(
+                f"vless://{uuid}@{server}:{port}?encryption=none&security=reality"
+                f"&sni={rng.choice(SNIS)}&fp={rng.choice(['chrome', 'firefox', 'safari'])}"
+                f"&pbk={rng.choice(PUBLIC_KEYS)}&sid={rng.getrandbits(32):08x}"
+                f"&type=tcp&flow={rng.choice(FLOWS)}#{name}")
+        elif kind == "vless":
+            security = ("", "&security=none", "&security=tls")[i % 3]
+            uris.append(f"vless://{uuid}@{server}:{port}?encryption=none{security}&type=ws#{name}")
+        elif kind == "trojan":
+            uris.append(f"trojan://pw{i}@{server}:{port}?sni={rng.choice(SNIS)}#{name}")
+        elif kind == "ss":
+            userinfo = base64.urlsafe_b64encode(f"aes-256-gcm:pw{i}".encode()).decode().rstrip("=")
+            uris.append(f"ss://{userinfo}@{server}:{port}#{name}")
+        else:
+            vmess = {"v": "2", "ps": f"{rng.choice(REGIONS)} {i:05d}", "add": server, "port": str(port),
+                     "id": uuid, "aid": rng.choice([0, "0"]), "scy": "auto", "net": "ws", "tls": "tls"}
+            uris.append("vmess://" + base64.b64encode(json.dumps(vmess).encode()).decode())
+    return uris
+
+
+def check_round_trip(nodes):
+    """编码后重新解析, 返回不一致的 (原节点, 链接, 解析结果) 列表"""
+    mismatches = []
+    for node in nodes:
+        link = create_link(node)
+        parsed = parse_generic_uri(link) if link else None
+        if parsed != node:
+            mismatches.append((node, link, parsed))
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分享链接编码基准")
+    parser.add_argument("--count", type=int, default=50000, help="节点数")
+    parser.add_argument("--runs", type=int, default=3, help="重复次数, 取最快一次")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    nodes = [node for node in map(parse_generic_uri, synthetic_uris(args.count, args.seed)) if node]
+    mismatches = check_round_trip(nodes)
+    if mismatches:
+        for node, link, parsed in mismatches[:5]:
+            print(f"往返不一致:\n  节点: {node}\n  链接: {link}\n  解析: {parsed}")
+        print(f"共 {len(mismatches)} / {len(nodes)} 个节点往返不一致")
+        return 1
+    print(f"往返校验通过: {len(nodes)} 个节点")
+    for link in SECURITY_LINKS:
+        encoded = create_link(parse_generic_uri(link))
+        if encoded != link:
+            print(f"security 参数未原样写回:\n  原链接: {link}\n  重新编码: {encoded}")
+            return 1
+    print(f"security 参数往返校验通过: {len(SECURITY_LINKS)} 条链接")
+
+    best = None
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        links = create_links(nodes)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"编码 {len(links)} 条链接: {best * 1000:.1f} ms, {len(links) / best:,.0f} 条/秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
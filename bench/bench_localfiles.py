@@ -0,0 +1,77 @@
+"""本地订阅文件读取的内存与耗时
+
+生成一份 plain 与一份 base64 (每 76 个字符换行) 的大订阅文件, 分别用 localfiles.read_nodes (mmap 逐行)
+与 "整个文件读成字符串再 engine.decode_body" 的方式读取, 检查两者得到的节点完全相同,
+并比较两者的 tracemalloc 峰值与耗时 (峰值之差主要是整个文件文本与解码结果):
+
+    python bench/bench_localfiles.py
+    python bench/bench_localfiles.py --count 200000
+"""
+import argparse
+import base64
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_links import synthetic_uris  # noqa: E402
+from engine import decode_body  # noqa: E402
+from localfiles import read_nodes  # noqa: E402
+from uriparse import parse_uri  # noqa: E402
+from validation import validate  # noqa: E402
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak, elapsed
+
+
+def read_whole(path, encoding):
+    with open(path, encoding='utf-8') as f:
+        return decode_body(f.read(), encoding, parse_uri)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地订阅文件读取基准")
+    parser.add_argument("--count", type=int, default=50000, help="每个文件的链接条数")
+    args = parser.parse_args(argv)
+
+    uris = synthetic_uris(args.count)
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_path = os.path.join(tmp, "dump.txt")
+        with open(plain_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(uris))
+        base64_path = os.path.join(tmp, "dump.b64")
+        with open(base64_path, 'w', encoding='ascii') as f:
+            encoded = base64.b64encode("\n".join(uris).encode('utf-8')).decode('ascii')
+            f.write("\n".join(encoded[i:i + 76] for i in range(0, len(encoded), 76)))
+        del uris
+
+        for encoding, path in (("plain", plain_path), ("base64", base64_path)):
+            size = os.path.getsize(path) / 1024 / 1024
+            mapped, mapped_peak, mapped_time = measure(read_nodes, [path], encoding, parse_uri)
+            whole, whole_peak, whole_time = measure(read_whole, path, encoding)
+            # decode_body 还会校验节点 (补全 ss 的 cipher), 比较前对 mmap 的结果做同样处理
+            if validate(mapped) != whole:
+                failed = True
+                print(f"[{encoding}] 两种读取方式得到的节点不同")
+            print(f"[{encoding}] 文件 {size:.1f} MiB, {len(whole)} 个节点; "
+                  f"mmap 峰值 {mapped_peak / 1024 / 1024:.1f} MiB {mapped_time:.1f} s, "
+                  f"整体读取峰值 {whole_peak / 1024 / 1024:.1f} MiB {whole_time:.1f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""峰值内存基准与回归检查
+
+在合成语料 (默认 100 万条分享链接, 其中 1/4 重复) 上分别运行流水线的几个阶段, 用 tracemalloc 记录每个阶段
+新分配内存的峰值, 与 bench/memory_baseline.json 中记录的基线比较, 超出容差时以非零状态退出:
+
+    python bench/bench_memory.py                    # 与基线比较
+    python bench/bench_memory.py --record           # 重新记录基线
+    python bench/bench_memory.py --count 100000     # 小语料快速查看 (节点数与基线不同时不做比较)
+
+场景:
+    parse  base64 订阅内容 -> 节点 (engine.decode_body)
+    dedup  节点去重 (pipeline.dedup)
+    emit   写出 dataN-日期.json 与 base64 订阅文件 (pipeline.save_output_files)
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_links import synthetic_uris  # noqa: E402
+from engine import decode_body  # noqa: E402
+from pipeline import dedup, save_output_files  # noqa: E402
+from uriparse import parse_uri  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory_baseline.json")
+
+
+def measure(func, *args):
+    """返回 (结果, 峰值新分配字节数, 秒)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak, elapsed
+
+
+def run_scenarios(count):
+    # 多个订阅文件中重复出现的节点在语料中以 1/4 的比例重复, 让 dedup 有实际工作
+    uris = synthetic_uris(count * 3 // 4)
+    uris += uris[:count - len(uris)]
+    body = base64.b64encode("\n".join(uris).encode('utf-8')).decode('ascii')
+    del uris
+
+    results = {}
+    nodes, results["parse"], elapsed = measure(decode_body, body, "base64", parse_uri)
+    print(f"parse  {len(nodes):>9} 个节点  峰值 {results['parse'] / 1024 / 1024:8.1f} MiB  {elapsed:6.1f} s")
+    del body
+    # decode_body 已去掉重复链接, 这里把节点列表拼接一次模拟多个来源的合并结果
+    merged = nodes + nodes[:len(nodes) // 4]
+    unique, results["dedup"], elapsed = measure(dedup, merged)
+    print(f"dedup  {len(unique):>9} 个节点  峰值 {results['dedup'] / 1024 / 1024:8.1f} MiB  {elapsed:6.1f} s")
+    del unique
+    with tempfile.TemporaryDirectory() as tmp:
+        _, results["emit"], elapsed = measure(save_output_files, merged, "good5.txt", tmp)
+    print(f"emit   {len(merged):>9} 个节点  峰值 {results['emit'] / 1024 / 1024:8.1f} MiB  {elapsed:6.1f} s")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="峰值内存基准")
+    parser.add_argument("--count", type=int, default=1_000_000, help="语料中的链接条数")
+    parser.add_argument("--record", action="store_true", help="把本次结果记录为基线")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="允许超出基线的比例")
+    args = parser.parse_args(argv)
+
+    results = run_scenarios(args.count)
+    if args.record:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({"count": args.count, "peak_bytes": results}, f, indent=2)
+            f.write("\n")
+        print(f"已记录基线: {BASELINE_FILE}")
+        return 0
+
+    try:
+        with open(BASELINE_FILE, encoding='utf-8') as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print("没有基线, 先用 --record 记录")
+        return 0
+    if baseline["count"] != args.count:
+        print(f"基线的节点数为 {baseline['count']}, 与本次 {args.count} 不同, 不做比较")
+        return 0
+
+    failed = False
+    for name, peak in results.items():
+        budget = baseline["peak_bytes"].get(name)
+        if budget is None:
+            continue
+        limit = budget * (1 + args.tolerance)
+        status = "超出预算" if peak > limit else "ok"
+        failed |= peak > limit
+        print(f"{name:<6} {peak / 1024 / 1024:8.1f} MiB / 预算 {limit / 1024 / 1024:8.1f} MiB  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""并发来源之间的请求合并
+
+本地起一个每个请求延迟 --delay 秒、按路径计数的 HTTP 服务, 生成 --sources 个声明式来源: 它们共用同一个主页、
+同一篇文章和同一个订阅文件 (相当于多个来源指向同一站点), 分别用合并 / 不合并请求的会话并发抓取,
+比较服务端收到的请求数与耗时, 并检查每个来源都拿到完整且互不影响的节点 (名称后缀只加一次):
+
+    python bench/bench_singleflight.py
+    python bench/bench_singleflight.py --sources 16 --delay 0.3
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_links import synthetic_uris  # noqa: E402
+
+NODES = 2000
+
+
+def serve(delay, bodies, hits):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[self.path] += 1
+            time.sleep(delay)
+            body = bodies.get(self.path)
+            self.send_response(200 if body is not None else 404)
+            self.end_headers()
+            self.wfile.write((body or "").encode('utf-8'))
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="请求合并基准")
+    parser.add_argument("--sources", type=int, default=8, help="共用同一站点的来源个数")
+    parser.add_argument("--delay", type=float, default=0.2, help="每个 HTTP 请求的延迟(秒)")
+    args = parser.parse_args(argv)
+
+    hits = Counter()
+    bodies = {
+        "/": '<a href="/2026-10-19.html">最新</a>',
+        "/2026-10-19.html": '<a href="/sub.txt">订阅</a>',
+        "/sub.txt": base64.b64encode("\n".join(synthetic_uris(NODES)).encode('utf-8')).decode('ascii'),
+    }
+    server = serve(args.delay, bodies, hits)
+    entry = f"http://127.0.0.1:{server.server_address[1]}/"
+    tmp = tempfile.mkdtemp(prefix="getip-bench-flight-")
+    config = {f"shared{i}": {"entry": entry, "article": {"pattern": r'href="([^"]+\.html)"'},
+                             "subscriptions": {"pattern": r'href="([^"]+\.txt)"'}, "encoding": "base64",
+                             "name_suffix": " {date}", "output": "good98.txt"}
+              for i in range(args.sources)}
+    with open(os.path.join(tmp, "sources.json"), 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    os.environ["GETIP_SOURCES_FILE"] = os.path.join(tmp, "sources.json")
+    os.environ["GETIP_CACHE_DIR"] = tmp
+
+    import engine
+    from breaker import BreakerBoard
+    from budget import Budget
+    from pipeline import collect
+    from politeness import HostLimiter, PoliteSession, create_session
+    from sources import get_sources
+
+    class Uncoalesced(PoliteSession):
+        def _flight_key(self, method, url, kwargs):
+            return None
+
+    class NoFlight:
+        def do(self, key, fn, timeout=None):
+            return fn()
+
+    specs = get_sources(list(config))
+    failed = False
+    parses = engine._parses
+    for label, session in (("不合并", create_session(HostLimiter())), ("合并", create_session(HostLimiter()))):
+        # 基线同时关掉会话层的请求合并与 engine 的订阅解析合并; 各轮使用独立的限速器
+        if label == "不合并":
+            session.__class__ = Uncoalesced
+            engine._parses = NoFlight()
+        else:
+            engine._parses = parses
+        hits.clear()
+        breakers = BreakerBoard(os.path.join(tmp, f"{label}.json"), os.path.join(tmp, f"last_good_{label}"))
+        started = time.perf_counter()
+        results = collect(specs, session, breakers, Budget(300), date_suffix="10-19")
+        elapsed = time.perf_counter() - started
+        for name, items in results.items():
+            names_ok = all(item["name"].endswith(" 10-19") and not item["name"].endswith(" 10-19 10-19")
+                           for item in items)
+            if len(items) != NODES or not names_ok:
+                failed = True
+                print(f"[{label}] {name}: {len(items)} 个节点, 名称后缀{'正常' if names_ok else '异常'}")
+        print(f"{label}: 服务端收到 {sum(hits.values())} 个请求 ({dict(hits)}), 耗时 {elapsed:.2f} s")
+    server.shutdown()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
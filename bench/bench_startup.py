@@ -0,0 +1,121 @@
+"""冷启动耗时基准
+
+用 python -X importtime 运行 getip.py 的若干命令, 汇总各顶层模块的累计导入耗时。
+run 场景在临时目录中生成一个声明式来源与对应的 HTTP 回放存档 (主页、文章页、两个订阅文件), 用 --replay
+完整跑一次抓取/解析/写出, 不访问网络, 也不改动仓库下的 public/ 与 .cache/:
+
+    python bench/bench_startup.py
+    python bench/bench_startup.py --max-ms 50      # help / sources 的导入耗时超过阈值时以非零状态退出
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_links import synthetic_uris  # noqa: E402
+from httparchive import ArchiveWriter  # noqa: E402
+
+# {dir} 替换为 run 场景的临时目录
+SCENARIOS = {
+    "help": ["--help"],
+    "sources": ["sources"],
+    "run": ["run", "--sources", "bench", "--replay", "{dir}/run.http.gz", "--output", "{dir}/public"],
+}
+# --max-ms 只约束这些场景; run 要导入 requests 与全部流水线模块, 只记录不设上限
+STARTUP_SCENARIOS = ("help", "sources")
+REPLAY_HOST = "http://bench.invalid"
+REPLAY_NODES = 2000
+
+
+def write_replay_fixture(directory, count=REPLAY_NODES):
+    """写出 run 场景用的 sources.json 与回放存档, 返回运行 getip 需要的环境变量"""
+    config = {"bench": {
+        "entry": f"{REPLAY_HOST}/",
+        "article": {"pattern": r'href="(/post/\d+\.html)"'},
+        "subscriptions": {"pattern": r'href="(/sub/\d+\.txt)"'},
+        "encoding": "plain",
+        "output": "good9.txt",
+        "name_suffix": "-{date}",
+    }}
+    with open(os.path.join(directory, "sources.json"), 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    uris = synthetic_uris(count)
+    pages = {
+        "/": '<a href="/post/1.html">latest</a>',
+        "/post/1.html": '<a href="/sub/1.txt">1</a> <a href="/sub/2.txt">2</a>',
+        "/sub/1.txt": "\n".join(uris[:count // 2]),
+        "/sub/2.txt": "\n".join(uris[count // 2:]),
+    }
+    writer = ArchiveWriter(os.path.join(directory, "run.http.gz"))
+    for path, text in pages.items():
+        writer.write({"method": "GET", "url": f"{REPLAY_HOST}{path}", "elapsed": 0.0, "status": 200, "reason": "OK",
+                      "headers": {"Content-Type": "text/html; charset=utf-8"}, "text": text})
+    writer.close()
+    return {"GETIP_SOURCES_FILE": os.path.join(directory, "sources.json"),
+            "GETIP_CACHE_DIR": os.path.join(directory, ".cache")}
+
+
+def parse_importtime(stderr):
+    """返回 [(累计微秒, 模块名)], 只保留顶层导入 (没有缩进的行)"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        name = name[1:]
+        if not name.startswith(" "):
+            rows.append((int(cumulative_us), name))
+    return rows
+
+
+def measure(args, runs=5, env=None):
+    """多次运行取最小值, 返回 (墙钟毫秒, 导入总毫秒, 最慢的顶层模块); 命令失败时抛出 RuntimeError"""
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", os.path.join(ROOT, "getip.py"), *args],
+            cwd=ROOT, capture_output=True, text=True, env=dict(os.environ, **(env or {})),
+        )
+        wall_ms = (time.perf_counter() - started) * 1000
+        if proc.returncode != 0:
+            raise RuntimeError(f"getip {' '.join(args)} 退出码 {proc.returncode}: {proc.stdout[-500:]}")
+        top = parse_importtime(proc.stderr)
+        import_ms = sum(us for us, _ in top) / 1000
+        if best is None or wall_ms < best[0]:
+            best = (wall_ms, import_ms, sorted(top, reverse=True)[:5])
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="getip 冷启动耗时")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None, help="help / sources 的导入总耗时上限(毫秒)")
+    args = parser.parse_args(argv)
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        env = write_replay_fixture(tmp)
+        for name, scenario in SCENARIOS.items():
+            wall_ms, import_ms, slowest = measure([part.format(dir=tmp) for part in scenario], args.runs,
+                                                  env if name == "run" else None)
+            print(json.dumps({
+                "scenario": name,
+                "wall_ms": round(wall_ms, 1),
+                "import_ms": round(import_ms, 1),
+                "slowest": [{"module": module, "ms": round(us / 1000, 2)} for us, module in slowest],
+            }, ensure_ascii=False))
+            if args.max_ms is not None and name in STARTUP_SCENARIOS and import_ms > args.max_ms:
+                print(f"{name}: 导入耗时 {import_ms:.1f}ms 超过上限 {args.max_ms}ms", file=sys.stderr)
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
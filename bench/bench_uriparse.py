@@ -0,0 +1,139 @@
+"""分享链接解析基准与一致性校验
+
+在合成语料与一组边界写法上比较 uriparse 与原解析函数 (scraper5/scraper6.parse_generic_uri):
+节点字典 (含字段顺序) 与打印输出必须完全相同, 然后统计两者的解析速度:
+
+    python bench/bench_uriparse.py
+    python bench/bench_uriparse.py --count 200000
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import scraper5  # noqa: E402
+import scraper6  # noqa: E402
+from bench_links import synthetic_uris  # noqa: E402
+from uriparse import parse_uri, parse_uri_raw  # noqa: E402
+
+
+def _vmess(data):
+    return "vmess://" + base64.b64encode(json.dumps(data).encode()).decode()
+
+
+EDGE_CASES = [
+    "vless://id@h:443",
+    "vless://id@h:443?security=reality#",
+    "vless://id@h:443?security=reality&sni=&pbk=&sid=#n",
+    "vless://id@h:443?security=reality&servername=s.example&publicKey=K&shortId=ab#n",
+    "vless://id@h:443?security=reality&sni=a&sni=b&flow=x%2By&fp=fire+fox#a%20b",
+    "vless://id@h:443?s%65curity=reality&pbk=a%2Fb#%E4%B8%AD%E5%9B%BD",
+    "vless://id@h:443?security=tls&sni=a#name (mibei77.com 免费)",
+    "vless://id@h:443?security=reality#机场节点",
+    "vless://id@h:443/path?security=reality#x|@stairnode  ()  []",
+    "vless://id@h:443#frag?security=reality",
+    "vless://id@h:4_43#n",
+    "vless://id@h:+443#n",
+    "vless://id@h:abc#n",
+    "vless://id@h#n",
+    "vless://h:443#n",
+    "vless://a@b@h:443:1#n",
+    "vless://id@[::1]:443#ipv6",
+    "vless://id@[::1:443#bad",
+    "VLESS://id@h:443#upper",
+    "vless:id@h:443#no-slashes",
+    "vless://id@hö:443#unicode-host",
+    "vless://id@h:443#%ZZ%E4",
+    "vless://id@h:443#a%5C\\b%E4%B8x%2",
+    "ss://YWVzOnB3@h:8388",
+    "ss://YWVzOnB3@h:8388#%F0%9F%87%A8%F0%9F%87%B3",
+    "ss://YWVzOnB3@h:notaport#n",
+    "ss://YWVzOnB3h:8388#n",
+    "ss://YWVzOnB3@h:8388/?plugin=obfs#米贝节点分享 (米贝节点分享)",
+    "trojan://pw@h:443?sni=x",
+    "trojan://pw@h:443#mibei77.com 节点",
+    "trojan://pw@h:443#a  b (  ) [ ]",
+    "trojan://pw@h#n",
+    _vmess({"add": "h", "port": "443", "id": "u", "ps": "n", "aid": 0, "net": "ws", "tls": "tls"}),
+    _vmess({"host": "h2", "port": "x", "id": "u", "remarks": "r"}),
+    _vmess({"add": "", "id": "u"}),
+    _vmess({"add": "h", "id": ""}),
+    _vmess({"add": "h", "id": "u", "ps": 5}),
+    _vmess({"add": "h", "id": "u", "ps": "机场"}),
+    _vmess({"add": "h", "id": "u", "ps": "中国 CN"}),
+    _vmess([1, 2]),
+    "vmess://" + base64.b64encode(b'{"add":"h","id":"u","ps":"\xff"}').decode(),
+    "vmess://!!!notbase64",
+    "vmess://",
+    "vmess://abc/def",
+    "vmess://eyJhZGQiOiJoIiwiaWQiOiJ1In0#frag",
+    "http://example.com",
+    "",
+    " vless://id@h:443#leading-space",
+]
+
+
+def compare(reference, fast, uris):
+    """返回结果或打印输出不一致的 (链接, 原结果, 新结果)"""
+    mismatches = []
+    for uri in uris:
+        with redirect_stdout(io.StringIO()) as expected_out:
+            expected = reference(uri)
+        with redirect_stdout(io.StringIO()) as actual_out:
+            actual = fast(uri)
+        same_items = expected == actual and (
+            expected is None or list(expected) == list(actual))
+        if not same_items or expected_out.getvalue() != actual_out.getvalue():
+            mismatches.append((uri, expected, actual))
+    return mismatches
+
+
+def best_time(func, uris, runs):
+    best = None
+    with redirect_stdout(io.StringIO()):
+        for _ in range(runs):
+            started = time.perf_counter()
+            for uri in uris:
+                func(uri)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分享链接解析基准")
+    parser.add_argument("--count", type=int, default=50000, help="合成链接条数")
+    parser.add_argument("--runs", type=int, default=3, help="重复次数, 取最快一次")
+    args = parser.parse_args(argv)
+
+    uris = synthetic_uris(args.count)
+    failed = False
+    for label, reference, fast in (
+        ("parse_uri", scraper5.parse_generic_uri, parse_uri),
+        ("parse_uri_raw", scraper6.parse_generic_uri, parse_uri_raw),
+    ):
+        mismatches = compare(reference, fast, EDGE_CASES + uris)
+        for uri, expected, actual in mismatches[:5]:
+            print(f"[{label}] 不一致: {uri}\n  原: {expected}\n  新: {actual}")
+        if mismatches:
+            failed = True
+            print(f"[{label}] 共 {len(mismatches)} 条不一致")
+            continue
+        print(f"[{label}] 一致性校验通过: {len(EDGE_CASES)} 条边界写法 + {len(uris)} 条合成链接")
+
+        slow = best_time(reference, uris, args.runs)
+        quick = best_time(fast, uris, args.runs)
+        print(f"[{label}] 原解析 {len(uris) / slow:,.0f} 条/秒, 新解析 {len(uris) / quick:,.0f} 条/秒, "
+              f"快 {slow / quick:.1f} 倍")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""节点校验的正确性与吞吐
+
+合成语料中的节点应全部通过 (ss 节点的 cipher 由 userinfo 补全), 另外混入一组格式错误的节点,
+检查每个都按预期原因被丢弃, 然后统计校验吞吐:
+
+    python bench/bench_validation.py
+    python bench/bench_validation.py --count 200000
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_links import synthetic_uris  # noqa: E402
+from uriparse import parse_uri  # noqa: E402
+from validation import check, rejections, reset, validate  # noqa: E402
+
+UUID = "0d9f6a2e-5c1b-4f7e-9a3d-2b8c7e6f1a40"
+MALFORMED = [
+    ({"type": "vless", "server": "a.example", "port": 0, "uuid": UUID}, "port"),
+    ({"type": "vless", "server": "a.example", "port": 70000, "uuid": UUID}, "port"),
+    ({"type": "vless", "server": "a.example", "port": "44x", "uuid": UUID}, "port"),
+    ({"type": "vless", "server": "a.example", "port": True, "uuid": UUID}, "port"),
+    ({"type": "vless", "server": "", "port": 443, "uuid": UUID}, "server"),
+    ({"type": "vless", "server": "bad host", "port": 443, "uuid": UUID}, "server"),
+    ({"type": "vless", "server": "-a.example", "port": 443, "uuid": UUID}, "server"),
+    ({"type": "vless", "server": "300.1.1.1", "port": 443, "uuid": UUID}, "server"),
+    ({"type": "vless", "server": "::zz", "port": 443, "uuid": UUID}, "server"),
+    ({"type": "vless", "server": "a.example", "port": 443, "uuid": "not-a-uuid"}, "uuid"),
+    ({"type": "vmess", "server": "a.example", "port": 443, "uuid": ""}, "uuid"),
+    ({"type": "trojan", "server": "a.example", "port": 443}, "password"),
+    ({"type": "ss", "server": "a.example", "port": 443, "cipher": "unknown", "password": "!!!"}, "cipher"),
+    ({"type": "ss", "server": "a.example", "port": 443, "cipher": "unknown", "password": "YWJj"}, "cipher"),
+    ({"type": "ss", "server": "a.example", "port": 443, "cipher": "rot13", "password": "x"}, "cipher"),
+    ({"type": "http", "server": "a.example", "port": 443}, "type"),
+]
+VALID = [
+    {"type": "vless", "server": "1.2.3.4", "port": 443, "uuid": UUID},
+    {"type": "vless", "server": "2001:db8::1", "port": "8443", "uuid": UUID.upper()},
+    {"type": "trojan", "server": "_acme.example.com.", "port": 65535, "password": "x"},
+    {"type": "ss", "server": "a.example", "port": 8388, "cipher": "unknown", "password": "2022-blake3-aes-128-gcm:a%2Bb"},
+    {"type": "ss", "server": "a.example", "port": 8388, "cipher": "aes-128-gcm", "password": "x"},
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="节点校验基准")
+    parser.add_argument("--count", type=int, default=50000, help="合成链接条数")
+    parser.add_argument("--runs", type=int, default=3, help="重复次数, 取最快一次")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for item, expected in MALFORMED:
+        reason = check(dict(item))
+        if reason != expected:
+            failed = True
+            print(f"原因不符: {item} -> {reason}, 期望 {expected}")
+    for item in VALID:
+        reason = check(dict(item))
+        if reason is not None:
+            failed = True
+            print(f"合法节点被丢弃: {item} -> {reason}")
+
+    items = [item for item in map(parse_uri, synthetic_uris(args.count)) if item]
+    reset()
+    valid = validate(items)
+    if len(valid) != len(items):
+        failed = True
+        print(f"合成节点被丢弃: {rejections()}")
+    unresolved = [item for item in valid if item["type"] == "ss" and item["cipher"] == "unknown"]
+    if unresolved:
+        failed = True
+        print(f"{len(unresolved)} 个 ss 节点未补全 cipher")
+
+    best = None
+    for _ in range(args.runs):
+        batch = [dict(item) for item in items]
+        started = time.perf_counter()
+        validate(batch)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{'校验失败' if failed else '校验通过'}: {len(MALFORMED)} 个错误节点, {len(VALID)} 个边界合法节点, "
+          f"{len(items)} 个合成节点; 吞吐 {len(items) / best:,.0f} 个/秒")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""分布式运行的吞吐随 worker 数的变化
+
+本地起一个每个请求延迟 --delay 秒的 HTTP 服务, 生成 --sources 个声明式来源 (各自使用不同的 127.0.0.x 主机,
+互不共享限速), 分别用 1, 2, 4, 8 个 worker 经工作队列抓取全部来源, 检查每次取回的节点数一致,
+并报告每秒完成的来源数与相对单个 worker 的加速比:
+
+    python bench/bench_workqueue.py
+    python bench/bench_workqueue.py --sources 48 --workers 1,4,16
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_links import synthetic_uris  # noqa: E402
+
+NODES_PER_SOURCE = 200
+
+
+def serve(delay, bodies):
+    """返回 (服务器, 端口); 每个请求先等待 delay 秒, 模拟远程站点的响应时间"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            body = bodies.get(self.path)
+            self.send_response(200 if body is not None else 404)
+            self.end_headers()
+            self.wfile.write((body or "").encode('utf-8'))
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="工作队列吞吐基准")
+    parser.add_argument("--sources", type=int, default=24, help="来源个数")
+    parser.add_argument("--workers", default="1,2,4,8", help="逗号分隔的 worker 数")
+    parser.add_argument("--delay", type=float, default=0.2, help="每个 HTTP 请求的延迟(秒)")
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix="getip-bench-queue-")
+    uris = synthetic_uris(args.sources * NODES_PER_SOURCE)
+    bodies, config = {}, {}
+    for i in range(args.sources):
+        chunk = uris[i * NODES_PER_SOURCE:(i + 1) * NODES_PER_SOURCE]
+        bodies[f"/{i}/index.html"] = f'<a href="/{i}/2026-10-19.html">最新</a>'
+        bodies[f"/{i}/2026-10-19.html"] = f'<a href="/{i}/sub.txt">订阅</a>'
+        bodies[f"/{i}/sub.txt"] = base64.b64encode("\n".join(chunk).encode('utf-8')).decode('ascii')
+    server, port = serve(args.delay, bodies)
+    for i in range(args.sources):
+        config[f"bench{i}"] = {
+            "entry": f"http://127.0.0.{i % 250 + 1}:{port}/{i}/index.html",
+            "article": {"pattern": r'href="([^"]+\.html)"'},
+            "subscriptions": {"pattern": r'href="([^"]+\.txt)"'},
+            "encoding": "base64",
+            "output": "good99.txt",
+        }
+    with open(os.path.join(tmp, "sources.json"), 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    # 来源表在导入 sources 时读取, worker 子进程继承这些环境变量
+    os.environ["GETIP_SOURCES_FILE"] = os.path.join(tmp, "sources.json")
+    os.environ["GETIP_CACHE_DIR"] = tmp
+
+    from breaker import BreakerBoard
+    from budget import Budget
+    from pipeline import collect
+    from politeness import create_session
+    from sources import get_sources
+    from workqueue import Coordinator, WorkQueue
+
+    specs = get_sources([f"bench{i}" for i in range(args.sources)])
+    session = create_session()
+    baseline = None
+    failed = False
+    for count in (int(part) for part in args.workers.split(",")):
+        coordinator = Coordinator(WorkQueue(os.path.join(tmp, f"queue{count}.sqlite3")))
+        coordinator.spawn(count)
+        try:
+            while coordinator.queue.live_workers() < count:
+                time.sleep(0.1)
+            # 熔断器状态每轮重新开始, 避免上一轮的结果影响本轮
+            breakers = BreakerBoard(os.path.join(tmp, f"breakers{count}.json"), os.path.join(tmp, f"last_good{count}"))
+            started = time.perf_counter()
+            results = collect(specs, session, breakers, Budget(600), coordinator=coordinator)
+            elapsed = time.perf_counter() - started
+        finally:
+            coordinator.close()
+        total = sum(len(items) for items in results.values())
+        if total != args.sources * NODES_PER_SOURCE:
+            failed = True
+            print(f"{count} 个 worker: 只取回 {total} 个节点")
+        throughput = args.sources / elapsed
+        baseline = baseline or throughput
+        print(f"{count} 个 worker: {elapsed:.1f} s, {throughput:.1f} 个来源/秒, 加速 {throughput / baseline:.1f}x")
+    server.shutdown()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""订阅服务压测工具
+
+用若干条 keep-alive 连接持续请求, 统计每秒请求数与延迟分位:
+
+    python bench/loadgen.py --url http://127.0.0.1:8080/sub?type=vless&limit=20
+    python bench/loadgen.py --spawn            # 自动生成节点并在子进程中启动 server.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PATHS = (
+    "/sub",
+    "/sub?type=vless&limit=20",
+    "/sub?region=HK&format=json",
+    "/sub?type=trojan,ss&port=443",
+)
+
+
+def synthetic_nodes(count, seed=0):
+    """生成压测用节点"""
+    rng = random.Random(seed)
+    regions = ["🇭🇰 香港", "🇯🇵 日本", "🇸🇬 新加坡", "🇺🇸 美国", "🇹🇼 台湾"]
+    nodes = []
+    for i in range(count):
+        node_type = rng.choice(["vless", "vless", "trojan", "ss", "vmess"])
+        node = {
+            "type": node_type,
+            "server": f"node{i}.example.com",
+            "port": rng.choice([443, 443, 8443, 2053, 80]),
+            "name": f"{rng.choice(regions)} {i:05d}",
+        }
+        if node_type in ("vless", "vmess"):
+            node["uuid"] = f"{rng.getrandbits(32):08x}-0000-4000-8000-{i:012x}"
+        else:
+            node["password"] = f"pw{i}"
+        nodes.append(node)
+    return nodes
+
+
+async def worker(host, port, paths, deadline, latencies, counters, extra_headers):
+    reader, writer = await asyncio.open_connection(host, port)
+    requests = [
+        f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{extra_headers}\r\n".encode()
+        for path in paths
+    ]
+    i = 0
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            writer.write(requests[i % len(requests)])
+            i += 1
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line[:15].lower() == b"content-length:":
+                    length = int(line[15:])
+            status = int(head[9:12])
+            if length and status != 304:
+                await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            counters[status] = counters.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, paths, connections, duration, extra_headers=""):
+    latencies = []
+    counters = {}
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        worker(host, port, paths, deadline, latencies, counters, extra_headers)
+        for _ in range(connections)
+    ))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(q / 100 * len(latencies)))] * 1000 if latencies else 0.0
+
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(pct(50), 3),
+        "p99_ms": round(pct(99), 3),
+        "statuses": counters,
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("server.py 未能启动")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="订阅服务压测")
+    parser.add_argument("--url", help="压测目标, 如 http://127.0.0.1:8080/sub?type=vless")
+    parser.add_argument("--spawn", action="store_true", help="生成节点数据并启动 server.py 子进程")
+    parser.add_argument("--nodes", type=int, default=2000, help="--spawn 时生成的节点数")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--gzip", action="store_true", help="发送 Accept-Encoding: gzip")
+    parser.add_argument("--revalidate", action="store_true", help="发送 If-None-Match: * 以测 304 路径")
+    args = parser.parse_args(argv)
+
+    extra_headers = ""
+    if args.gzip:
+        extra_headers += "Accept-Encoding: gzip\r\n"
+    if args.revalidate:
+        extra_headers += "If-None-Match: *\r\n"
+
+    process = None
+    data_path = None
+    try:
+        if args.spawn:
+            port = _free_port()
+            with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding='utf-8') as f:
+                json.dump(synthetic_nodes(args.nodes), f, ensure_ascii=False)
+                data_path = f.name
+            process = subprocess.Popen(
+                [sys.executable, os.path.join(ROOT, "server.py"), "--host", "127.0.0.1",
+                 "--port", str(port), "--data", data_path],
+                cwd=ROOT, stdout=subprocess.DEVNULL,
+            )
+            _wait_for_port(port)
+            host, paths = "127.0.0.1", list(DEFAULT_PATHS)
+        elif args.url:
+            parts = urlsplit(args.url)
+            host, port = parts.hostname, parts.port or 80
+            paths = [parts.path + (f"?{parts.query}" if parts.query else "")]
+        else:
+            parser.error("需要 --url 或 --spawn")
+
+        result = asyncio.run(run_load(host, port, paths, args.connections, args.duration, extra_headers))
+        print(json.dumps(result, ensure_ascii=False))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if data_path:
+            os.unlink(data_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""按来源的熔断器, 状态在多次运行之间持久化
+
+closed    正常抓取, 连续失败达到阈值后转为 open
+open      冷却期内直接跳过该来源, 返回上次成功的节点缓存
+half-open 冷却期结束后只放行一个探测请求, 成功则恢复 closed, 失败则重新 open 并加倍冷却
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+CACHE_DIR = Path(os.environ.get("GETIP_CACHE_DIR", ".cache"))
+STATE_FILE = CACHE_DIR / "breakers.json"
+LAST_GOOD_DIR = CACHE_DIR / "last_good"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# allow() 的返回值
+RUN = "run"
+PROBE = "probe"
+SKIP = "skip"
+
+
+def atomic_write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # 临时文件名带上线程号: 同一进程内多个来源并发完成时会同时保存熔断器状态
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=2, base_cooldown=3600, max_cooldown=86400, state=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        state = state or {}
+        self.state = state.get("state", CLOSED)
+        self.failures = state.get("failures", 0)
+        self.opened_at = state.get("opened_at", 0.0)
+        self.cooldown = state.get("cooldown", base_cooldown)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def to_dict(self):
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened_at": self.opened_at,
+            "cooldown": self.cooldown,
+        }
+
+    def allow(self, now=None):
+        """决定本次是正常抓取、探测还是跳过"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.state == CLOSED:
+                return RUN
+            if self.state == OPEN and now - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                # 同一时间只允许一个探测
+                self._probing = True
+                return PROBE
+            return SKIP
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self._probing = False
+
+    def record_failure(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                # 探测失败: 重新打开并加倍冷却时间
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+                self.state = OPEN
+                self.opened_at = now
+            elif self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = now
+            self._probing = False
+
+
+class BreakerBoard:
+    """所有来源的熔断器集合, 负责状态与上次成功节点的读写"""
+
+    def __init__(self, state_file=STATE_FILE, last_good_dir=LAST_GOOD_DIR, **breaker_options):
+        self.state_file = Path(state_file)
+        self.last_good_dir = Path(last_good_dir)
+        self.breaker_options = breaker_options
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._saved_state = {}
+        if self.state_file.exists():
+            try:
+                self._saved_state = json.loads(self.state_file.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                print(f"熔断器状态文件损坏, 已忽略: {e}")
+
+    def get(self, name):
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, state=self._saved_state.get(name), **self.breaker_options)
+                self._breakers[name] = breaker
+            return breaker
+
+    def save(self):
+        with self._lock:
+            data = dict(self._saved_state)
+            data.update({name: breaker.to_dict() for name, breaker in self._breakers.items()})
+        atomic_write_json(self.state_file, data)
+
+    def save_last_good(self, name, items):
+        atomic_write_json(self.last_good_dir / f"{name}.json", items)
+
+    def load_last_good(self, name):
+        path = self.last_good_dir / f"{name}.json"
+        try:
+            return json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return []
+
+    def run(self, name, fetch, probe=None):
+        """在熔断器保护下执行 fetch(), 返回节点列表
+
+        fetch 返回空列表或抛出异常都视为失败, 失败时返回上次成功的节点。
+        probe 为单次探测请求, 返回 True 表示来源已恢复; 半开状态下先探测再抓取。
+        """
+        breaker = self.get(name)
+        decision = breaker.allow()
+        if decision == SKIP:
+            cached = self.load_last_good(name)
+            print(f"[{name}] 熔断器打开, 跳过抓取, 使用缓存的 {len(cached)} 个节点")
+            return cached
+
+        if decision == PROBE and probe is not None:
+            try:
+                recovered = probe()
+            except Exception as e:
+                print(f"[{name}] 探测请求失败: {e}")
+                recovered = False
+            if not recovered:
+                breaker.record_failure()
+                self.save()
+                cached = self.load_last_good(name)
+                print(f"[{name}] 来源仍不可用, 使用缓存的 {len(cached)} 个节点")
+                return cached
+            print(f"[{name}] 探测成功, 恢复抓取")
+
+        try:
+            items = fetch()
+        except Exception as e:
+            print(f"[{name}] 抓取失败: {e}")
+            items = []
+
+        if items:
+            breaker.record_success()
+            self.save_last_good(name, items)
+        else:
+            breaker.record_failure()
+            items = self.load_last_good(name)
+            if items:
+                print(f"[{name}] 本次未获取到节点, 使用缓存的 {len(items)} 个节点")
+        self.save()
+        return items
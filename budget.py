@@ -0,0 +1,104 @@
+"""运行期限预算与对冲请求
+
+一次运行有一个全局截止时间, 按来源切分为子预算, 每个请求的超时再从所在预算中扣除。
+预算耗尽时抛出 BudgetExhausted, 调用方应停止等待并发布已经完成的部分。
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# 整次运行的默认期限(秒), 可用环境变量覆盖
+DEFAULT_RUN_SECONDS = float(os.environ.get("GETIP_RUN_BUDGET", "300"))
+# 剩余时间不足该值时不再发起新请求
+MIN_REQUEST_SECONDS = 0.5
+
+
+class BudgetExhausted(Exception):
+    """预算已耗尽"""
+
+
+class Budget:
+    """带截止时间的预算, 子预算的截止时间不会晚于父预算"""
+
+    def __init__(self, seconds, name="run", parent=None):
+        self.name = name
+        self.parent = parent
+        deadline = time.monotonic() + seconds
+        if parent is not None:
+            deadline = min(deadline, parent.deadline)
+        self.deadline = deadline
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self):
+        if self.remaining() < MIN_REQUEST_SECONDS:
+            raise BudgetExhausted(f"预算已耗尽: {self.name}")
+
+    def child(self, name, share=1.0, seconds=None):
+        """按剩余时间的比例(或固定秒数, 取较小者)切出子预算"""
+        allowed = self.remaining() * share
+        if seconds is not None:
+            allowed = min(allowed, seconds)
+        return Budget(allowed, name=f"{self.name}/{name}", parent=self)
+
+    def request_timeout(self, cap):
+        """单个请求的超时: 不超过 cap, 也不超过预算剩余时间"""
+        self.check()
+        remaining = self.remaining()
+        if cap is None:
+            return remaining
+        if isinstance(cap, tuple):
+            return tuple(min(part, remaining) for part in cap)
+        return min(cap, remaining)
+
+
+_current_budget = contextvars.ContextVar("getip_budget", default=None)
+
+
+def current_budget():
+    """当前上下文生效的预算, 未设置时返回 None (不限时)"""
+    return _current_budget.get()
+
+
+@contextmanager
+def use_budget(budget):
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+def submit(executor, fn, *args, **kwargs):
+    """带上当前上下文(预算)提交到线程池, 线程池默认不会继承 contextvars"""
+    ctx = contextvars.copy_context()
+    return executor.submit(ctx.run, fn, *args, **kwargs)
+
+
+class LatencyTracker:
+    """按主机记录最近的请求耗时, 用于计算对冲阈值"""
+
+    def __init__(self, window=50, min_samples=5):
+        self.min_samples = min_samples
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, host, seconds):
+        with self._lock:
+            self._samples[host].append(seconds)
+
+    def percentile(self, host, q):
+        """返回第 q 百分位耗时, 样本不足时返回 None"""
+        with self._lock:
+            samples = sorted(self._samples.get(host, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))
+        return samples[index]
@@ -0,0 +1,133 @@
+"""有界、压缩、原子写入的响应缓存
+
+- 每个 URL 一个条目, 内容用 zlib 压缩, 头部记录 URL 与写入时间
+- 写入先落到临时文件再 os.replace, 进程中途退出也不会留下半个文件
+- 目录总大小超过上限时按最近访问时间淘汰 (LRU, 访问时刷新文件 mtime)
+- aget/aput 在线程池中执行文件 I/O, 不阻塞事件循环
+- 条目分为 fresh / stale / expired 三档, 供调用方实现 stale-while-revalidate
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+ENTRY_SUFFIX = ".z"
+
+
+class CacheEntry:
+    __slots__ = ("url", "stored_at", "body")
+
+    def __init__(self, url, stored_at, body):
+        self.url = url
+        self.stored_at = stored_at
+        self.body = body
+
+    @property
+    def age(self):
+        return time.time() - self.stored_at
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8')
+
+
+class ResponseCache:
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, fresh_seconds=3600,
+                 stale_seconds=24 * 3600, compress_level=6):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self._index = None  # 文件名 -> 大小, 按访问先后排列
+        self._total = 0
+
+    def _path(self, url):
+        return self.directory / (hashlib.sha256(url.encode('utf-8')).hexdigest() + ENTRY_SUFFIX)
+
+    def _load_index(self):
+        """首次使用时扫描目录, 按 mtime 还原访问顺序, 并清理残留的临时文件"""
+        if self._index is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                os.unlink(entry.path)
+            elif entry.name.endswith(ENTRY_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((name, size) for _, name, size in entries)
+        self._total = sum(self._index.values())
+
+    def get(self, url):
+        """读取条目, 不存在或已损坏时返回 None"""
+        path = self._path(url)
+        try:
+            raw = zlib.decompress(path.read_bytes())
+        except (OSError, zlib.error):
+            return None
+        header, _, body = raw.partition(b"\n")
+        try:
+            meta = json.loads(header)
+        except ValueError:
+            return None
+        if meta.get("url") != url:
+            return None  # 哈希碰撞或旧格式
+        with self._lock:
+            self._load_index()
+            if path.name in self._index:
+                self._index.move_to_end(path.name)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return CacheEntry(url, meta["stored_at"], body)
+
+    def put(self, url, body):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        header = json.dumps({"url": url, "stored_at": time.time()}).encode('utf-8')
+        data = zlib.compress(header + b"\n" + body, self.compress_level)
+        path = self._path(url)
+        with self._lock:
+            self._load_index()
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+            self._total += len(data) - self._index.pop(path.name, 0)
+            self._index[path.name] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._index) > 1:
+            name, size = self._index.popitem(last=False)
+            try:
+                os.unlink(self.directory / name)
+            except FileNotFoundError:
+                pass
+            self._total -= size
+
+    def freshness(self, entry):
+        """返回 'fresh' / 'stale' / 'expired'"""
+        if entry is None:
+            return "expired"
+        age = entry.age
+        if age < self.fresh_seconds:
+            return "fresh"
+        if age < self.fresh_seconds + self.stale_seconds:
+            return "stale"
+        return "expired"
+
+    async def aget(self, url):
+        return await asyncio.to_thread(self.get, url)
+
+    async def aput(self, url, body):
+        await asyncio.to_thread(self.put, url, body)
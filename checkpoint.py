@@ -0,0 +1,142 @@
+"""中断运行的检查点与续跑 (getip run --resume)
+
+运行期间每完成一个单元就向 .cache/checkpoint.jsonl 追加一行, 进程被杀 (超时、CI 取消) 时已写入的行不会丢失:
+- discover      来源的最新文章URL
+- articles      回填模式下来源最近的文章列表
+- subscription  一个订阅文件下载并解析后的节点
+- source        一个来源 (或回填中的一篇文章) 成功抓取后的全部节点
+- probe         一个节点 (按指纹) 的探测延迟
+
+运行正常结束时删除检查点。下次 getip run --resume 读取同一天、且未超过 CHECKPOINT_MAX_AGE 的检查点,
+已完成的单元直接取结果, 只做剩下的部分; 不带 --resume 的运行从头开始并覆盖旧检查点。
+文件第一行记录检查点的日期与创建时间; 最后一行不完整 (写到一半被杀) 时忽略。
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+from breaker import CACHE_DIR
+
+CHECKPOINT_FILE = CACHE_DIR / "checkpoint.jsonl"
+# 超过该秒数的检查点不再续跑 (来源可能已经发布了新文章)
+CHECKPOINT_MAX_AGE = float(os.environ.get("GETIP_CHECKPOINT_MAX_AGE", 6 * 3600))
+FORMAT = "getip-checkpoint"
+
+MISSING = object()
+
+_active = None
+
+
+class Checkpoint:
+    """追加写入的检查点 {(单元类型, 键): 结果}"""
+
+    def __init__(self, path=CHECKPOINT_FILE, day=None, resume=False, max_age=CHECKPOINT_MAX_AGE):
+        from pipeline import today_suffix
+        self.path = path
+        self.day = day or today_suffix()
+        self.entries = {}
+        self.resumed = Counter()
+        self._lock = threading.Lock()
+        if resume:
+            self._load(max_age)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self.entries:
+            self._file = open(path, 'a', encoding='utf-8')
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+            self._write({"format": FORMAT, "day": self.day, "created": time.time()})
+
+    def _load(self, max_age):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+        if header.get("format") != FORMAT:
+            print("检查点文件无法识别, 从头开始")
+            return
+        age = time.time() - header.get("created", 0)
+        if header.get("day") != self.day or age > max_age:
+            print(f"检查点创建于 {int(age // 60)} 分钟前, 已过期, 从头开始")
+            return
+        for line in lines[1:]:
+            try:
+                kind, key, value = json.loads(line)
+            except ValueError:
+                continue  # 被杀时写到一半的最后一行
+            self.entries[(kind, key)] = value
+        print(f"从检查点续跑: {len(self.entries)} 个已完成的单元 (创建于 {int(age // 60)} 分钟前)")
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def get(self, kind, key):
+        value = self.entries.get((kind, key), MISSING)
+        if value is not MISSING:
+            with self._lock:
+                self.resumed[kind] += 1
+        return value
+
+    def record(self, kind, key, value):
+        with self._lock:
+            self.entries[(kind, key)] = value
+            self._write([kind, key, value])
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def discard(self):
+        """运行正常结束: 关闭并删除检查点"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def activate(resume=False, path=CHECKPOINT_FILE):
+    global _active
+    _active = Checkpoint(path, resume=resume)
+    return _active
+
+
+def deactivate(completed):
+    """结束记录检查点; completed 时删除检查点, 否则保留供下次续跑"""
+    global _active
+    checkpoint, _active = _active, None
+    if checkpoint is None:
+        return
+    if checkpoint.resumed:
+        summary = ", ".join(f"{kind} {count}" for kind, count in sorted(checkpoint.resumed.items()))
+        print(f"检查点复用: {summary}")
+    if completed:
+        checkpoint.discard()
+    else:
+        checkpoint.close()
+        print(f"运行未完成, 检查点保留在 {checkpoint.path}, 可用 --resume 续跑")
+
+
+def active():
+    """当前运行的检查点, 未开启时返回 None"""
+    return _active
+
+
+def remembered(kind, key, compute, keep=lambda value: True):
+    """检查点中有该单元时直接返回其结果, 否则调用 compute() 并在 keep(结果) 为真时记录; 未开启检查点时直接计算"""
+    checkpoint = _active
+    if checkpoint is None:
+        return compute()
+    value = checkpoint.get(kind, key)
+    if value is MISSING:
+        value = compute()
+        if keep(value):
+            checkpoint.record(kind, key, value)
+    return value
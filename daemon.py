@@ -0,0 +1,192 @@
+"""常驻守护进程: 按来源自适应调度刷新
+
+进程常驻, 复用 Session 连接、熔断器和已解析的节点。每个来源独立调度:
+先只访问主页发现最新文章, 文章变化(或数据过旧)时才完整抓取;
+并根据观察到的新文章出现时间学习站点的发布节奏, 在预计发布时间附近密集轮询, 其余时间稀疏轮询。
+"""
+import argparse
+import datetime
+import json
+import math
+import signal
+import threading
+import time
+
+from breaker import CACHE_DIR, BreakerBoard, atomic_write_json
+from budget import Budget, use_budget
+from pipeline import BEIJING_TZ, fetch_source, publish
+from politeness import create_session
+from sources import article_date, get_sources
+
+CADENCE_FILE = CACHE_DIR / "cadence.json"
+
+
+def _minute_of_day(moment):
+    return moment.hour * 60 + moment.minute + moment.second / 60
+
+
+class CadenceModel:
+    """学习单个站点的发布时间(北京时间一天中的分钟数), 给出下次轮询间隔"""
+
+    def __init__(self, observations=None, fast=300, slow=3 * 3600, default=1800,
+                 min_window=30, max_window=180, min_observations=3, history=30):
+        self.observations = list(observations or [])[-history:]
+        self.fast = fast
+        self.slow = slow
+        self.default = default
+        self.min_window = min_window
+        self.max_window = max_window
+        self.min_observations = min_observations
+        self.history = history
+
+    def observe(self, seen_at):
+        """记录一次新文章首次被发现的时间"""
+        self.observations.append(round(_minute_of_day(seen_at.astimezone(BEIJING_TZ)), 1))
+        del self.observations[:-self.history]
+
+    def expected(self):
+        """按圆周统计返回 (预计发布分钟, 窗口半宽分钟), 样本不足时返回 None"""
+        if len(self.observations) < self.min_observations:
+            return None
+        angles = [2 * math.pi * minute / 1440 for minute in self.observations]
+        sin_sum = sum(math.sin(a) for a in angles) / len(angles)
+        cos_sum = sum(math.cos(a) for a in angles) / len(angles)
+        mean = (math.atan2(sin_sum, cos_sum) / (2 * math.pi) * 1440) % 1440
+        resultant = min(1.0, math.hypot(sin_sum, cos_sum))
+        std = math.sqrt(-2 * math.log(resultant)) / (2 * math.pi) * 1440 if resultant > 0 else self.max_window
+        return mean, min(self.max_window, max(self.min_window, 2 * std))
+
+    def next_interval(self, now, published_today):
+        """下次轮询前等待的秒数"""
+        estimate = self.expected()
+        if estimate is None:
+            return self.default
+        mean, window = estimate
+        now = now.astimezone(BEIJING_TZ)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        start = midnight + datetime.timedelta(minutes=mean - window)
+        end = midnight + datetime.timedelta(minutes=mean + window)
+        if published_today:
+            # 今天已发布: 睡到明天的窗口, 期间仍按 slow 兜底检查一次
+            wait = (start + datetime.timedelta(days=1) - now).total_seconds()
+        elif start <= now <= end:
+            return self.fast
+        elif now < start:
+            wait = (start - now).total_seconds()
+        else:
+            # 已过预计窗口但今天还没发布: 发布推迟了, 以中等频率继续检查
+            wait = self.slow / 4
+        return min(self.slow, max(self.fast, wait))
+
+
+class SourceState:
+    def __init__(self, spec, model):
+        self.spec = spec
+        self.model = model
+        self.article_url = None
+        self.published_on = None
+        self.items = []
+        self.fetched_at = 0.0
+        self.next_due = 0.0
+
+
+class Daemon:
+    def __init__(self, names=None, max_staleness=6 * 3600, refresh_seconds=180):
+        self.session = create_session()
+        self.breakers = BreakerBoard()
+        self.max_staleness = max_staleness
+        self.refresh_seconds = refresh_seconds
+        self.listeners = []
+        self._stop = threading.Event()
+        saved = self._load_cadence()
+        self.states = [
+            SourceState(spec, CadenceModel(saved.get(spec.name)))
+            for spec in get_sources(names)
+        ]
+
+    @staticmethod
+    def _load_cadence():
+        try:
+            return json.loads(CADENCE_FILE.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cadence(self):
+        atomic_write_json(CADENCE_FILE, {state.spec.name: state.model.observations for state in self.states})
+
+    def refresh(self, state):
+        """刷新单个来源, 返回节点是否有更新"""
+        spec = state.spec
+        now = datetime.datetime.now(BEIJING_TZ)
+        updated = False
+        with use_budget(Budget(self.refresh_seconds, name=spec.name)):
+            try:
+                article_url = spec.load("discover")(self.session)
+            except Exception as e:
+                print(f"[{spec.name}] 发现最新文章失败: {e}")
+                article_url = None
+
+            is_new = bool(article_url) and article_url != state.article_url
+            is_stale = time.time() - state.fetched_at > self.max_staleness
+            if is_new:
+                published = article_date(article_url)
+                # 只有当天的新文章才能反映发布时刻, 补发的旧文章不计入节奏
+                if state.article_url is not None and published in (None, now.date()):
+                    state.model.observe(now)
+                state.published_on = published or now.date()
+                print(f"[{spec.name}] 发现新文章: {article_url}")
+
+            if is_new or is_stale:
+                state.items = fetch_source(spec, self.session, self.breakers, now.strftime("%m-%d"), article_url)
+                state.article_url = article_url or state.article_url
+                state.fetched_at = time.time()
+                updated = True
+
+        interval = state.model.next_interval(now, published_today=state.published_on == now.date())
+        state.next_due = time.time() + interval
+        print(f"[{spec.name}] 下次检查在 {int(interval)} 秒后")
+        return updated
+
+    def publish(self, outputs):
+        """把同一输出文件的所有来源节点合并后写出"""
+        states = [state for state in self.states if state.spec.output in outputs]
+        published = publish([state.spec for state in states], {state.spec.name: state.items for state in states})
+        for output, items in published.items():
+            for listener in self.listeners:
+                listener(output, items)
+
+    def stop(self, *_):
+        self._stop.set()
+
+    def run_forever(self):
+        print(f"守护进程启动, 来源: {', '.join(state.spec.name for state in self.states)}")
+        while not self._stop.is_set():
+            now = time.time()
+            due = [state for state in self.states if state.next_due <= now]
+            if not due:
+                self._stop.wait(min(state.next_due for state in self.states) - now)
+                continue
+            changed = {state.spec.output for state in due if self.refresh(state)}
+            if changed:
+                self.publish(changed)
+            self._save_cadence()
+        print("守护进程已停止")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="常驻运行, 按来源自适应刷新节点")
+    parser.add_argument("--sources", default="", help="逗号分隔的来源名称, 默认全部")
+    parser.add_argument("--max-staleness", type=int, default=6 * 3600, help="即使没有新文章也强制刷新的间隔(秒)")
+    args = parser.parse_args(argv)
+
+    names = [name for name in args.sources.split(",") if name]
+    daemon = Daemon(names, max_staleness=args.max_staleness)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    try:
+        daemon.run_forever()
+    except KeyboardInterrupt:
+        daemon.stop()
+
+
+if __name__ == "__main__":
+    main()
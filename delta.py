@@ -0,0 +1,117 @@
+"""增量订阅: 每次发布时与上一版本按节点指纹比较, 只传输新增、删除和变化的节点
+
+每个输出文件 (如 good5.txt) 在 public/good5.delta/ 下维护:
+- full.json    当前版本的完整节点表 {"version": N, "nodes": {指纹: 分享链接}}
+- N.json       从 N-1 到 N 的增量 {"version": N, "base": N-1, "added": {指纹: 链接},
+               "changed": {指纹: 链接}, "removed": [指纹, ...]}
+- latest.json  {"version": N, "nodes": 节点数, "oldest": 仍保留的最早增量版本}
+
+客户端持有版本 M 时依次获取 M+1.json ... N.json 并应用 (added/changed 写入, removed 删除);
+没有本地版本或 M + 1 < oldest 时改为下载 full.json。指纹见 pipeline.fingerprint (协议 + 地址 + 端口 + 凭据),
+同一指纹的分享链接变化 (名称、sni 等) 记为 changed。节点集合没有变化时不产生新版本。
+
+来源每天给节点名加日期后缀 (sources.json 的 name_suffix "-{date}" 与 scraper5 的 "-MM-DD"),
+比较与传输前先去掉名称末尾的日期后缀, 否则每天所有节点都会记为 changed; 增量订阅中的节点名不带日期。
+"""
+import os
+import re
+from pathlib import Path
+
+from breaker import atomic_write_json
+from links import ENCODERS
+from pipeline import OUTPUT_DIR, fingerprint
+from profiling import stage
+from serialization import dumps_json, read_json
+
+# 保留的增量文件个数, 更早的客户端回退到 full.json
+MAX_DELTAS = 48
+# 名称末尾的日期后缀: 分隔符 ("-" 或空白) + MM-DD
+_DATE_SUFFIX = re.compile(r'[-\s](?:0[1-9]|1[0-2])-(?:0[1-9]|[12]\d|3[01])$')
+
+
+def delta_dir(output_filename, output_dir=OUTPUT_DIR):
+    return Path(output_dir) / (os.path.splitext(output_filename)[0] + ".delta")
+
+
+def strip_date(item):
+    """名称去掉末尾日期后缀的节点; 没有后缀时返回原节点, 否则返回副本"""
+    name = item.get("name")
+    if not isinstance(name, str):
+        return item
+    stripped = _DATE_SUFFIX.sub("", name)
+    return item if stripped == name else dict(item, name=stripped)
+
+
+def node_links(items, strip_dates=False):
+    """{指纹: 分享链接}, 跳过无法编码的节点; strip_dates 时编码前去掉名称的日期后缀"""
+    nodes = {}
+    for item in items:
+        encoder = ENCODERS.get(item.get("type"))
+        if encoder is None:
+            continue
+        try:
+            nodes[fingerprint(item)] = encoder(strip_date(item) if strip_dates else item)
+        except (KeyError, TypeError, ValueError):
+            continue
+    return nodes
+
+
+def diff(previous, current):
+    """比较两个 {指纹: 链接} 表, 返回 (added, changed, removed)"""
+    added = {key: link for key, link in current.items() if key not in previous}
+    changed = {key: link for key, link in current.items() if key in previous and previous[key] != link}
+    removed = [key for key in previous if key not in current]
+    return added, changed, removed
+
+
+def apply(nodes, delta):
+    """把增量应用到 {指纹: 链接} 表上 (原地修改并返回), 供客户端与校验使用"""
+    nodes.update(delta["added"])
+    nodes.update(delta["changed"])
+    for key in delta["removed"]:
+        nodes.pop(key, None)
+    return nodes
+
+
+def _write_text(path, text):
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(text, encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def publish_delta(output_filename, items, output_dir=OUTPUT_DIR, keep=MAX_DELTAS):
+    """写出新版本的增量与完整节点表, 返回新版本号; 没有变化时返回 None"""
+    directory = delta_dir(output_filename, output_dir)
+    with stage("emit"):
+        current = node_links(items, strip_dates=True)
+        try:
+            full = read_json(directory / "full.json")
+            version, previous = full["version"], full["nodes"]
+        except (OSError, ValueError, KeyError, TypeError):
+            # 完整节点表丢失时版本号仍从 latest.json 接续, 避免客户端看到版本回退
+            previous = None
+            try:
+                version = read_json(directory / "latest.json")["version"]
+            except (OSError, ValueError, KeyError, TypeError):
+                version = 0
+
+        if previous is not None:
+            added, changed, removed = diff(previous, current)
+            if not (added or changed or removed):
+                return None
+        version += 1
+        directory.mkdir(parents=True, exist_ok=True)
+        if previous is not None:
+            delta = {"version": version, "base": version - 1, "added": added, "changed": changed, "removed": removed}
+            _write_text(directory / f"{version}.json", dumps_json(delta))
+            print(f"{output_filename}: 增量版本 {version}, 新增 {len(added)}, 变化 {len(changed)}, 删除 {len(removed)}")
+        _write_text(directory / "full.json", dumps_json({"version": version, "nodes": current}))
+
+        # 清理超出保留数量的旧增量; 没有上一版本时 (首次发布或 full.json 丢失) 之前的增量都已无法衔接
+        oldest = max(1, version - keep + 1) if previous is not None else version + 1
+        for entry in os.scandir(directory):
+            stem, ext = os.path.splitext(entry.name)
+            if ext == ".json" and stem.isdigit() and int(stem) < oldest:
+                os.unlink(entry.path)
+        atomic_write_json(directory / "latest.json", {"version": version, "nodes": len(current), "oldest": oldest})
+    return version
@@ -0,0 +1,214 @@
+"""通用来源引擎: 按 sources.json 的声明抓取节点
+
+每个声明式来源包含:
+- entry          主页地址, 也是熔断器的默认探测地址
+- article        从主页提取最新文章链接的正则 (取第一个匹配)
+- subscriptions  从文章页提取订阅文件链接的正则; 省略时文章页本身就是节点列表
+- encoding       订阅内容编码: plain (每行一个链接) / base64 / clash-yaml
+- name_suffix    节点名后缀模板, {date} 为当天的 MM-DD, 默认不加
+- parser         解析分享链接的函数 "模块:函数", 默认 uriparse:parse_uri
+- probe / output 同 sources.SourceSpec
+
+本地来源用 paths (文件或目录列表) 代替 entry / article / subscriptions, encoding 另可取 auto (默认),
+文件经 mmap 逐行读取 (见 localfiles.py), 之后与抓取的节点走相同的校验/去重/写出流程。
+
+正则在首次加载时编译一次; 同一文章的多个订阅文件并发下载, 主机节奏由共享限速器控制。
+多个来源同时下载同一订阅文件时, 请求与解析都只做一次 (politeness.SingleFlight)。
+新增站点只需在 sources.json 中加一段声明。
+"""
+import base64
+import hashlib
+import importlib
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urljoin
+
+from budget import current_budget, submit as budget_submit
+from checkpoint import remembered
+from politeness import SingleFlight
+from profiling import stage
+from sources import read_config
+from validation import validate
+
+USER_AGENT = 'Mozilla/5.0'
+MAX_FETCH_WORKERS = 8
+ENCODINGS = ("plain", "base64", "clash-yaml")
+LOCAL_ENCODINGS = ("auto",) + ENCODINGS
+DEFAULT_PARSER = "uriparse:parse_uri"
+LINK_SCHEMES = ('ss://', 'vless://', 'trojan://', 'vmess://')
+
+_definitions = None
+# 订阅下载+解析的合并器, 键为 (URL, 编码, 解析函数)
+_parses = SingleFlight()
+
+
+class Extractor:
+    """预编译的链接提取规则"""
+
+    def __init__(self, config):
+        flags = 0
+        for flag in config.get("flags", ()):
+            flags |= getattr(re, flag)
+        self.pattern = re.compile(config["pattern"], flags)
+        self.group = config.get("group", 1 if self.pattern.groups else 0)
+
+    def findall(self, text, base_url):
+        """返回去重后的绝对链接, 保持页面中的先后顺序"""
+        links = (urljoin(base_url, match.group(self.group)) for match in self.pattern.finditer(text))
+        return list(dict.fromkeys(links))
+
+    def first(self, text, base_url):
+        match = self.pattern.search(text)
+        return urljoin(base_url, match.group(self.group)) if match else None
+
+
+class SourceDefinition:
+    def __init__(self, name, config):
+        self.name = name
+        self.paths = config.get("paths")
+        if isinstance(self.paths, str):
+            self.paths = [self.paths]
+        if self.paths is None and not (config.get("entry") and config.get("article")):
+            raise ValueError(f"来源 {name} 需要 entry 与 article, 或本地文件 paths")
+        self.entry = config.get("entry")
+        self.article = Extractor(config["article"]) if config.get("article") else None
+        self.subscriptions = Extractor(config["subscriptions"]) if config.get("subscriptions") else None
+        allowed = LOCAL_ENCODINGS if self.paths is not None else ENCODINGS
+        self.encoding = config.get("encoding", "auto" if self.paths is not None else "plain")
+        if self.encoding not in allowed:
+            raise ValueError(f"来源 {name} 的 encoding 无效: {self.encoding} (可选: {', '.join(allowed)})")
+        self.name_suffix = config.get("name_suffix", "")
+        self.parser_ref = config.get("parser", DEFAULT_PARSER)
+        self._parser = None
+
+    @property
+    def parser(self):
+        if self._parser is None:
+            module, _, func = self.parser_ref.partition(":")
+            self._parser = getattr(importlib.import_module(module), func)
+        return self._parser
+
+
+def definitions():
+    """已编译的来源定义 {名称: SourceDefinition}, 进程内只加载一次"""
+    global _definitions
+    if _definitions is None:
+        _definitions = {name: SourceDefinition(name, config) for name, config in read_config().items()}
+    return _definitions
+
+
+def decode_body(text, encoding, parser):
+    """把订阅内容解码为节点列表, 格式错误的节点在这里丢弃"""
+    if encoding == "clash-yaml":
+        from serialization import iter_clash_proxies
+        with stage("parse"):
+            items = list(iter_clash_proxies(text))
+        return validate(items)
+    text = text.strip()
+    if encoding == "base64" and not any(scheme in text for scheme in LINK_SCHEMES):
+        try:
+            text = base64.b64decode(text + "=" * (-len(text) % 4)).decode('utf-8')
+        except ValueError:
+            pass  # 不是 base64, 按明文解析
+    with stage("parse"):
+        uris = dict.fromkeys(
+            line.split()[0] for line in map(str.strip, text.splitlines()) if line.startswith(LINK_SCHEMES)
+        )
+        items = [item for item in map(parser, uris) if item]
+    return validate(items)
+
+
+def _local_version(source):
+    """本地来源没有文章, 用文件列表与修改时间的摘要充当 "文章", 文件变化时守护进程会重新读取"""
+    from localfiles import signature
+    return "local:" + hashlib.blake2b(signature(source.paths).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def discover(name, session):
+    """访问主页, 返回最新文章URL"""
+    source = definitions()[name]
+    if source.paths is not None:
+        return _local_version(source)
+    with stage("discovery"):
+        response = session.get(source.entry, headers={'User-Agent': USER_AGENT}, timeout=15)
+        response.raise_for_status()
+        return source.article.first(response.text, source.entry)
+
+
+def articles(name, session, limit):
+    """访问主页, 返回最近 limit 篇文章的URL (按页面顺序, 新的在前)"""
+    source = definitions()[name]
+    if source.paths is not None:
+        return [_local_version(source)]
+    with stage("discovery"):
+        response = session.get(source.entry, headers={'User-Agent': USER_AGENT}, timeout=15)
+        response.raise_for_status()
+        return source.article.findall(response.text, source.entry)[:limit]
+
+
+def _download(session, url, source):
+    key = (url, source.encoding, source.parser_ref)
+
+    def download():
+        response = session.get(url, headers={'User-Agent': USER_AGENT}, timeout=15)
+        response.raise_for_status()
+        return decode_body(response.text, source.encoding, source.parser)
+
+    def shared():
+        # 多个来源同时下载同一订阅时只解析一次; 各自拿一份浅拷贝, _finish 加名称后缀时互不影响
+        budget = current_budget()
+        items = _parses.do(key, download, timeout=budget.remaining() if budget is not None else None)
+        return [dict(item) for item in items]
+    return remembered("subscription", " ".join(key), shared)
+
+
+def fetch(name, session, date_suffix, article_url=None, parse_links=None):
+    """抓取一个声明式来源, 已知文章URL时跳过主页; parse_links 见 localfiles.read_nodes, 只用于本地来源"""
+    source = definitions()[name]
+    if source.paths is not None:
+        return _finish(source, _read_local(source, parse_links), date_suffix)
+    article_url = article_url or discover(name, session)
+    if not article_url:
+        print(f"[{name}] 未找到文章链接")
+        return []
+
+    response = session.get(article_url, headers={'User-Agent': USER_AGENT}, timeout=15)
+    response.raise_for_status()
+    if source.subscriptions is None:
+        items = decode_body(response.text, source.encoding, source.parser)
+    else:
+        urls = source.subscriptions.findall(response.text, article_url)
+        items = []
+        if urls:
+            # 预算耗尽时不再等待未完成的下载, 直接返回已完成的部分
+            budget = current_budget()
+            executor = ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(urls)))
+            futures = [budget_submit(executor, _download, session, url, source) for url in urls]
+            done, not_done = wait(futures, timeout=budget.remaining() if budget else None)
+            executor.shutdown(wait=False, cancel_futures=True)
+            if not_done:
+                print(f"[{name}] 预算耗尽, 放弃 {len(not_done)} 个未完成的订阅下载")
+            for url, future in zip(urls, futures):
+                if future not in done:
+                    continue
+                if future.exception() is not None:
+                    print(f"[{name}] 下载订阅失败: {url}, 错误: {future.exception()}")
+                    continue
+                items.extend(future.result())
+    return _finish(source, items, date_suffix)
+
+
+def _read_local(source, parse_links=None):
+    from localfiles import read_nodes
+    with stage("parse"):
+        items = read_nodes(source.paths, source.encoding, source.parser, parse_links)
+    return validate(items)
+
+
+def _finish(source, items, date_suffix):
+    if date_suffix and source.name_suffix:
+        suffix = source.name_suffix.format(date=date_suffix)
+        for item in items:
+            item['name'] = f"{item.get('name', '')}{suffix}"
+    print(f"[{source.name}] 解析出 {len(items)} 个节点")
+    return items
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""统一命令行入口
+
+    ./getip.py run --sources nodesdz,freeclash [--format base64,clash] [--profile [DIR]] [--backfill N] [--best K]
+    ./getip.py run --record run.http.gz / --replay run.http.gz --output DIR [--replay-timing [SCALE]]
+    ./getip.py run --workers 4 / ./getip.py worker [--queue PATH]
+    ./getip.py run --resume
+    ./getip.py run --tokens tokens.txt [--token-nodes K]
+    ./getip.py daemon [--sources ...]
+    ./getip.py serve [--port 8080] [--daemon]
+    ./getip.py history server 1.2.3.4
+    ./getip.py sources
+
+本文件只导入标准库; 来源脚本、requests、yaml 等依赖由所选子命令/来源/输出格式按需导入。
+冷启动耗时用 bench/bench_startup.py (python -X importtime) 跟踪。
+"""
+import argparse
+import sys
+
+
+def _split(value):
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+def cmd_sources(args):
+    from sources import SOURCES
+    for spec in SOURCES.values():
+        print(f"{spec.name:<12} {spec.module:<10} -> {spec.output}")
+    return 0
+
+
+def cmd_run(args):
+    from pipeline import OUTPUT_FORMATS, run
+    from sources import get_sources
+
+    formats = _split(args.format)
+    unknown = [fmt for fmt in formats if fmt not in OUTPUT_FORMATS]
+    if unknown:
+        print(f"未知输出格式: {', '.join(unknown)} (可选: {', '.join(OUTPUT_FORMATS)})", file=sys.stderr)
+        return 2
+    try:
+        specs = get_sources(_split(args.sources))
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 2
+    if args.workers is not None and (args.record or args.replay):
+        print("--workers 不能与 --record/--replay 同时使用 (录制与回放只覆盖本进程的请求)", file=sys.stderr)
+        return 2
+    if args.replay and args.best:
+        print("--best 不能与 --replay 同时使用 (探测要连接真实节点, 回放不访问网络)", file=sys.stderr)
+        return 2
+    if args.replay and not args.output:
+        print("--replay 需要用 --output 指定输出目录 (回放不覆盖 public/ 下的线上订阅)", file=sys.stderr)
+        return 2
+    tokens = None
+    if args.tokens:
+        from hashring import read_tokens
+        try:
+            tokens = read_tokens(args.tokens)
+        except OSError as e:
+            print(f"无法读取令牌表: {e}", file=sys.stderr)
+            return 2
+    published = run(specs, formats, budget_seconds=args.budget, profile_dir=args.profile,
+                    trace_memory=args.trace_memory, backfill=args.backfill, best=args.best,
+                    record=args.record, replay=args.replay, replay_timing=args.replay_timing,
+                    workers=args.workers, resume=args.resume, tokens=tokens, token_nodes=args.token_nodes,
+                    output_dir=args.output)
+    return 0 if published else 1
+
+
+def cmd_daemon(args):
+    from daemon import main
+    return main(args.rest)
+
+
+def cmd_serve(args):
+    from server import main
+    return main(args.rest)
+
+
+def cmd_worker(args):
+    from workqueue import main
+    return main(args.rest)
+
+
+def cmd_history(args):
+    from archive import main
+    return main(args.rest)
+
+
+# 参数原样转交给对应模块的子命令: (名称, 处理函数, 帮助)
+PASSTHROUGH = (
+    ("daemon", cmd_daemon, "常驻运行, 按来源自适应刷新"),
+    ("serve", cmd_serve, "启动订阅 HTTP 服务"),
+    ("worker", cmd_worker, "从工作队列领取任务执行 (配合 run --workers)"),
+    ("history", cmd_history, "节点历史归档的导入与查询"),
+)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="getip", description="免费节点抓取与订阅生成")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="抓取一次并写出订阅文件")
+    run_parser.add_argument("--sources", default="", help="逗号分隔的来源, 默认全部 (见 getip sources)")
+    run_parser.add_argument("--format", default="base64", help="逗号分隔的输出格式: base64, clash")
+    run_parser.add_argument("--output", metavar="DIR", default=None, help="订阅文件的输出目录 (默认 public/, 回放时必须指定)")
+    run_parser.add_argument("--budget", type=float, default=None, help="整次运行的期限(秒)")
+    run_parser.add_argument("--profile", nargs="?", const="profile", default=None, metavar="DIR",
+                            help="按阶段剖析, 结果写入 DIR (默认 profile/)")
+    run_parser.add_argument("--trace-memory", action="store_true", help="用 tracemalloc 统计各阶段峰值内存")
+    run_parser.add_argument("--backfill", type=int, default=1, metavar="N",
+                            help="每个来源抓取最近 N 篇文章, 已处理过的旧文章复用文章索引 (默认只取最新一篇)")
+    run_parser.add_argument("--best", type=int, default=0, metavar="K",
+                            help="另外写出 best.txt: 按探测延迟为每个地区选出 K 个最优节点")
+    run_parser.add_argument("--tokens", metavar="FILE",
+                            help="为 FILE 中的每个令牌 (每行一个) 写出 tokens/<令牌>.txt: 按一致性哈希分配的个人订阅")
+    run_parser.add_argument("--token-nodes", type=int, default=None, metavar="K",
+                            help="每个个人订阅的节点数 (默认 20)")
+    archive_group = run_parser.add_mutually_exclusive_group()
+    archive_group.add_argument("--record", metavar="FILE", help="把本次运行的全部 HTTP 请求与响应录制到 FILE")
+    archive_group.add_argument("--replay", metavar="FILE", help="从 FILE 回放, 不访问网络")
+    run_parser.add_argument("--replay-timing", type=float, nargs="?", const=1.0, default=None, metavar="SCALE",
+                            help="回放时按录制耗时 * SCALE 等待 (默认 1, 即原始节奏)")
+    run_parser.add_argument("--resume", action="store_true",
+                            help="续跑上次被中断的运行: 复用检查点中已完成的发现/下载/抓取/探测结果")
+    run_parser.add_argument("--workers", type=int, default=None, metavar="N",
+                            help="分布式运行: 抓取/解析/探测放进工作队列, 并在本机启动 N 个 worker (0 表示只用 getip worker)")
+    run_parser.set_defaults(handler=cmd_run)
+
+    sources_parser = sub.add_parser("sources", help="列出可用来源")
+    sources_parser.set_defaults(handler=cmd_sources)
+
+    for name, handler, help_text in PASSTHROUGH:
+        passthrough = sub.add_parser(name, help=help_text, add_help=False)
+        passthrough.add_argument("rest", nargs=argparse.REMAINDER)
+        passthrough.set_defaults(handler=handler)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # argparse 的 REMAINDER 不接受以 "-" 开头的参数 (如 serve --port), 转交型子命令绕过解析直接分发
+    for name, handler, _ in PASSTHROUGH:
+        if argv and argv[0] == name:
+            return handler(argparse.Namespace(rest=argv[1:])) or 0
+    args = build_parser().parse_args(argv)
+    return args.handler(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""按令牌生成的个人订阅 (getip run --tokens FILE)
+
+所有用户使用同一份 good5.txt 时, 客户端都连列表最前面的几个节点, 这些节点很快过载。
+本模块为令牌表中的每个令牌写出 public/tokens/<令牌>.txt, 节点子集与顺序由加权一致性哈希决定:
+- 每个节点在哈希环上放置 round(MAX_VNODES * 健康度) 个虚拟点 (至少 1 个)。健康度 = 平滑后的探测成功率
+  * 延迟系数, 取自 ranking 的探测历史 (.cache/probes.json); 没有历史的节点成功率按 0.5 计
+- 每次探测都会让健康度小幅波动, 环上使用的权重记录在 .cache/hashring.json, 健康度与上次的权重相差
+  不到 HEALTH_HYSTERESIS 时沿用上次的权重, 避免每次运行都重排大量令牌的订阅
+- 令牌哈希到环上一点, 顺时针取前 K 个不同的节点, 顺序即环上的先后; 节点集合与健康度不变时订阅不变
+- 第 j 个虚拟点的位置只取决于 (节点指纹, j), 增删节点或健康度变化只增删该节点自己的虚拟点,
+  只有经过这些点的令牌 (约 K / 节点数) 的订阅会变化
+- 分享链接按节点只编码一次 (delta.node_links), 各令牌的订阅直接拼接已编码的链接
+
+重排比例、负载分布与渲染耗时见 bench/bench_hashring.py。
+"""
+import bisect
+import hashlib
+import os
+import re
+
+from breaker import CACHE_DIR, atomic_write_json
+from pipeline import OUTPUT_DIR
+from profiling import stage
+from ranking import DEFAULT_LATENCY_MS, ProbeHistory
+from serialization import read_json
+
+RING_WEIGHTS_FILE = CACHE_DIR / "hashring.json"
+TOKENS_DIR = "tokens"
+# 每个令牌的订阅包含的节点数
+TOKEN_NODES = 20
+# 健康度为 1 的节点在环上的虚拟点数
+MAX_VNODES = 100
+# 健康度与上次权重相差超过该值才更新权重
+HEALTH_HYSTERESIS = 0.1
+# 令牌直接用作文件名, 只允许这些字符
+TOKEN_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+
+def _hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def health(history, key):
+    """0~1 的健康度: 平滑后的成功率 * 延迟系数 (不超过默认延迟时为 1, 越慢越小)"""
+    latency = history.latency(key)
+    factor = 1.0 if latency is None else min(1.0, DEFAULT_LATENCY_MS / max(latency, 1.0))
+    return round((1 - history.failure_rate(key)) * factor, 3)
+
+
+def stable_weights(current, previous, hysteresis=HEALTH_HYSTERESIS):
+    """{指纹: 健康度} -> 环上使用的权重: 与上次权重 previous 相差不到 hysteresis 的节点沿用上次的权重"""
+    weights = {}
+    for key, value in current.items():
+        last = previous.get(key)
+        weights[key] = last if last is not None and abs(value - last) < hysteresis else value
+    return weights
+
+
+class HashRing:
+    """加权一致性哈希环, 节点以指纹标识"""
+
+    def __init__(self, weights, vnodes=MAX_VNODES):
+        """weights: {指纹: 0~1 的权重}"""
+        self.keys = list(weights)
+        points = []
+        for index, key in enumerate(self.keys):
+            for replica in range(max(1, round(vnodes * weights[key]))):
+                points.append((_hash(f"{key}#{replica}"), index))
+        points.sort()
+        self._points = [point for point, _ in points]
+        self._owners = [index for _, index in points]
+
+    def lookup(self, token, k):
+        """令牌分到的至多 k 个节点指纹, 按环上顺序"""
+        k = min(k, len(self.keys))
+        chosen, seen = [], set()
+        total = len(self._points)
+        start = bisect.bisect(self._points, _hash(token))
+        for step in range(total):
+            if len(chosen) >= k:
+                break
+            index = self._owners[(start + step) % total]
+            if index not in seen:
+                seen.add(index)
+                chosen.append(self.keys[index])
+        return chosen
+
+
+def read_tokens(path):
+    """读取令牌表: 每行一个令牌, 忽略空行与 # 注释, 跳过不合法的令牌与重复令牌"""
+    tokens = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            token = line.split("#", 1)[0].strip()
+            if not token or token in tokens:
+                continue
+            if TOKEN_PATTERN.fullmatch(token):
+                tokens[token] = None
+            else:
+                print(f"令牌 {token!r} 不合法 (只允许 1~64 个字母、数字、_ 与 -), 已跳过")
+    return list(tokens)
+
+
+def publish_tokens(items, tokens, k=TOKEN_NODES, output_dir=OUTPUT_DIR, history=None, weights_path=RING_WEIGHTS_FILE):
+    """为每个令牌写出 tokens/<令牌>.txt (base64 订阅), 删除不在令牌表中的旧订阅, 返回使用的哈希环
+
+    上次使用的权重从 weights_path 读取, 本次的权重写回该文件。
+    """
+    from delta import node_links
+    from links import write_base64_lines
+
+    history = history if history is not None else ProbeHistory()
+    try:
+        previous = read_json(weights_path)
+    except (OSError, ValueError):
+        previous = {}
+    with stage("emit"):
+        links = node_links(items)
+        weights = stable_weights({key: health(history, key) for key in links}, previous)
+        ring = HashRing(weights)
+        directory = os.path.join(output_dir, TOKENS_DIR)
+        os.makedirs(directory, exist_ok=True)
+        for token in tokens:
+            write_base64_lines(os.path.join(directory, f"{token}.txt"), (links[key] for key in ring.lookup(token, k)))
+        current = {f"{token}.txt" for token in tokens}
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".txt") and entry.name not in current:
+                os.unlink(entry.path)
+    try:
+        atomic_write_json(weights_path, weights)
+    except OSError as e:
+        print(f"保存哈希环权重失败: {e}")
+    print(f"个人订阅: {len(tokens)} 个令牌, 每个 {min(k, len(links))} 个节点 (共 {len(links)} 个节点)")
+    return ring
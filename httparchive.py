@@ -0,0 +1,180 @@
+"""HTTP 录制与回放 (getip run --record FILE / --replay FILE --output DIR [--replay-timing [SCALE]])
+
+录制: 在 Session 上挂载 RecordingAdapter, 照常访问网络, 同时把每个请求与响应 (主页、文章页、txt/yaml 订阅,
+包括连接错误) 追加写入 gzip 压缩的 JSON Lines 存档。正文记录解压后的内容, 能按 UTF-8 解码时存文本,
+否则存 base64。
+
+回放: 挂载 ReplayAdapter 的 Session 完全不访问网络, 按 (方法, URL) 从存档取出响应; 同一 URL 被请求多次时
+按录制顺序依次返回, 超出录制次数后重复最后一次。默认立即返回且不经礼貌限速, 只比较解析/去重/写出的耗时;
+指定 timing 时按录制时的耗时 * timing 等待, 并使用正常的限速器, 重现线上运行的节奏。
+
+对同一份存档反复回放, 可以在真实的线上内容上做可重复、不依赖网络的性能对比。
+"""
+import base64
+import datetime
+import gzip
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+FORMAT = "getip-http-archive"
+VERSION = 1
+# 存档中的正文已解压, 这些头部回放时不再适用
+_DROPPED_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding", "connection"})
+
+
+class ArchiveWriter:
+    """线程安全地追加写入存档, 关闭后到达的记录 (如已放弃的请求) 直接丢弃"""
+
+    def __init__(self, path):
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._lock = threading.Lock()
+        self.count = 0
+        self._write({"format": FORMAT, "version": VERSION, "created": time.time()})
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._file.write("\n")
+
+    def write(self, record):
+        with self._lock:
+            if self._file is None:
+                return
+            self._write(record)
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _encode_body(body):
+    try:
+        return {"text": body.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {"body_base64": base64.b64encode(body).decode('ascii')}
+
+
+def _decode_body(entry):
+    if "text" in entry:
+        return entry["text"].encode('utf-8')
+    return base64.b64decode(entry.get("body_base64", ""))
+
+
+class RecordingAdapter(HTTPAdapter):
+    """照常发送请求, 同时把请求与响应写入存档"""
+
+    def __init__(self, writer, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = writer
+
+    def send(self, request, **kwargs):
+        record = {"method": request.method, "url": request.url}
+        started = time.monotonic()
+        try:
+            response = super().send(request, **kwargs)
+            body = response.content  # 读完正文再计时, 回放的耗时包含下载
+        except requests.RequestException as e:
+            record.update(elapsed=time.monotonic() - started, error=f"{type(e).__name__}: {e}")
+            self.writer.write(record)
+            raise
+        record.update(
+            elapsed=time.monotonic() - started,
+            status=response.status_code,
+            reason=response.reason,
+            headers={k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS},
+            **_encode_body(body),
+        )
+        self.writer.write(record)
+        return response
+
+    def close(self):
+        super().close()
+        self.writer.close()
+
+
+def read_archive(path):
+    """读取存档, 返回 {(方法, URL): [记录, ...]} (按录制顺序)"""
+    entries = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline() or "{}")
+        if header.get("format") != FORMAT:
+            raise ValueError(f"不是 HTTP 录制存档: {path}")
+        for line in f:
+            record = json.loads(line)
+            entries.setdefault((record["method"], record["url"]), []).append(record)
+    return entries
+
+
+class ReplayAdapter(BaseAdapter):
+    """从存档返回响应, 不访问网络; 存档中没有的请求视为连接错误"""
+
+    def __init__(self, entries, timing=None):
+        super().__init__()
+        self.entries = entries
+        self.timing = timing
+        self._cursor = {}
+        self._lock = threading.Lock()
+
+    def _next(self, key):
+        with self._lock:
+            records = self.entries.get(key)
+            if not records:
+                return None
+            position = self._cursor.get(key, 0)
+            self._cursor[key] = position + 1
+            return records[min(position, len(records) - 1)]
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        record = self._next((request.method, request.url))
+        if record is None:
+            raise requests.ConnectionError(f"回放存档中没有该请求: {request.method} {request.url}", request=request)
+        if self.timing:
+            time.sleep(record["elapsed"] * self.timing)
+        if "error" in record:
+            raise requests.ConnectionError(record["error"], request=request)
+
+        response = requests.Response()
+        response.status_code = record["status"]
+        response.reason = record.get("reason")
+        response.headers = CaseInsensitiveDict(record["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = _decode_body(record)
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = datetime.timedelta(seconds=record["elapsed"])
+        return response
+
+    def close(self):
+        pass
+
+
+def record_session(session, path):
+    """在 session 上挂载录制适配器 (沿用原适配器的重试配置), 关闭 session 时写完存档"""
+    writer = ArchiveWriter(path)
+    adapter = RecordingAdapter(writer, max_retries=session.get_adapter("https://").max_retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return writer
+
+
+def replay_session(path, timing=None):
+    """创建从存档回放的 session; 不指定 timing 时使用不限速的限速器"""
+    from politeness import HostLimiter, PoliteSession, get_limiter
+
+    limiter = get_limiter() if timing else HostLimiter(
+        initial_rate=1e9, max_rate=1e9, burst=10**9, initial_concurrency=64, max_concurrency=64)
+    session = PoliteSession(limiter)
+    adapter = ReplayAdapter(read_archive(path), timing)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,166 @@
+"""节点 -> 分享链接 (vless:// ss:// trojan:// vmess://) 的编码
+
+每种协议一个编码器, 登记在 ENCODERS 中, 按节点的 type 直接分派。
+链接参数全部取自节点自身的字段 (parse_generic_uri 解析出的 sni / 公钥 / flow 等),
+参数顺序与字段映射在模块加载时固定为模板, 编码时只做取值和拼接。
+
+write_base64_lines 把链接逐条编码写入订阅文件, 内存占用与节点数无关。
+"""
+import base64
+import json
+import os
+from functools import lru_cache
+from urllib.parse import quote
+
+ENCODERS = {}
+
+# 参数值(公钥、sni 等)在大量节点间重复, 缓存其 URL 编码结果
+_quote_param = lru_cache(maxsize=4096)(lambda value: quote(value, safe=''))
+
+_vmess_json = json.JSONEncoder(separators=(',', ':')).encode
+
+
+def register_encoder(node_type):
+    """登记某个协议的编码器: encoder(item) -> 链接字符串"""
+    def decorator(func):
+        ENCODERS[node_type] = func
+        return func
+    return decorator
+
+
+def _query(item, template):
+    """按模板 ((参数名, 取值函数), ...) 生成查询串, 空值跳过"""
+    parts = []
+    for key, getter in template:
+        value = getter(item)
+        if value:
+            parts.append(f"{key}={_quote_param(str(value))}")
+    return "&".join(parts)
+
+
+def _reality(field):
+    return lambda item: (item.get("reality-opts") or {}).get(field)
+
+
+_VLESS_REALITY_TEMPLATE = (
+    ("security", lambda item: "reality"),
+    ("sni", lambda item: item.get("servername")),
+    ("fp", lambda item: item.get("client-fingerprint")),
+    ("pbk", _reality("public-key")),
+    ("sid", _reality("short-id")),
+    ("flow", lambda item: item.get("flow")),
+)
+_VLESS_TLS_TEMPLATE = (
+    ("security", lambda item: item.get("security") or ("tls" if item.get("tls") else None)),
+    ("sni", lambda item: item.get("servername")),
+    ("fp", lambda item: item.get("client-fingerprint")),
+    ("flow", lambda item: item.get("flow")),
+    ("type", lambda item: item.get("network") if item.get("network") not in (None, "tcp") else None),
+)
+_TROJAN_TEMPLATE = (
+    ("sni", lambda item: item.get("sni") or item.get("servername")),
+    ("type", lambda item: item.get("network") if item.get("network") not in (None, "tcp") else None),
+)
+
+
+@register_encoder("vless")
+def encode_vless(item):
+    template = _VLESS_REALITY_TEMPLATE if "reality-opts" in item else _VLESS_TLS_TEMPLATE
+    query = _query(item, template)
+    link = f"vless://{item['uuid']}@{item['server']}:{item['port']}"
+    if query:
+        link += "?" + query
+    return f"{link}#{quote(item.get('name', ''))}"
+
+
+@register_encoder("ss")
+def encode_ss(item):
+    cipher = item.get("cipher")
+    password = item.get("password", "")
+    if cipher and cipher != "unknown":
+        # SIP002: userinfo = base64url(cipher:password), 不带填充
+        userinfo = base64.urlsafe_b64encode(f"{cipher}:{password}".encode('utf-8')).decode('ascii').rstrip("=")
+    else:
+        # 解析时未能拆出加密方式, 原样保留链接中的 userinfo
+        userinfo = password
+    return f"ss://{userinfo}@{item['server']}:{item.get('port', 443)}#{quote(item.get('name', ''))}"
+
+
+@register_encoder("trojan")
+def encode_trojan(item):
+    query = _query(item, _TROJAN_TEMPLATE)
+    link = f"trojan://{item.get('password', '')}@{item['server']}:{item.get('port', 443)}"
+    if query:
+        link += "?" + query
+    return f"{link}#{quote(item.get('name', ''))}"
+
+
+@register_encoder("vmess")
+def encode_vmess(item):
+    vmess_data = {
+        "v": "2", "ps": item.get("name", ""), "add": item["server"],
+        "port": str(item.get("port", 443)), "id": item.get("uuid", ""),
+        # 保留 alterId 原始类型, 解析后与原节点一致
+        "aid": item.get("alterId", 0), "scy": item.get("cipher", "auto"),
+        "net": item.get("network", "tcp"),
+        "tls": "tls" if item.get("tls") else ""
+    }
+    ws_opts = item.get("ws-opts") or {}
+    if ws_opts.get("path"):
+        vmess_data["path"] = ws_opts["path"]
+    host = (ws_opts.get("headers") or {}).get("Host")
+    if host:
+        vmess_data["host"] = host
+    return "vmess://" + base64.b64encode(_vmess_json(vmess_data).encode('utf-8')).decode('ascii')
+
+
+def create_link(item):
+    """把单个节点配置编码为分享链接, 不支持的协议返回 None"""
+    encoder = ENCODERS.get(item.get("type"))
+    return encoder(item) if encoder is not None else None
+
+
+def iter_links(items):
+    """逐个编码, 跳过无法编码的节点 (缺少必需字段等)"""
+    for item in items:
+        encoder = ENCODERS.get(item.get("type"))
+        if encoder is None:
+            continue
+        try:
+            yield encoder(item)
+        except (KeyError, TypeError, ValueError):
+            continue
+
+
+def create_links(items):
+    return list(iter_links(items))
+
+
+def write_base64_lines(path, lines, chunk_size=48 * 1024):
+    """把 "\n".join(lines) 的 base64 编码写入 path, 结果与整体编码逐字节相同
+
+    按 3 字节对齐的块分段编码 (3 字节正好对应 4 个 base64 字符, 分段不会产生中间填充),
+    不足一块的尾部留到下一段。先写临时文件再替换; 没有任何行时不创建文件。返回写出的行数。
+    """
+    chunk_size -= chunk_size % 3
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    count = 0
+    pending = bytearray()
+    try:
+        with open(tmp_path, 'wb') as f:
+            for line in lines:
+                if count:
+                    pending += b"\n"
+                pending += line.encode('utf-8')
+                count += 1
+                if len(pending) >= chunk_size:
+                    aligned = len(pending) - len(pending) % 3
+                    f.write(base64.b64encode(pending[:aligned]))
+                    del pending[:aligned]
+            f.write(base64.b64encode(pending))
+        if count:
+            os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return count
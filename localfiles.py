@@ -0,0 +1,123 @@
+"""本地订阅文件的读取 (sources.json 中带 paths 的来源)
+
+文件通过 mmap 读取, 逐行产出, 不会把整个文件读成一个 Python 字符串:
+- plain       每行一个分享链接, 直接在映射上 readline
+- base64      整个文件是订阅内容的 base64 (可带换行), 按 4 字符对齐的块分段解码, 再在解码结果上切行
+- clash-yaml  把映射交给 serialization.iter_clash_proxies 按事件流解析
+- auto        按扩展名 (.yaml / .yml) 或文件开头的内容判断以上三种格式
+
+paths 中的目录按文件名顺序读取其中的全部文件 (不递归, 跳过隐藏文件)。
+"""
+import binascii
+import mmap
+import os
+import re
+from contextlib import contextmanager
+
+ENCODINGS = ("auto", "plain", "base64", "clash-yaml")
+LINK_PREFIXES = (b'ss://', b'vless://', b'trojan://', b'vmess://')
+# base64 分段解码的块大小 (4 的倍数)
+CHUNK_SIZE = 1024 * 1024
+_SNIFF_SIZE = 4096
+_WHITESPACE = b" \t\r\n\v\f"
+# URL 安全的 base64 字符换成标准字符, a2b_base64 会静默丢弃它不认识的字符
+_URLSAFE = bytes.maketrans(b"-_", b"+/")
+_PROXIES_RE = re.compile(rb'^proxies\s*:', re.MULTILINE)
+
+
+def iter_files(paths):
+    """展开 paths 中的文件与目录, 不存在的路径打印提示后跳过"""
+    for path in paths:
+        path = os.path.expanduser(path)
+        if os.path.isdir(path):
+            for entry in sorted(os.scandir(path), key=lambda entry: entry.name):
+                if entry.is_file() and not entry.name.startswith('.'):
+                    yield entry.path
+        elif os.path.isfile(path):
+            yield path
+        else:
+            print(f"本地订阅路径不存在: {path}")
+
+
+def signature(paths):
+    """文件列表与各自大小、修改时间的摘要, 内容变化时随之变化"""
+    parts = []
+    for path in iter_files(paths):
+        stat = os.stat(path)
+        parts.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+    return "|".join(parts)
+
+
+@contextmanager
+def mapped(path):
+    """只读映射整个文件; 空文件产出 None (mmap 不能映射长度为 0 的文件)"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield None
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def detect_encoding(path, mm):
+    if path.endswith(('.yaml', '.yml')):
+        return "clash-yaml"
+    head = mm[:_SNIFF_SIZE].lstrip()
+    if head.startswith(LINK_PREFIXES):
+        return "plain"
+    if _PROXIES_RE.search(head):
+        return "clash-yaml"
+    return "base64"
+
+
+def iter_base64_lines(mm, chunk_size=CHUNK_SIZE):
+    """分段解码 base64 内容并逐行产出 (bytes), 块内的空白字符先去掉, 不足 4 个字符的尾部留到下一段"""
+    pending = b""
+    carry = b""
+    for start in range(0, len(mm), chunk_size):
+        data = carry + mm[start:start + chunk_size].translate(_URLSAFE, _WHITESPACE)
+        aligned = len(data) - len(data) % 4
+        carry = data[aligned:]
+        lines = (pending + binascii.a2b_base64(data[:aligned])).split(b"\n")
+        pending = lines.pop()
+        yield from lines
+    if carry:
+        pending += binascii.a2b_base64(carry + b"=" * (-len(carry) % 4))
+    if pending:
+        yield pending
+
+
+def iter_link_lines(mm, encoding):
+    """产出文件中以支持的协议开头的分享链接 (str)"""
+    lines = iter(mm.readline, b"") if encoding == "plain" else iter_base64_lines(mm)
+    for line in lines:
+        line = line.strip()
+        if line.startswith(LINK_PREFIXES):
+            yield line.split()[0].decode('utf-8', 'replace')
+
+
+def read_nodes(paths, encoding, parser, parse_links=None):
+    """读取全部文件并解析为节点列表 (未去重, 未校验)
+
+    parse_links(链接迭代器) -> 节点列表, 可替换逐条调用 parser 的解析 (分布式模式下分块交给 worker)。
+    """
+    from serialization import iter_clash_proxies
+
+    items = []
+    for path in iter_files(paths):
+        try:
+            with mapped(path) as mm:
+                if mm is None:
+                    continue
+                file_encoding = detect_encoding(path, mm) if encoding == "auto" else encoding
+                if file_encoding == "clash-yaml":
+                    file_items = list(iter_clash_proxies(mm))
+                elif parse_links is not None:
+                    file_items = parse_links(iter_link_lines(mm, file_encoding))
+                else:
+                    file_items = [item for item in map(parser, iter_link_lines(mm, file_encoding)) if item]
+        except Exception as e:  # 单个文件损坏 (含 YAML 语法错误) 不影响其他文件, 也不留下出错前解析出的部分节点
+            print(f"读取本地订阅失败, 已跳过: {path}, 错误: {e}")
+            continue
+        items.extend(file_items)
+    return items
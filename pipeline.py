@@ -0,0 +1,273 @@
+"""一次完整运行: 并发抓取所选来源 -> 去重 -> 按输出文件写出
+
+getip.py run 与守护进程共用这里的抓取和写出逻辑。来源脚本只在被选中时才导入。
+"""
+import datetime
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+from budget import Budget, use_budget, submit as budget_submit
+from profiling import stage
+
+OUTPUT_DIR = 'public'
+BEIJING_TZ = datetime.timezone(datetime.timedelta(hours=8))
+OUTPUT_FORMATS = ("base64", "clash")
+
+
+def today_suffix():
+    return datetime.datetime.now(BEIJING_TZ).strftime("%m-%d")
+
+
+def dedup_key(item):
+    return (item.get('type', ''), item.get('server', ''), str(item.get('port', '')))
+
+
+def fingerprint(item):
+    """节点指纹: 协议 + 地址 + 端口 + 凭据 (uuid/password), 凭据变化视为新节点"""
+    credential = item.get('uuid') or item.get('password') or ''
+    raw = "\0".join((item.get('type', ''), item.get('server', ''), str(item.get('port', '')), str(credential)))
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def dedup(items):
+    """按 (type, server, port) 去重, 保留首次出现的节点"""
+    seen_keys = set()
+    with stage("dedup"):
+        return [item for item in items if (key := dedup_key(item)) not in seen_keys and not seen_keys.add(key)]
+
+
+def fetch_source(spec, session, breakers, date_suffix, article_url=None, fetch=None):
+    """在熔断器保护下抓取单个来源; fetch 可替换来源自身的抓取函数 (分布式模式下交给 worker, 见 workqueue.py)
+
+    开启检查点时 (见 checkpoint.py) 最新文章URL先单独发现并记录, 抓取成功后记录全部节点,
+    续跑时已记录的来源不再抓取。
+    """
+    from checkpoint import MISSING, active, remembered
+
+    checkpoint = active()
+    key = f"{spec.name} {article_url or ''}"
+    if checkpoint is not None:
+        items = checkpoint.get("source", key)
+        if items is not MISSING:
+            print(f"[{spec.name}] 检查点中已有 {len(items)} 个节点, 跳过抓取")
+            return items
+    fetch = fetch or spec.load("fetch")
+
+    def run():
+        url = article_url
+        if url is None and checkpoint is not None:
+            url = remembered("discover", spec.name, lambda: spec.load("discover")(session), keep=bool)
+            if not url:
+                print(f"[{spec.name}] 未找到文章链接")
+                return []
+        return fetch(session, date_suffix, article_url=url)
+
+    with stage("fetch"):
+        items = breakers.run(
+            spec.name,
+            run,
+            probe=(lambda: session.get(spec.probe, timeout=10).ok) if spec.probe else None,
+        )
+    # 失败时 breakers.run 返回的是上次成功的缓存, 不记入检查点, 续跑时重试
+    if checkpoint is not None and items and breakers.get(spec.name).failures == 0:
+        checkpoint.record("source", key, items)
+    return items
+
+
+def collect(specs, session, breakers, run_budget, date_suffix=None, coordinator=None):
+    """并发抓取所有来源, 预算耗尽时放弃未完成的来源, 返回 {来源名: 节点列表}
+
+    coordinator 为 workqueue.Coordinator 时抓取由队列上的 worker 执行。
+    """
+    date_suffix = date_suffix or today_suffix()
+    executor = ThreadPoolExecutor(max_workers=max(1, len(specs)))
+    futures = {}
+    for spec in specs:
+        with use_budget(run_budget.child(spec.name)):
+            fetch = coordinator.fetcher(spec) if coordinator is not None else None
+            futures[budget_submit(executor, fetch_source, spec, session, breakers, date_suffix, fetch=fetch)] = spec
+    done, not_done = wait(futures, timeout=run_budget.remaining())
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    results = {}
+    for future, spec in futures.items():
+        if future in not_done:
+            print(f"[{spec.name}] 预算耗尽, 放弃该来源")
+            results[spec.name] = []
+        elif future.exception() is not None:
+            print(f"[{spec.name}] 抓取异常: {future.exception()}")
+            results[spec.name] = []
+        else:
+            results[spec.name] = future.result()
+    return results
+
+
+def save_output_files(items, output_filename, output_dir=OUTPUT_DIR):
+    """去重后写出 dataN-YYYYMMDD.json 与 base64 订阅文件, 命名与 scraper5/6 的同名函数一致
+
+    (goodN.txt 对应 dataN-日期.json), 声明式来源没有自己的脚本, 统一由这里写出。返回去重后的节点。
+    """
+    from links import iter_links, write_base64_lines
+    from serialization import write_json
+
+    unique_items = dedup(items)
+    with stage("emit"):
+        os.makedirs(output_dir, exist_ok=True)
+        timestamp = datetime.datetime.now(BEIJING_TZ).strftime("%Y%m%d")
+        number = "".join(re.findall(r'\d', os.path.splitext(output_filename)[0]))
+        write_json(os.path.join(output_dir, f'data{number}-{timestamp}.json'), unique_items, indent=2)
+        write_base64_lines(os.path.join(output_dir, output_filename), iter_links(unique_items))
+    return unique_items
+
+
+def write_clash(items, path):
+    from serialization import dump_yaml  # 只有 clash 输出需要 yaml
+    with open(path, 'w', encoding='utf-8') as f:
+        dump_yaml({"proxies": items}, f)
+
+
+def publish(specs, results, formats=("base64",), output_dir=OUTPUT_DIR, archive=True):
+    """按来源的输出文件分组写出, 返回 {输出文件名: 去重后的节点列表}; archive 为 False 时不导入历史归档"""
+    groups = {}
+    for spec in specs:
+        groups.setdefault(spec.output, []).extend(results.get(spec.name, []))
+
+    published = {}
+    for output, items in groups.items():
+        if not items:
+            print(f"{output}: 没有节点, 跳过写出")
+            continue
+        # 每个输出只去重一次, 写出的各种格式与下游 (监听者、best、令牌订阅) 使用同一份节点
+        if "base64" in formats:
+            from delta import publish_delta
+            unique_items = save_output_files(items, output, output_dir)
+            publish_delta(output, unique_items, output_dir)
+        else:
+            unique_items = dedup(items)
+        if "clash" in formats:
+            os.makedirs(output_dir, exist_ok=True)
+            with stage("emit"):
+                write_clash(unique_items, os.path.join(output_dir, os.path.splitext(output)[0] + ".yaml"))
+        published[output] = unique_items
+        print(f"已写出 {output}: {len(unique_items)} 个节点")
+    if archive and published and "base64" in formats:
+        archive_snapshots(output_dir)
+    return published
+
+
+def archive_snapshots(output_dir=OUTPUT_DIR):
+    """把新写出的 data*-YYYYMMDD.json 增量导入历史归档, 归档失败不影响本次运行"""
+    import sqlite3
+    from archive import Archive
+    try:
+        with Archive() as archive:
+            ingested = archive.ingest_directory(output_dir)
+    except sqlite3.Error as e:
+        print(f"历史归档失败: {e}")
+        return
+    if ingested:
+        print(f"历史归档: 导入 {len(ingested)} 份快照")
+
+
+def run(specs, formats=("base64",), budget_seconds=None, profile_dir=None, trace_memory=False, backfill=1,
+        best=0, record=None, replay=None, replay_timing=None, workers=None, resume=False, tokens=None,
+        token_nodes=None, output_dir=None):
+    """getip run 的完整流程
+
+    指定 profile_dir 时按阶段剖析并写出结果; trace_memory 时在运行摘要中报告各阶段峰值内存。
+    backfill 大于 1 时每个来源抓取最近 backfill 篇文章 (见 backfill.py);
+    best 大于 0 时另外写出每个地区延迟最低的 best 个节点 (见 ranking.py);
+    tokens 为令牌列表时为每个令牌写出按一致性哈希分配的 token_nodes 个节点 (见 hashring.py)。
+    record 为存档路径时录制本次运行的全部 HTTP 请求; replay 为存档路径时从存档回放, 不访问网络,
+    replay_timing 为按录制耗时等待的倍数 (见 httparchive.py)。回放不能与 best 同时使用 (探测要连接真实节点),
+    回放时熔断器、文章索引与哈希环权重都写在临时目录中, 不改动 .cache 下的线上状态; 订阅文件写到 output_dir
+    (未指定时写在临时目录中, 运行结束后删除), 也不导入历史归档。
+    output_dir 为订阅文件的输出目录, 默认 public/。
+    workers 不为 None 时以协调者身份运行: 抓取、本地来源的解析与探测交给工作队列上的 worker,
+    并在本机启动 workers 个 worker 进程 (0 表示只用另外启动的 getip worker, 见 workqueue.py)。
+    除录制与回放外, 每次运行都记录检查点; resume 时先读取上次未完成运行的检查点, 跳过已完成的单元 (见 checkpoint.py)。
+    """
+    import checkpoint
+    from breaker import BreakerBoard
+    from budget import DEFAULT_RUN_SECONDS
+    from politeness import create_session
+    import validation
+
+    if replay and best > 0:
+        raise ValueError("回放不访问网络, 不能同时探测节点 (best)")
+    validation.reset()
+    tracking = bool(profile_dir) or trace_memory
+    if tracking:
+        import profiling
+        profiling.enable(profile_dir, cpu=bool(profile_dir), memory=trace_memory)
+    session = state_dir = coordinator = None
+    checkpointing = not (record or replay)
+    completed = False
+    try:
+        if checkpointing:
+            checkpoint.activate(resume)
+        run_budget = Budget(budget_seconds or DEFAULT_RUN_SECONDS)
+        if replay:
+            import tempfile
+            from httparchive import replay_session
+            session = replay_session(replay, timing=replay_timing)
+            # 回放不读写线上的熔断器状态, 每次回放都从全部闭合开始
+            state_dir = tempfile.mkdtemp(prefix="getip-replay-")
+            breakers = BreakerBoard(os.path.join(state_dir, "breakers.json"), os.path.join(state_dir, "last_good"))
+            output_dir = output_dir or os.path.join(state_dir, OUTPUT_DIR)
+        else:
+            session = create_session()
+            breakers = BreakerBoard()
+            if record:
+                from httparchive import record_session
+                record_session(session, record)
+        if workers is not None:
+            from workqueue import Coordinator
+            coordinator = Coordinator()
+            coordinator.spawn(workers)
+        if backfill > 1:
+            from backfill import ArticleIndex, collect_backfill
+            # 回放从空的文章索引开始, 与熔断器一样不读写线上状态
+            index = ArticleIndex(Path(state_dir) / "articles.json") if state_dir is not None else None
+            results = collect_backfill(specs, session, breakers, run_budget, backfill, index=index,
+                                       coordinator=coordinator)
+        else:
+            results = collect(specs, session, breakers, run_budget, coordinator=coordinator)
+        for name, items in results.items():
+            print(f"[{name}] 获取 {len(items)} 个节点")
+        rejected = validation.rejections()
+        if rejected:
+            reasons = ", ".join(f"{reason} {count}" for reason, count in sorted(rejected.items(), key=lambda kv: -kv[1]))
+            print(f"校验丢弃 {sum(rejected.values())} 个格式错误的节点: {reasons}")
+        output_dir = output_dir or OUTPUT_DIR
+        published = publish(specs, results, formats, output_dir, archive=not replay)
+        if best > 0 and published:
+            from ranking import publish_best
+            options = {}
+            if coordinator is not None:
+                options = {"prober": coordinator.prober(), "concurrency": coordinator.probe_concurrency()}
+            publish_best([item for items in published.values() for item in items], best, output_dir, **options)
+        if tokens and published:
+            # 放在探测之后, 健康度用上本次的探测结果
+            from hashring import RING_WEIGHTS_FILE, TOKEN_NODES, publish_tokens
+            weights_path = Path(state_dir) / "hashring.json" if state_dir is not None else RING_WEIGHTS_FILE
+            publish_tokens([item for items in published.values() for item in items], tokens,
+                           token_nodes or TOKEN_NODES, output_dir, weights_path=weights_path)
+        # 预算耗尽时有来源被放弃, 保留检查点让下次续跑补上
+        completed = not run_budget.expired()
+        return published
+    finally:
+        if checkpointing:
+            checkpoint.deactivate(completed)
+        if coordinator is not None:
+            coordinator.close()
+        if session is not None:
+            session.close()  # 录制时在这里写完存档
+        if state_dir is not None:
+            import shutil
+            shutil.rmtree(state_dir, ignore_errors=True)
+        if tracking:
+            profiling.disable()
@@ -0,0 +1,410 @@
+"""按主机的礼貌限速器: 令牌桶限速 + AIMD 自适应并发
+
+所有抓取脚本共享同一个 HostLimiter, 并发抓取时同一主机的请求会被统一调度:
+- 令牌桶限制每秒请求数
+- 并发上限按 AIMD 调整: 成功时缓慢加一, 遇到 429/5xx 时减半
+- 服务端返回 Retry-After 时, 该主机在指定时间内暂停发送
+
+同一进程内并发的相同请求 (同一URL、参数与请求头的 GET/HEAD) 经 SingleFlight 合并为一次,
+多个来源同时访问同一主页或同一订阅文件时只发出一个请求, 共享同一个响应。
+"""
+import asyncio
+import email.utils
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from budget import BudgetExhausted, LatencyTracker, current_budget, submit as budget_submit
+
+# 视为"被限流/过载"的状态码
+THROTTLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# 并发已满时的轮询间隔(秒)
+_POLL_INTERVAL = 0.05
+
+
+def parse_retry_after(value, now=None):
+    """解析 Retry-After 头 (秒数或 HTTP 日期), 返回需要等待的秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed is None:
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, parsed.timestamp() - now)
+
+
+class TokenBucket:
+    """令牌桶: rate 为每秒补充的令牌数, burst 为桶容量"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now):
+        """尝试取一个令牌, 成功返回 0, 否则返回需要等待的秒数"""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _HostState:
+    def __init__(self, limiter):
+        self.bucket = TokenBucket(limiter.initial_rate, limiter.burst)
+        self.limit = float(limiter.initial_concurrency)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self.completed = 0
+
+
+class HostLimiter:
+    """按主机调度请求, 在不触发限流的前提下逼近主机可承受的最大吞吐"""
+
+    def __init__(self, initial_rate=4.0, max_rate=20.0, min_rate=0.2, burst=4,
+                 initial_concurrency=2, min_concurrency=1, max_concurrency=16,
+                 increase=1.0, decrease=0.5, default_backoff=2.0, max_backoff=60.0):
+        self.initial_rate = initial_rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        self.default_backoff = default_backoff
+        self.max_backoff = max_backoff
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+
+    def scaled(self, share):
+        """速率与并发上限按 1/share 缩小的新限速器 (不带已有的主机状态)
+
+        share 个进程各持一份时 (分布式 worker), 对同一主机的持续总速率与单个进程相同。桶容量不缩小,
+        否则同一来源的几个连续请求 (主页 -> 文章 -> 订阅) 都要按缩小后的速率排队; 因此短时突发最多为 share * burst。
+        每个进程的并发至少为 1, 进程数超过 max_concurrency 时总并发上限为进程数。
+        """
+        share = max(1, share)
+        return HostLimiter(
+            initial_rate=self.initial_rate / share, max_rate=self.max_rate / share, min_rate=self.min_rate / share,
+            burst=self.burst,
+            initial_concurrency=max(1, self.initial_concurrency // share),
+            min_concurrency=max(1, self.min_concurrency // share),
+            max_concurrency=max(1, self.max_concurrency // share),
+            increase=self.increase / share, decrease=self.decrease,
+            default_backoff=self.default_backoff, max_backoff=self.max_backoff)
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self)
+        return state
+
+    def try_acquire(self, host):
+        """非阻塞获取发送许可, 成功返回 0, 否则返回建议等待的秒数"""
+        with self._lock:
+            state = self._state(host)
+            now = time.monotonic()
+            if state.blocked_until > now:
+                return state.blocked_until - now
+            if state.in_flight >= int(state.limit):
+                return _POLL_INTERVAL
+            wait = state.bucket.try_take(now)
+            if wait:
+                return wait
+            state.in_flight += 1
+            return 0.0
+
+    def acquire(self, host, timeout=None):
+        """阻塞直到获得发送许可, 超过 timeout 秒仍未获得则抛出 TimeoutError"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(host)
+            if not wait:
+                return
+            if deadline is not None:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    raise TimeoutError(f"等待 {host} 的发送许可超时")
+                wait = min(wait, left)
+            with self._cond:
+                self._cond.wait(timeout=wait)
+
+    async def acquire_async(self, host):
+        """acquire 的协程版本, 供 aiohttp 抓取使用"""
+        while True:
+            wait = self.try_acquire(host)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, host, status=None, retry_after=None, error=False):
+        """归还许可并根据响应结果调整该主机的速率与并发"""
+        with self._cond:
+            state = self._state(host)
+            state.in_flight = max(0, state.in_flight - 1)
+            state.completed += 1
+            if error or status in THROTTLE_STATUSES:
+                # 乘性减: 并发和速率同时收缩, 并按 Retry-After 或默认退避暂停
+                state.throttled += 1
+                state.limit = max(self.min_concurrency, state.limit * self.decrease)
+                state.bucket.rate = max(self.min_rate, state.bucket.rate * self.decrease)
+                backoff = retry_after if retry_after is not None else self.default_backoff
+                backoff = min(backoff, self.max_backoff)
+                state.blocked_until = max(state.blocked_until, time.monotonic() + backoff)
+            else:
+                # 加性增: 每完成约一个并发窗口的请求, 并发加一, 速率同步上调
+                state.limit = min(self.max_concurrency, state.limit + self.increase / state.limit)
+                state.bucket.rate = min(self.max_rate, state.bucket.rate + self.increase / state.limit)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, host, timeout=None):
+        """同步上下文: 进入时获取许可, 退出时按 feedback 调整"""
+        self.acquire(host, timeout=timeout)
+        feedback = {}
+        try:
+            yield feedback
+        except BaseException:
+            # 已拿到响应状态(如 raise_for_status 抛出)时按状态反馈, 否则视为连接错误
+            if feedback:
+                self.release(host, **feedback)
+            else:
+                self.release(host, error=True)
+            raise
+        self.release(host, **feedback)
+
+    @asynccontextmanager
+    async def slot_async(self, host):
+        await self.acquire_async(host)
+        feedback = {}
+        try:
+            yield feedback
+        except BaseException:
+            # 已拿到响应状态(如 raise_for_status 抛出)时按状态反馈, 否则视为连接错误
+            if feedback:
+                self.release(host, **feedback)
+            else:
+                self.release(host, error=True)
+            raise
+        self.release(host, **feedback)
+
+    def snapshot(self):
+        """返回各主机当前的速率/并发状态, 便于日志输出"""
+        with self._lock:
+            return {
+                host: {
+                    "rate": round(state.bucket.rate, 2),
+                    "concurrency": round(state.limit, 2),
+                    "in_flight": state.in_flight,
+                    "throttled": state.throttled,
+                    "completed": state.completed,
+                }
+                for host, state in self._hosts.items()
+            }
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按键合并并发调用: 同一个键正在执行时, 后来的调用等待并共享第一个调用的结果 (或异常)
+
+    只合并同时进行的调用, 执行结束后不保留结果。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.shared = 0  # 被合并掉的调用次数
+
+    def do(self, key, fn, timeout=None):
+        """执行 fn() 或等待同键的进行中调用; 等待超过 timeout 秒时抛出 BudgetExhausted"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.waiters += 1
+                self.shared += 1
+        if not leader:
+            if not flight.done.wait(timeout):
+                raise BudgetExhausted("等待合并的请求超时")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+
+_shared_limiter = None
+_shared_flights = SingleFlight()
+_shared_lock = threading.Lock()
+
+
+def get_limiter():
+    """进程内共享的限速器, 所有抓取器都应通过它访问外部站点"""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = HostLimiter()
+        return _shared_limiter
+
+
+def get_flights():
+    """进程内共享的请求合并器"""
+    return _shared_flights
+
+
+def host_of(url):
+    return (urlsplit(url).hostname or "").lower()
+
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# 对冲请求使用的线程池, 进程内共享
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+class PoliteSession(requests.Session):
+    """经过 HostLimiter 调度的 Session
+
+    - 429/5xx 由限速器退避后重试
+    - 超时受当前预算(budget.use_budget)约束, 预算耗尽抛出 BudgetExhausted
+    - 幂等请求(GET/HEAD)超过该主机历史耗时的 hedge_percentile 分位仍未返回时,
+      再发一个对冲副本, 取先完成的结果
+    - 并发的相同 GET/HEAD 请求合并为一次 (见 SingleFlight), 各调用方拿到同一个已读完内容的响应
+    """
+
+    def __init__(self, limiter=None, max_attempts=4, hedge_percentile=95, latency=None, flights=None):
+        super().__init__()
+        self.limiter = limiter or get_limiter()
+        self.flights = flights or get_flights()
+        self.max_attempts = max_attempts
+        self.hedge_percentile = hedge_percentile
+        self.latency = latency or LatencyTracker()
+
+    def _attempt(self, method, url, host, budget, kwargs):
+        """经限速器发送一次请求并记录耗时"""
+        wait_timeout = budget.remaining() if budget is not None else None
+        try:
+            with self.limiter.slot(host, timeout=wait_timeout) as feedback:
+                started = time.monotonic()
+                response = super().request(method, url, **kwargs)
+                self.latency.record(host, time.monotonic() - started)
+                feedback["status"] = response.status_code
+                feedback["retry_after"] = parse_retry_after(response.headers.get("Retry-After"))
+        except TimeoutError as e:
+            raise BudgetExhausted(str(e)) from e
+        return response
+
+    def _hedged(self, method, url, host, budget, kwargs):
+        threshold = self.latency.percentile(host, self.hedge_percentile)
+        if method.upper() not in IDEMPOTENT_METHODS or threshold is None or kwargs.get("stream"):
+            return self._attempt(method, url, host, budget, kwargs)
+
+        primary = budget_submit(_hedge_pool, self._attempt, method, url, host, budget, kwargs)
+        done, _ = wait([primary], timeout=threshold)
+        if done:
+            return primary.result()
+        hedge = budget_submit(_hedge_pool, self._attempt, method, url, host, budget, kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # 落后的副本完成后直接丢弃
+                    for other in pending:
+                        other.add_done_callback(_close_response)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _flight_key(self, method, url, kwargs):
+        """可合并请求的键: 方法 + 带参数的完整URL + 合并后的请求头 + 其余影响响应的选项; 不可合并时返回 None"""
+        method = method.upper()
+        if method not in ("GET", "HEAD") or kwargs.get("stream") or any(
+                kwargs.get(name) for name in ("data", "json", "files", "auth", "cookies", "hooks")):
+            return None
+        prepared = requests.PreparedRequest()
+        prepared.prepare_url(url, kwargs.get("params"))
+        headers = dict(self.headers)
+        headers.update(kwargs.get("headers") or {})
+        headers = tuple(sorted((str(name).lower(), str(value)) for name, value in headers.items() if value is not None))
+        options = tuple(str(kwargs.get(name)) for name in ("allow_redirects", "verify", "cert", "proxies"))
+        return method, prepared.url, headers, options
+
+    def request(self, method, url, **kwargs):
+        key = self._flight_key(method, url, kwargs)
+        if key is None:
+            return self._request(method, url, **kwargs)
+        budget = current_budget()
+        return self.flights.do(key, lambda: self._request(method, url, **kwargs),
+                               timeout=budget.remaining() if budget is not None else None)
+
+    def _request(self, method, url, **kwargs):
+        host = host_of(url)
+        budget = current_budget()
+        cap = kwargs.get("timeout")
+        for attempt in range(1, self.max_attempts + 1):
+            if budget is not None:
+                kwargs["timeout"] = budget.request_timeout(cap)
+            response = self._hedged(method, url, host, budget, kwargs)
+            if response.status_code not in THROTTLE_STATUSES or attempt == self.max_attempts:
+                return response
+            # 退避时间由限速器的 blocked_until 控制, 下一次 acquire 会自动等待
+            response.close()
+        return response
+
+
+def _close_response(future):
+    if future.exception() is None:
+        future.result().close()
+
+
+def create_session(limiter=None):
+    """抓取脚本共用的会话: 429/5xx 交给限速器, urllib3 只重试连接错误"""
+    session = PoliteSession(limiter or get_limiter())
+    adapter = HTTPAdapter(max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[]))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,198 @@
+"""按阶段的性能剖析与内存统计 (getip run --profile / --trace-memory)
+
+流水线各阶段用 stage("discovery" / "fetch" / "parse" / "validate" / "dedup" / "probe" / "emit") 包裹。未开启剖析时
+stage() 直接返回一个空上下文, 几乎没有开销; 开启后:
+- 每个阶段一个 cProfile (各线程分别记录后合并), 写出 <阶段>.prof, 可用 snakeviz / pstats 查看
+- 后台线程按固定间隔采样所有处于某个阶段中的线程调用栈, 写出 collapsed.txt
+  (每行 "阶段;外层函数;...;内层函数 次数"), 可直接交给 flamegraph.pl / speedscope
+- 阶段嵌套时函数统计只记在最内层阶段上, 不会重复计入外层阶段
+- 开启内存统计时用 tracemalloc 记录每个阶段运行期间的进程峰值内存: 每次有阶段进入或退出时
+  读取并重置 tracemalloc 的峰值, 把这段时间的峰值记到当时所有活动的阶段上 (并发阶段各自都计入)
+"""
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+STAGES = ("discovery", "fetch", "parse", "validate", "dedup", "probe", "emit")
+
+_profiler = None
+_NULL = nullcontext()
+
+# 嵌套阶段切换时外层剖析器的 disable/enable 调用本身会被记录, 汇总时剔除
+_SWITCH_CALLS = {
+    "<method 'disable' of '_lsprof.Profiler' objects>",
+    "<method 'enable' of '_lsprof.Profiler' objects>",
+}
+
+
+def stage(name):
+    """标记一个流水线阶段; 未开启剖析时是空操作"""
+    if _profiler is None:
+        return _NULL
+    return _profiler.stage(name)
+
+
+def _profile_stats(profile):
+    stats = pstats.Stats(profile)
+    for key in [key for key in stats.stats if key[2] in _SWITCH_CALLS]:
+        del stats.stats[key]
+    for _, _, _, _, callers in stats.stats.values():
+        for key in [key for key in callers if key[2] in _SWITCH_CALLS]:
+            del callers[key]
+    stats.total_tt = sum(value[2] for value in stats.stats.values())
+    return stats
+
+
+class StageProfiler:
+    def __init__(self, output_dir=None, interval=0.005, cpu=True, memory=False):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.cpu = cpu
+        self.memory = memory
+        self.stats = {}        # 阶段 -> pstats.Stats
+        self.wall = {}         # 阶段 -> 各线程耗时之和 (含嵌套的内层阶段)
+        self.samples = {}      # 折叠后的调用栈 -> 次数
+        self.peak_memory = {}  # 阶段 -> 运行期间的进程峰值 (字节)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._active = {}      # 线程 id -> 阶段栈
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name="stage-sampler", daemon=True)
+
+    def _memory_checkpoint(self):
+        """把上一次检查点以来的峰值记到所有活动阶段上, 调用方需持有 _lock"""
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for stack in self._active.values():
+            for name, _ in stack:
+                if peak > self.peak_memory.get(name, 0):
+                    self.peak_memory[name] = peak
+
+    @contextmanager
+    def stage(self, name):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+            self._active[threading.get_ident()] = stack
+        outer = stack[-1] if stack else None
+        if outer is not None and outer[1] is not None:
+            outer[1].disable()
+        profile = cProfile.Profile() if self.cpu else None
+        try:
+            if profile is not None:
+                profile.enable()
+        except ValueError:
+            profile = None  # 解释器中已有其他剖析器 (3.12+ 全局只允许一个), 只保留采样
+        if self.memory:
+            with self._lock:
+                self._memory_checkpoint()
+                stack.append((name, profile))
+        else:
+            stack.append((name, profile))
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            if profile is not None:
+                profile.disable()
+            if self.memory:
+                with self._lock:
+                    self._memory_checkpoint()
+                    stack.pop()
+            else:
+                stack.pop()
+            if outer is not None and outer[1] is not None:
+                outer[1].enable()
+            with self._lock:
+                if all(entry_name != name for entry_name, _ in stack):
+                    self.wall[name] = self.wall.get(name, 0.0) + elapsed
+                if profile is not None:
+                    if name in self.stats:
+                        self.stats[name].add(_profile_stats(profile))
+                    else:
+                        self.stats[name] = _profile_stats(profile)
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id, stack in list(self._active.items()):
+                if not stack or thread_id not in frames:
+                    continue
+                names = []
+                frame = frames[thread_id]
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                names.append(stack[-1][0])
+                key = ";".join(reversed(names))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.cpu:
+            self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler.is_alive():
+            self._sampler.join()
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def write(self):
+        """写出各阶段 .prof 与 collapsed.txt, 返回阶段耗时摘要"""
+        if not self.cpu:
+            return dict(self.wall)
+        os.makedirs(self.output_dir, exist_ok=True)
+        for name, stats in self.stats.items():
+            stats.dump_stats(os.path.join(self.output_dir, f"{name}.prof"))
+        with open(os.path.join(self.output_dir, "collapsed.txt"), 'w', encoding='utf-8') as f:
+            for key, count in sorted(self.samples.items()):
+                f.write(f"{key} {count}\n")
+        return dict(self.wall)
+
+    def report(self, top=5):
+        """打印各阶段耗时、峰值内存与最耗时的函数"""
+        if self.cpu:
+            print(f"性能剖析结果已写入 {self.output_dir}/ (耗时为各线程之和, 含嵌套的内层阶段)")
+        else:
+            print("各阶段耗时与峰值内存:")
+        for name in sorted(self.wall, key=lambda name: STAGES.index(name) if name in STAGES else len(STAGES)):
+            line = f"  {name:<10} {self.wall[name] * 1000:9.1f} ms"
+            if name in self.peak_memory:
+                line += f"  峰值内存 {self.peak_memory[name] / 1024 / 1024:8.1f} MiB"
+            print(line)
+            stats = self.stats.get(name)
+            if stats is None:
+                continue
+            hottest = sorted(stats.stats.items(), key=lambda kv: kv[1][2], reverse=True)[:top]
+            for (filename, line, func), (_, calls, tottime, _, _) in hottest:
+                print(f"      {tottime * 1000:8.1f} ms  {calls:>7} 次  {func} ({os.path.basename(filename)}:{line})")
+
+
+def enable(output_dir=None, interval=0.005, cpu=True, memory=False):
+    """开启按阶段统计; cpu 需要 output_dir 写出剖析文件, memory 开启 tracemalloc 峰值统计"""
+    global _profiler
+    _profiler = StageProfiler(output_dir, interval, cpu=cpu, memory=memory)
+    _profiler.start()
+    return _profiler
+
+
+def disable():
+    """停止剖析, 写出结果并打印摘要"""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is None:
+        return None
+    profiler.stop()
+    summary = profiler.write()
+    profiler.report()
+    return summary
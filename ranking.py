@@ -0,0 +1,244 @@
+"""按延迟排名的精选订阅 (getip run --best K)
+
+客户端更适合一份短小、快速的节点列表。本模块按地区各选出 K 个最优节点, 写出 best.txt (base64 订阅)
+与 best.json, 不需要探测全部节点:
+- 先给每个节点一个先验分数: 历史平均延迟 (没有历史时用默认值) + 历史失败率罚分 + 协议偏好罚分,
+  每个地区一个按先验分数排序的候选堆
+- 探测 (TCP 建连耗时) 按先验分数从好到差调度, 一个地区确认 K 个健康节点后立即停止该地区的探测,
+  取消仍在进行中的探测; 所有地区都满足或候选耗尽时结束
+- 实测分数 = 实测延迟 + 失败率罚分 + 协议偏好罚分, 每个地区用大小为 K 的堆保留分数最低的 K 个
+- 每次探测的结果按节点指纹累计到 .cache/probes.json, 作为下次排名的成功率与延迟历史
+- 开启检查点时每个探测结果随即记入检查点, 中断后续跑 (getip run --resume) 不重复探测
+
+分数单位为毫秒, 越低越好。调度与探测次数的基准见 bench/bench_ranking.py。
+"""
+import asyncio
+import heapq
+import json
+import os
+import threading
+import time
+
+from breaker import CACHE_DIR, atomic_write_json
+from pipeline import OUTPUT_DIR, dedup, fingerprint
+from profiling import stage
+from regions import region_of
+
+PROBE_HISTORY_FILE = CACHE_DIR / "probes.json"
+BEST_OUTPUT = "best.txt"
+PROBE_TIMEOUT = 3.0
+PROBE_CONCURRENCY = 64
+# 每个地区同时在探测的节点数上限 = 还缺的健康节点数 * 该倍数, 用少量超额调度抵消失败的探测
+OVERSCHEDULE = 2
+# 没有历史记录时假设的延迟: 取偏乐观的值, 让未测过的节点有机会排在测过但较慢的节点之前
+DEFAULT_LATENCY_MS = 500.0
+# 失败率为 100% 时的罚分
+FAILURE_PENALTY_MS = 1000.0
+# 协议偏好: reality/vless 抗封锁能力最好, ss 最容易被识别
+PROTOCOL_PENALTY_MS = {"vless": 0.0, "trojan": 50.0, "vmess": 100.0, "ss": 150.0}
+UNKNOWN_PROTOCOL_PENALTY_MS = 200.0
+# 历史记录中超过该天数未探测的节点会被清理
+HISTORY_MAX_AGE = 30 * 86400
+# 延迟历史的指数平均权重
+EWMA_ALPHA = 0.3
+# 超过该秒数没有探测过的节点, 存活状态视为未知
+ALIVE_MAX_AGE = 86400
+
+
+class ProbeHistory:
+    """按节点指纹累计的探测历史 {指纹: [成功次数, 失败次数, 平均延迟毫秒 或 None, 最近探测时间]}"""
+
+    def __init__(self, path=PROBE_HISTORY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self.data = json.loads(path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            self.data = {}
+        except (OSError, ValueError) as e:
+            print(f"探测历史损坏, 已忽略: {e}")
+            self.data = {}
+
+    def failure_rate(self, key):
+        """带平滑的失败率, 没有历史时为 0.5"""
+        ok, failed, _, _ = self.data.get(key, (0, 0, None, 0))
+        return (failed + 1) / (ok + failed + 2)
+
+    def latency(self, key):
+        entry = self.data.get(key)
+        return entry[2] if entry else None
+
+    def alive(self, key, max_age=ALIVE_MAX_AGE):
+        """最近 max_age 秒内探测过时按平滑失败率判断存活 (低于一半为 True), 否则为 None (未知)"""
+        entry = self.data.get(key)
+        if entry is None or entry[3] < time.time() - max_age:
+            return None
+        return self.failure_rate(key) < 0.5
+
+    def record(self, key, latency_ms):
+        """记录一次探测, latency_ms 为 None 表示失败"""
+        with self._lock:
+            ok, failed, average, _ = self.data.get(key, (0, 0, None, 0))
+            if latency_ms is None:
+                failed += 1
+            else:
+                ok += 1
+                average = latency_ms if average is None else average + EWMA_ALPHA * (latency_ms - average)
+            self.data[key] = [ok, failed, average, time.time()]
+
+    def save(self, max_age=HISTORY_MAX_AGE):
+        cutoff = time.time() - max_age
+        with self._lock:
+            self.data = {key: entry for key, entry in self.data.items() if entry[3] >= cutoff}
+            atomic_write_json(self.path, self.data)
+
+
+def _penalty(item, history, key):
+    protocol = PROTOCOL_PENALTY_MS.get(item.get("type"), UNKNOWN_PROTOCOL_PENALTY_MS)
+    return protocol + FAILURE_PENALTY_MS * history.failure_rate(key)
+
+
+def prior_score(item, history, key):
+    """探测前的估计分数"""
+    latency = history.latency(key)
+    return (DEFAULT_LATENCY_MS if latency is None else latency) + _penalty(item, history, key)
+
+
+async def tcp_probe(item, timeout=PROBE_TIMEOUT):
+    """TCP 建连耗时 (毫秒), 失败或超时返回 None"""
+    started = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(item["server"], int(item["port"])), timeout)
+    except (OSError, asyncio.TimeoutError, ValueError, KeyError, UnicodeError):
+        return None
+    latency = (time.perf_counter() - started) * 1000
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return latency
+
+
+def _resumable(prober, checkpoint):
+    """探测结果按节点指纹记入检查点, 续跑时已探测过的节点不再探测"""
+    from checkpoint import MISSING
+
+    async def probe(item):
+        key = fingerprint(item)
+        latency = checkpoint.get("probe", key)
+        if latency is MISSING:
+            latency = await prober(item)
+            checkpoint.record("probe", key, latency)
+        return latency
+    return probe
+
+
+class _Region:
+    __slots__ = ("candidates", "best", "healthy", "in_flight")
+
+    def __init__(self):
+        self.candidates = []  # (先验分数, 序号, 指纹, 节点) 的小顶堆
+        self.best = []        # (-实测分数, 序号, 节点) 的大顶堆, 大小不超过 K
+        self.healthy = 0
+        self.in_flight = set()
+
+
+async def _rank(regions, k, history, prober, concurrency):
+    """按先验分数调度探测, 结果写入各地区的 best 堆, 返回探测次数"""
+    probes = 0
+    pending = {}  # task -> (地区, 序号, 指纹, 节点)
+
+    def schedule():
+        nonlocal probes
+        while len(pending) < concurrency:
+            # 在还需要节点且未达到并发上限的地区中, 取先验分数最好的候选
+            eligible = [(state.candidates[0][0], name) for name, state in regions.items()
+                        if state.candidates and state.healthy < k
+                        and len(state.in_flight) < (k - state.healthy) * OVERSCHEDULE]
+            if not eligible:
+                return
+            _, name = min(eligible)
+            state = regions[name]
+            _, seq, key, item = heapq.heappop(state.candidates)
+            task = asyncio.ensure_future(prober(item))
+            pending[task] = (name, seq, key, item)
+            state.in_flight.add(task)
+            probes += 1
+
+    schedule()
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            name, seq, key, item = pending.pop(task)
+            state = regions[name]
+            state.in_flight.discard(task)
+            if task.cancelled():
+                continue
+            latency = task.result()
+            history.record(key, latency)
+            if latency is None:
+                continue
+            state.healthy += 1
+            score = latency + _penalty(item, history, key)
+            entry = (-score, seq, dict(item, latency=round(latency, 1), alive=True, score=round(score, 1)))
+            if len(state.best) < k:
+                heapq.heappush(state.best, entry)
+            elif entry > state.best[0]:
+                heapq.heapreplace(state.best, entry)
+            if state.healthy >= k:
+                # 该地区已确认 K 个健康节点, 提前结束其余探测
+                for other in state.in_flight:
+                    other.cancel()
+        schedule()
+    return probes
+
+
+def select_best(items, k, history=None, prober=tcp_probe, concurrency=PROBE_CONCURRENCY, regions=None):
+    """每个地区选出至多 k 个最优节点, 返回 (按地区与分数排序的节点列表, 探测次数)
+
+    regions 为地区代码集合时只处理这些地区。prober(item) 是返回延迟毫秒或 None 的协程函数。
+    """
+    from checkpoint import active
+
+    history = history if history is not None else ProbeHistory()
+    checkpoint = active()
+    if checkpoint is not None:
+        prober = _resumable(prober, checkpoint)
+    states = {}
+    for seq, item in enumerate(dedup(items)):
+        region = item.get("region") or region_of(item.get("name", ""))
+        if regions and region not in regions:
+            continue
+        key = fingerprint(item)
+        state = states.setdefault(region, _Region())
+        state.candidates.append((prior_score(item, history, key), seq, key, item))
+    for state in states.values():
+        heapq.heapify(state.candidates)
+
+    with stage("probe"):
+        probes = asyncio.run(_rank(states, k, history, prober, concurrency)) if states else 0
+    best = []
+    for region in sorted(states):
+        best.extend(item for _, _, item in sorted(states[region].best, reverse=True))
+    return best, probes
+
+
+def publish_best(items, k, output_dir=OUTPUT_DIR, regions=None, prober=tcp_probe, concurrency=PROBE_CONCURRENCY):
+    """选出各地区 top-K 并写出 best.txt 与 best.json, 返回精选节点列表"""
+    from links import iter_links, write_base64_lines
+    from serialization import write_json
+
+    history = ProbeHistory()
+    best, probes = select_best(items, k, history, prober, concurrency, regions)
+    try:
+        history.save()
+    except OSError as e:
+        print(f"保存探测历史失败: {e}")
+    print(f"精选订阅: 探测 {probes} 个节点, 选出 {len(best)} 个")
+    if best:
+        with stage("emit"):
+            os.makedirs(output_dir, exist_ok=True)
+            write_json(os.path.join(output_dir, os.path.splitext(BEST_OUTPUT)[0] + ".json"), best, indent=2)
+            write_base64_lines(os.path.join(output_dir, BEST_OUTPUT), iter_links(best))
+    return best
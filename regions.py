@@ -0,0 +1,45 @@
+"""根据节点名称判断地区 (ISO 3166 两位代码)"""
+import re
+
+# 关键字优先于旗帜: 部分来源的旗帜与实际地区不符 (如 "🇺🇸🇺🇸🇺🇸日本")
+_KEYWORDS = (
+    ("HK", ("香港", "Hong Kong", "HongKong")),
+    ("TW", ("台湾", "臺灣", "Taiwan")),
+    ("JP", ("日本", "东京", "大阪", "Japan", "Tokyo", "Osaka")),
+    ("KR", ("韩国", "首尔", "Korea", "Seoul")),
+    ("SG", ("新加坡", "狮城", "Singapore")),
+    ("US", ("美国", "洛杉矶", "硅谷", "United States", "USA", "Los Angeles")),
+    ("GB", ("英国", "伦敦", "United Kingdom", "London")),
+    ("DE", ("德国", "法兰克福", "Germany", "Frankfurt")),
+    ("FR", ("法国", "巴黎", "France", "Paris")),
+    ("NL", ("荷兰", "阿姆斯特丹", "Netherlands", "Amsterdam")),
+    ("CA", ("加拿大", "Canada")),
+    ("RU", ("俄罗斯", "莫斯科", "Russia", "Moscow")),
+    ("IN", ("印度", "India")),
+    ("AU", ("澳大利亚", "悉尼", "Australia", "Sydney")),
+    ("TR", ("土耳其", "Turkey")),
+)
+_KEYWORD_RE = re.compile("|".join(re.escape(word) for _, words in _KEYWORDS for word in words), re.IGNORECASE)
+_KEYWORD_REGION = {word.lower(): code for code, words in _KEYWORDS for word in words}
+# 两个区域指示符组成一面旗帜
+_FLAG_RE = re.compile("([\U0001F1E6-\U0001F1FF])([\U0001F1E6-\U0001F1FF])")
+_CODE_RE = re.compile(r"(?<![A-Za-z])(HK|TW|JP|KR|SG|US|UK|GB|DE|FR|NL|CA|RU|IN|AU|TR)(?![A-Za-z])")
+
+UNKNOWN = "XX"
+
+
+def region_of(name):
+    """返回节点所在地区代码, 无法判断时返回 UNKNOWN"""
+    if not name:
+        return UNKNOWN
+    match = _KEYWORD_RE.search(name)
+    if match:
+        return _KEYWORD_REGION[match.group(0).lower()]
+    match = _FLAG_RE.search(name)
+    if match:
+        return "".join(chr(ord(ch) - 0x1F1E6 + ord("A")) for ch in match.groups())
+    match = _CODE_RE.search(name)
+    if match:
+        code = match.group(1)
+        return "GB" if code == "UK" else code
+    return UNKNOWN
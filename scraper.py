@@ -1,13 +1,12 @@
-import requests
 import re
 import os
 import datetime
-import json
-import base64
 import copy
 from urllib.parse import quote
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from politeness import create_session
+from serialization import write_json
+from links import write_base64_lines
+from budget import DEFAULT_RUN_SECONDS, Budget, use_budget
 from collections import defaultdict
 
 # --- 全局配置 ---
@@ -38,14 +37,6 @@ ITEM_TEMPLATE = {
     "client-fingerprint": "chrome"
 }
 
-def setup_session():
-    session = requests.Session()
-    retry_strategy = Retry(total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    return session
-
 def get_latest_post_info(session):
     print("步骤 1: 获取最新信息...")
     try:
@@ -121,27 +112,24 @@ def save_output_files(items):
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
     json_path = os.path.join(OUTPUT_DIR, 'data.json')
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(items, f, indent=2, ensure_ascii=False)
+    write_json(json_path, items, indent=2)
     print(f"JSON 文件已保存: {json_path}")
 
-    custom_links = [link for item in items if (link := create_custom_link(item))]
-    if custom_links:
-        combined_text = "\n".join(custom_links)
-        encoded_content = base64.b64encode(combined_text.encode('utf-8')).decode('utf-8')
-        sub_path = os.path.join(OUTPUT_DIR, 'good.txt')
-        with open(sub_path, 'w', encoding='utf-8') as f:
-            f.write(encoded_content)
+    custom_links = (link for item in items if (link := create_custom_link(item)))
+    sub_path = os.path.join(OUTPUT_DIR, 'good.txt')
+    if write_base64_lines(sub_path, custom_links):
         print(f"Base64 文件已保存: {sub_path}")
 
 def main():
-    session = setup_session()
-    
-    target_url, date_suffix = get_latest_post_info(session)
-    if not target_url:
-        return
+    session = create_session()
+    run_budget = Budget(DEFAULT_RUN_SECONDS)
+
+    with use_budget(run_budget):
+        target_url, date_suffix = get_latest_post_info(session)
+        if not target_url:
+            return
 
-    items = generate_items_from_template(session, target_url, date_suffix)
+        items = generate_items_from_template(session, target_url, date_suffix)
     if not items:
         return
         
@@ -4,7 +4,11 @@ import re
 import os
 import datetime
 import yaml  # For parsing YAML content
-import json  # For outputting structured data
+from politeness import PoliteSession
+from serialization import dumps_json, iter_clash_proxies, yaml_backend
+
+# 所有请求经共享限速器调度
+session = PoliteSession()
 
 # --- 核心配置区 ---
 BASE_ID = 196
@@ -46,7 +50,7 @@ def fetch_parse_and_save(target_url):
         print(f"请求头: {headers}")
 
         print("正在发送HTTP请求...")
-        response = requests.get(target_url, headers=headers, timeout=15)
+        response = session.get(target_url, headers=headers, timeout=15)
         print(f"HTTP响应状态码: {response.status_code}")
         response.raise_for_status()
 
@@ -70,7 +74,7 @@ def fetch_parse_and_save(target_url):
         print(f"订阅请求头: {sub_headers}")
 
         print("正在下载订阅内容...")
-        sub_response = requests.get(subscription_link, headers=sub_headers, timeout=15)
+        sub_response = session.get(subscription_link, headers=sub_headers, timeout=15)
         print(f"订阅HTTP响应状态码: {sub_response.status_code}")
         sub_response.raise_for_status()
 
@@ -79,14 +83,10 @@ def fetch_parse_and_save(target_url):
 
         # 步骤 5: 解析YAML内容
         print("步骤 5: 正在解析YAML内容...")
-        print("使用yaml.safe_load进行安全解析...")
+        print(f"使用事件流逐个读取proxies (YAML后端: {yaml_backend()[0].__name__})...")
         try:
-            # 使用 safe_load 防止恶意YAML代码执行
-            data = yaml.safe_load(yaml_content)
-            print(f"YAML解析成功，数据类型: {type(data)}")
-
-            # .get('proxies', []) 是一种安全的访问方式，如果'proxies'不存在，则返回一个空列表
-            proxies = data.get('proxies', [])
+            # 只解析 proxies 列表, 不构建整棵文档树; 安全性与 safe_load 相同
+            proxies = list(iter_clash_proxies(yaml_content))
             print(f"从YAML中提取的proxies数量: {len(proxies)}")
 
             if not proxies:
@@ -150,10 +150,9 @@ def fetch_parse_and_save(target_url):
         print(f"待保存的节点数量: {len(extracted_nodes)}")
 
         with open(file_path, 'w', encoding='utf-8') as f:
-            # json.dumps 用于将Python字典/列表转换为JSON字符串
-            # indent=2 使JSON文件格式化，更易读
-            # ensure_ascii=False 确保中文字符能正确显示而不是被编码
-            json.dump(extracted_nodes, f, indent=2, ensure_ascii=False)
+            # dumps_json 优先使用 orjson, 未安装时回退到标准库 json
+            # indent=2 使JSON文件格式化，更易读; 中文字符原样输出而不是被编码
+            f.write(dumps_json(extracted_nodes, indent=2))
 
         # 检查文件是否成功保存
         if os.path.exists(file_path):
@@ -1,17 +1,15 @@
 #!/usr/bin/env python3
 import asyncio
-import aiohttp
-import yaml
-import json
-import os
 import logging
 import datetime
+import sys
 from typing import List, Dict, Optional
 from dataclasses import dataclass, asdict
 from pathlib import Path
-from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn
-from rich.logging import RichHandler
+# aiohttp / yaml / rich 较重, 只在真正需要时导入 (缓存命中时无需网络与 YAML)
+from politeness import get_limiter, host_of, parse_retry_after
+from cache import ResponseCache
+from serialization import iter_clash_proxies, write_json
 
 # --- 配置数据类 ---
 @dataclass
@@ -22,6 +20,8 @@ class Config:
     output_dir: Path = Path("public")
     cache_dir: Path = Path(".cache")
     cache_time: int = 3600  # 缓存有效期（秒）
+    cache_stale_time: int = 86400  # 过期后仍可先返回旧内容、后台刷新的时长（秒）
+    cache_max_bytes: int = 64 * 1024 * 1024  # 缓存目录大小上限
     timeout: int = 15
     user_agent: str = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
     clash_user_agent: str = "ClashforWindows/0.20.19"
@@ -46,17 +46,28 @@ class ProxyNode:
 class ProxyManager:
     def __init__(self, config: Config):
         self.config = config
-        self.console = Console()
         self.logger = self._setup_logger()
         self._setup_directories()
+        self.cache = ResponseCache(
+            config.cache_dir / "http",
+            max_bytes=config.cache_max_bytes,
+            fresh_seconds=config.cache_time,
+            stale_seconds=config.cache_stale_time,
+        )
+        self._revalidations = {}
 
     def _setup_logger(self) -> logging.Logger:
-        """配置日志系统"""
+        """配置日志系统: 交互终端下使用 RichHandler, 否则用标准输出, 避免导入 rich"""
+        if sys.stderr.isatty():
+            from rich.logging import RichHandler
+            handler = RichHandler(rich_tracebacks=True)
+        else:
+            handler = logging.StreamHandler()
         logging.basicConfig(
             level=logging.INFO,
             format="%(message)s",
             datefmt="[%X]",
-            handlers=[RichHandler(rich_tracebacks=True)]
+            handlers=[handler]
         )
         return logging.getLogger("rich")
 
@@ -64,64 +75,69 @@ class ProxyManager:
         """创建必要的目录"""
         self.config.output_dir.mkdir(parents=True, exist_ok=True)
         self.config.cache_dir.mkdir(parents=True, exist_ok=True)
-
-    def _get_cache_path(self, url: str) -> Path:
-        """获取缓存文件路径"""
-        import hashlib
-        url_hash = hashlib.md5(url.encode()).hexdigest()
-        return self.config.cache_dir / f"{url_hash}.cache"
-
-    def _is_cache_valid(self, cache_path: Path) -> bool:
-        """检查缓存是否有效"""
-        if not cache_path.exists():
-            return False
-        cache_time = datetime.datetime.fromtimestamp(cache_path.stat().st_mtime)
-        age = (datetime.datetime.now() - cache_time).total_seconds()
-        return age < self.config.cache_time
+        # 清理旧版本按 md5 命名、从不淘汰的缓存文件
+        for legacy in self.config.cache_dir.glob("*.cache"):
+            legacy.unlink()
 
     async def fetch_with_cache(self, url: str, headers: Dict = None) -> str:
-        """获取URL内容，支持缓存"""
-        cache_path = self._get_cache_path(url)
-        
-        if self._is_cache_valid(cache_path):
+        """获取URL内容，支持缓存
+
+        新鲜的缓存直接返回; 过期但仍在 stale 窗口内的缓存也直接返回, 同时在后台刷新;
+        只有没有可用缓存时才等待源站。
+        """
+        entry = await self.cache.aget(url)
+        freshness = self.cache.freshness(entry)
+        if freshness == "fresh":
             self.logger.info(f"使用缓存内容: {url}")
-            return cache_path.read_text(encoding='utf-8')
+            return entry.text
+        if freshness == "stale":
+            self.logger.info(f"使用旧缓存并后台刷新: {url}")
+            if url not in self._revalidations:
+                self._revalidations[url] = asyncio.create_task(self._revalidate(url, headers))
+            return entry.text
+        return await self._fetch_and_store(url, headers)
+
+    async def _revalidate(self, url: str, headers: Dict = None):
+        try:
+            await self._fetch_and_store(url, headers)
+        except Exception as e:
+            self.logger.warning(f"后台刷新失败: {url} - {e}")
+        finally:
+            self._revalidations.pop(url, None)
 
+    async def _fetch_and_store(self, url: str, headers: Dict = None) -> str:
+        import aiohttp
+        limiter = get_limiter()
         async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, timeout=self.config.timeout) as response:
-                response.raise_for_status()
-                content = await response.text()
-                
-                # 保存到缓存
-                cache_path.write_text(content, encoding='utf-8')
-                return content
+            async with limiter.slot_async(host_of(url)) as feedback:
+                async with session.get(url, headers=headers, timeout=self.config.timeout) as response:
+                    feedback["status"] = response.status
+                    feedback["retry_after"] = parse_retry_after(response.headers.get("Retry-After"))
+                    response.raise_for_status()
+                    content = await response.text()
+
+        # 保存到缓存 (原子写入, 超出上限时淘汰最久未用的条目)
+        await self.cache.aput(url, content)
+        return content
 
     def calculate_target_url(self) -> str:
         """计算目标URL"""
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=self.console
-        ) as progress:
-            task = progress.add_task("计算目标URL...", total=None)
-            
-            base_date = datetime.datetime.strptime(self.config.base_date, "%Y-%m-%d").date()
-            today = datetime.datetime.utcnow().date()
-            delta_days = (today - base_date).days
-            current_id = self.config.base_id + delta_days
-            target_url = f"{self.config.base_url}/?id={current_id}"
-            
-            progress.update(task, completed=True, description=f"目标URL: {target_url}")
-            return target_url
+        base_date = datetime.datetime.strptime(self.config.base_date, "%Y-%m-%d").date()
+        today = datetime.datetime.utcnow().date()
+        delta_days = (today - base_date).days
+        current_id = self.config.base_id + delta_days
+        target_url = f"{self.config.base_url}/?id={current_id}"
+
+        self.logger.info(f"目标URL: {target_url}")
+        return target_url
 
     async def process_yaml_content(self, yaml_content: str) -> List[ProxyNode]:
         """处理YAML内容并提取节点信息"""
+        import yaml
         try:
-            data = yaml.safe_load(yaml_content)
-            proxies = data.get('proxies', [])
-            
+            # 事件流逐个产出节点, 不构建整棵文档树
             nodes = []
-            for proxy in proxies:
+            for proxy in iter_clash_proxies(yaml_content):
                 node = ProxyNode(
                     name=proxy.get('name', ''),
                     type=proxy.get('type', ''),
@@ -149,8 +165,7 @@ class ProxyManager:
         output_file = self.config.output_dir / json_filename
         nodes_data = [node.to_dict() for node in nodes]
         
-        with output_file.open('w', encoding='utf-8') as f:
-            json.dump(nodes_data, f, indent=2, ensure_ascii=False)
+        write_json(output_file, nodes_data, indent=2)
         
         self.logger.info(f"保存了 {len(nodes)} 个节点到 {output_file}")
 
@@ -191,6 +206,10 @@ class ProxyManager:
         except Exception as e:
             self.logger.error(f"处理过程中出错: {e}", exc_info=True)
             raise
+        finally:
+            # 等待后台刷新写完缓存, 供下次运行使用
+            if self._revalidations:
+                await asyncio.wait(list(self._revalidations.values()), timeout=self.config.timeout)
 
 def main():
     """主入口函数"""
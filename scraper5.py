@@ -1,8 +1,15 @@
-import requests, re, os, json, base64
-from urllib.parse import quote, urlparse
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import re, os, json, base64
+from urllib.parse import urlparse
+from links import iter_links, write_base64_lines
+from politeness import create_session
+from serialization import write_json
+from profiling import stage
+from uriparse import parse_uri
+from validation import validate
 import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+from breaker import BreakerBoard
+from budget import DEFAULT_RUN_SECONDS, Budget, current_budget, use_budget, submit as budget_submit
 
 
 
@@ -10,16 +17,8 @@ import datetime
 BASE_URL = "https://www.freeclashnode.com"
 OUTPUT_DIR = 'public'
 USER_AGENT = 'Mozilla/5.0'
-
-
-
-def setup_session():
-    session = requests.Session()
-    retry_strategy = Retry(total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    return session
+LINK_SCHEMES = ('ss://', 'vless://', 'trojan://', 'vmess://')
+MAX_FETCH_WORKERS = 8
 
 
 
@@ -73,6 +72,9 @@ def parse_vless_uri(vless_uri):
         name = re.sub(r'\[\s*\]', '', name)  # 去除空方括号
         name = name.strip()  # 再次清理首尾空格
 
+        # 没有 security 参数时按 vless 的默认值 none 处理, 不启用 TLS
+        security = query.get('security', [''])[0]
+
         # 构建配置
         item = {
             "type": "vless",
@@ -81,13 +83,15 @@ def parse_vless_uri(vless_uri):
             "port": port,
             "name": name,
             "network": "tcp",
-            "tls": True,
+            "tls": security not in ('', 'none'),
             "udp": True
         }
 
         # 添加可选参数
-        security = query.get('security', [''])[0]
         if security:
+            if security != 'reality':
+                # 保留链接中的 security (tls / none 等), 重新编码时原样写回
+                item["security"] = security
             if security == 'reality':
                 item["flow"] = query.get('flow', ["xtls-rprx-vision"])[0]
                 item["servername"] = query.get('sni', ["www.microsoft.com"])[0] or query.get('servername', ["www.microsoft.com"])[0]
@@ -308,10 +312,7 @@ def get_nodes_from_txt(session, txt_url, date_suffix=None, quiet=False):
         for line in total_lines:
             line = line.strip()
             # 只处理支持的协议: ss://, vless://, trojan://, vmess://
-            if (line.startswith('ss://') or
-                line.startswith('vless://') or
-                line.startswith('trojan://') or
-                line.startswith('vmess://')):
+            if line.startswith(LINK_SCHEMES):
                 uris.append(line)
 
         if not quiet:
@@ -324,7 +325,7 @@ def get_nodes_from_txt(session, txt_url, date_suffix=None, quiet=False):
 
         for uri in uris:
             try:
-                item = parse_generic_uri(uri)
+                item = parse_uri(uri)
                 if item:
                     # 延迟添加日期后缀，先收集所有节点后统一处理编号
                     items.append(item)
@@ -356,39 +357,60 @@ def get_nodes_from_txt(session, txt_url, date_suffix=None, quiet=False):
 
         if not quiet:
             print(f"解析完成，成功: {success_count} 个，失败: {fail_count} 个")
-        return items
+        return validate(items)
 
     except Exception as e:
         print(f"获取或解析txt文件失败: {str(e)}")
         return []
 
-def get_freeclash_items(session, date_suffix):
-    """从freeclashnode.com获取节点"""
-    try:
-        response = session.get(BASE_URL, headers={'User-Agent': USER_AGENT}, timeout=15)
-        response.raise_for_status()
+def probe_source(session, url):
+    """熔断器半开时的单次探测请求"""
+    response = session.get(url, headers={'User-Agent': USER_AGENT}, timeout=10)
+    return response.ok
+
+def find_freeclash_article(session):
+    """访问freeclashnode.com主页, 返回最新文章URL"""
+    response = session.get(BASE_URL, headers={'User-Agent': USER_AGENT}, timeout=15)
+    response.raise_for_status()
 
-        match = re.search(r'<div class="col-md-9 ps-3 item-body">.*?<div class="item-heading pb-2"><a href="([^"]*\d{4}-\d{1,2}-\d{1,2}[^"]*\.htm)"', response.text, re.DOTALL)
-        if not match: return []
+    match = re.search(r'<div class="col-md-9 ps-3 item-body">.*?<div class="item-heading pb-2"><a href="([^"]*\d{4}-\d{1,2}-\d{1,2}[^"]*\.htm)"', response.text, re.DOTALL)
+    if not match: return None
+    return BASE_URL + match.group(1)
+
+def get_freeclash_items(session, date_suffix, article_url=None):
+    """从freeclashnode.com获取节点, 已知文章URL时跳过主页"""
+    try:
+        target_url = article_url or find_freeclash_article(session)
+        if not target_url: return []
 
-        target_url = BASE_URL + match.group(1)
         response = session.get(target_url, headers={'User-Agent': USER_AGENT}, timeout=15)
         if response.status_code != 200: return []
 
         txt_matches = re.findall(r'https://node\.freeclashnode\.com/uploads/\d{4}/\d{2}/\d+[-]\d{8}\.txt', response.text)
 
+        # 并发下载各订阅文件, 同一主机的请求节奏由共享限速器控制
+        # 预算耗尽时不再等待未完成的下载, 直接返回已完成的部分
+        budget = current_budget()
+        executor = ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS)
+        futures = [budget_submit(executor, get_nodes_from_txt, session, url, date_suffix, quiet=True) for url in txt_matches]
+        done, not_done = wait(futures, timeout=budget.remaining() if budget else None)
+        executor.shutdown(wait=False, cancel_futures=True)
+        if not_done:
+            print(f"预算耗尽, 放弃 {len(not_done)} 个未完成的订阅下载")
+
         all_items = []
-        for txt_url in txt_matches:
-            all_items.extend(get_nodes_from_txt(session, txt_url, date_suffix, quiet=True))
+        for future in futures:
+            if future in done and future.exception() is None:
+                all_items.extend(future.result())
         return all_items
 
-    except Exception:
+    except Exception as e:
+        print(f"获取freeclashnode.com节点时发生错误: {str(e)}")
         return []
 
-def get_nodesdz_items(session, date_suffix):
-    """从nodesdz.com获取最新节点 (完整获取流程)"""
-    try:
-        # 步骤1: 访问主页，获取最新的文章ID
+def find_nodesdz_article(session):
+    """访问nodesdz.com主页, 返回最新文章URL"""
+    with stage("discovery"):
         print("步骤 1: 获取nodesdz.com主页...")
         response = session.get("https://nodesdz.com", headers={'User-Agent': USER_AGENT}, timeout=15)
         response.raise_for_status()
@@ -398,11 +420,27 @@ def get_nodesdz_items(session, date_suffix):
         match = re.search(r'<article class="log">.*?<h3>\s*<a href="https?://.*?/?\?id=(\d+)"', response.text, re.DOTALL)
         if not match:
             print("未找到nodesdz.com文章ID")
-            return []
+            return None
 
         latest_id = match.group(1)
-        target_url = f"https://nodesdz.com/?id={latest_id}"
         print(f"找到最新文章ID: {latest_id}")
+        return f"https://nodesdz.com/?id={latest_id}"
+
+def find_nodesdz_articles(session, limit):
+    """访问nodesdz.com主页, 返回最近 limit 篇文章URL (新的在前)"""
+    with stage("discovery"):
+        response = session.get("https://nodesdz.com", headers={'User-Agent': USER_AGENT}, timeout=15)
+        response.raise_for_status()
+        ids = re.findall(r'<article class="log">.*?<h3>\s*<a href="https?://.*?/?\?id=(\d+)"', response.text, re.DOTALL)
+        return [f"https://nodesdz.com/?id={article_id}" for article_id in dict.fromkeys(ids)][:limit]
+
+def get_nodesdz_items(session, date_suffix, article_url=None):
+    """从nodesdz.com获取最新节点 (完整获取流程), 已知文章URL时跳过主页"""
+    try:
+        # 步骤1: 访问主页，获取最新的文章ID
+        target_url = article_url or find_nodesdz_article(session)
+        if not target_url:
+            return []
 
         # 步骤2: 访问文章详情页，提取UUID
         print(f"步骤 2: 访问nodesdz.com文章页面...")
@@ -483,6 +521,8 @@ def get_nodesdz_items(session, date_suffix):
             }
         ]
 
+        # 文章页提取的 UUID 与硬编码的节点同样要经过校验, 格式错误的节点不进入去重、编码与探测
+        nodes = validate(nodes)
         print(f"nodesdz.com节点生成完成，共 {len(nodes)} 个节点")
         return nodes
 
@@ -503,50 +543,10 @@ def save_output_files(all_items, output_filename='good5.txt'):
 
     json_filename = f'data5-{timestamp}.json'
     json_path = os.path.join(OUTPUT_DIR, json_filename)
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(unique_items, f, indent=2, ensure_ascii=False)
-
-    links = []
-    for item in unique_items:
-        try:
-            if item.get("type") == "vless":
-                name_encoded = quote(item.get("name", ""))
-                params = [f"{k}={v}" for k, v in {
-                    "security": "reality",
-                    "sni": "www.microsoft.com",
-                    "fp": "chrome",
-                    "publicKey": "0XqnX5cXAa6isFhTW4eIM_CaAHTXJJ8tbMs9XabxJ1A",
-                    "flow": "xtls-rprx-vision"
-                }.items() if v]
-                link = f"vless://{item['uuid']}@{item['server']}:{item.get('port')}?{'&'.join(params)}#{name_encoded}"
-            elif item.get("type") == "ss":
-                name_encoded = quote(item.get("name", ""))
-                link = f"ss://{item.get('password', '')}@{item.get('server')}:{item.get('port', 443)}#{name_encoded}"
-            elif item.get("type") == "trojan":
-                name_encoded = quote(item.get("name", ""))
-                link = f"trojan://{item.get('password', '')}@{item.get('server')}:{item.get('port', 443)}#{name_encoded}"
-            elif item.get("type") == "vmess":
-                vmess_data = {
-                    "v": "2", "ps": item.get("name", ""), "add": item.get("server", ""),
-                    "port": str(item.get("port", 443)), "id": item.get("uuid", ""),
-                    "aid": str(item.get("alterId", 0)), "scy": item.get("cipher", "auto"),
-                    "net": item.get("network", "tcp"),
-                    "tls": "tls" if item.get("tls") else ""
-                }
-                json_str = json.dumps(vmess_data, separators=(',', ':'))
-                link = f"vmess://{base64.b64encode(json_str.encode('utf-8')).decode('utf-8')}"
-            if link:
-                links.append(link)
-        except:
-            continue
-
-    if links:
-        combined_text = "\n".join(links)
-        encoded_content = base64.b64encode(combined_text.encode('utf-8')).decode('utf-8')
+    write_json(json_path, unique_items, indent=2)
 
-        sub_path = os.path.join(OUTPUT_DIR, output_filename)
-        with open(sub_path, 'w', encoding='utf-8') as f:
-            f.write(encoded_content)
+    sub_path = os.path.join(OUTPUT_DIR, output_filename)
+    write_base64_lines(sub_path, iter_links(unique_items))
 
 
 
@@ -561,16 +561,28 @@ def main():
         beijing_time = datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=8)))
         date_suffix = beijing_time.strftime("%m-%d")
 
-        session = setup_session()
+        session = create_session()
+        run_budget = Budget(DEFAULT_RUN_SECONDS)
+        breakers = BreakerBoard()
 
-        # 获取nodesdz.com节点
+        # 获取nodesdz.com节点 (最多占用三分之一的运行预算)
         print("获取nodesdz.com节点...")
-        nodesdz_items = get_nodesdz_items(session, date_suffix)
+        with use_budget(run_budget.child("nodesdz", share=1 / 3)):
+            nodesdz_items = breakers.run(
+                "nodesdz",
+                lambda: get_nodesdz_items(session, date_suffix),
+                probe=lambda: probe_source(session, "https://nodesdz.com"),
+            )
         print(f"已添加 {len(nodesdz_items)} 个nodesdz.com节点")
 
-        # 获取freeclashnode.com节点
+        # 获取freeclashnode.com节点 (使用剩余全部预算)
         print("获取freeclashnode.com节点...")
-        freeclash_items = get_freeclash_items(session, date_suffix)
+        with use_budget(run_budget.child("freeclash")):
+            freeclash_items = breakers.run(
+                "freeclash",
+                lambda: get_freeclash_items(session, date_suffix),
+                probe=lambda: probe_source(session, BASE_URL),
+            )
         print(f"已添加 {len(freeclash_items)} 个freeclashnode.com节点")
 
         all_items = nodesdz_items + freeclash_items
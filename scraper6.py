@@ -1,7 +1,12 @@
-import requests, re, os, json, base64
-from urllib.parse import quote, urlparse
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import re, os, json, base64
+from urllib.parse import urlparse
+from links import iter_links, write_base64_lines
+from politeness import create_session
+from serialization import write_json
+from breaker import BreakerBoard
+from budget import DEFAULT_RUN_SECONDS, Budget, use_budget
+from uriparse import parse_uri_raw
+from validation import validate
 import datetime
 import datetime as dt
 
@@ -12,16 +17,7 @@ BASE_URL = "https://clashgithub.com"
 CATEGORY_URL = "https://clashgithub.com/category/clashnode"
 OUTPUT_DIR = 'public'
 USER_AGENT = 'Mozilla/5.0'
-
-
-
-def setup_session():
-    session = requests.Session()
-    retry_strategy = Retry(total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    return session
+LINK_SCHEMES = ('ss://', 'vless://', 'trojan://', 'vmess://')
 
 
 
@@ -60,6 +56,9 @@ def parse_vless_uri(vless_uri):
 
         name = raw_name
 
+        # 没有 security 参数时按 vless 的默认值 none 处理, 不启用 TLS
+        security = query.get('security', [''])[0]
+
         # 构建配置
         item = {
             "type": "vless",
@@ -68,13 +67,15 @@ def parse_vless_uri(vless_uri):
             "port": port,
             "name": name,
             "network": "tcp",
-            "tls": True,
+            "tls": security not in ('', 'none'),
             "udp": True
         }
 
         # 添加可选参数
-        security = query.get('security', [''])[0]
         if security:
+            if security != 'reality':
+                # 保留链接中的 security (tls / none 等), 重新编码时原样写回
+                item["security"] = security
             if security == 'reality':
                 item["flow"] = query.get('flow', ["xtls-rprx-vision"])[0]
                 item["servername"] = query.get('sni', ["www.microsoft.com"])[0] or query.get('servername', ["www.microsoft.com"])[0]
@@ -235,10 +236,7 @@ def get_nodes_from_txt(session, txt_url, date_suffix=None, quiet=False):
         for line in total_lines:
             line = line.strip()
             # 只处理支持的协议: ss://, vless://, trojan://, vmess://
-            if (line.startswith('ss://') or
-                line.startswith('vless://') or
-                line.startswith('trojan://') or
-                line.startswith('vmess://')):
+            if line.startswith(LINK_SCHEMES):
                 uris.append(line)
 
         if not quiet:
@@ -251,7 +249,7 @@ def get_nodes_from_txt(session, txt_url, date_suffix=None, quiet=False):
 
         for uri in uris:
             try:
-                item = parse_generic_uri(uri)
+                item = parse_uri_raw(uri)
                 if item:
                     # 延迟添加日期后缀，先收集所有节点后统一处理编号
                     items.append(item)
@@ -283,26 +281,35 @@ def get_nodes_from_txt(session, txt_url, date_suffix=None, quiet=False):
 
         if not quiet:
             print(f"解析完成，成功: {success_count} 个，失败: {fail_count} 个")
-        return items
+        return validate(items)
 
     except Exception as e:
         print(f"获取或解析txt文件失败: {str(e)}")
         return []
 
-def get_clashgithub_items(session, date_suffix):
-    """从clashgithub.com获取节点"""
-    try:
-        # 获取主页，查找最新文章URL
-        response = session.get(BASE_URL, headers={'User-Agent': USER_AGENT}, timeout=15)
-        response.raise_for_status()
+def probe_source(session, url):
+    """熔断器半开时的单次探测请求"""
+    response = session.get(url, headers={'User-Agent': USER_AGENT}, timeout=10)
+    return response.ok
 
-        # 直接取第一个链接（HTML页面按日期倒序排列）
-        clashnode_links = re.findall(r'href="([^"]*clashnode[^"]*html[^"]*)"', response.text)
-        if not clashnode_links:
-            print("未找到文章链接")
-            return []
+def find_clashgithub_article(session):
+    """访问clashgithub.com主页, 返回最新文章URL"""
+    response = session.get(BASE_URL, headers={'User-Agent': USER_AGENT}, timeout=15)
+    response.raise_for_status()
 
-        latest_url = clashnode_links[0]  # 第一个就是最新的
+    # 直接取第一个链接（HTML页面按日期倒序排列）
+    clashnode_links = re.findall(r'href="([^"]*clashnode[^"]*html[^"]*)"', response.text)
+    if not clashnode_links:
+        print("未找到文章链接")
+        return None
+    return clashnode_links[0]  # 第一个就是最新的
+
+def get_clashgithub_items(session, date_suffix, article_url=None):
+    """从clashgithub.com获取节点, 已知文章URL时跳过主页"""
+    try:
+        latest_url = article_url or find_clashgithub_article(session)
+        if not latest_url:
+            return []
         print(f"使用最新文章: {latest_url.split('/')[-1]}")
 
         # 访问文章提取节点
@@ -313,14 +320,8 @@ def get_clashgithub_items(session, date_suffix):
         uris = []
         for line in response.text.split('\n'):
             line = line.strip()
-            if line.startswith('vless://'):
+            if line.startswith(LINK_SCHEMES):
                 uris.append(line.split()[0])  # 只取第一部分，排除HTML
-            elif line.startswith('ss://'):
-                uris.append(line.split()[0])
-            elif line.startswith('trojan://'):
-                uris.append(line.split()[0])
-            elif line.startswith('vmess://'):
-                uris.append(line.split()[0])
 
         # 过滤重复
         uris = list(set(uris))
@@ -332,7 +333,7 @@ def get_clashgithub_items(session, date_suffix):
 
         for uri in uris:
             try:
-                item = parse_generic_uri(uri)
+                item = parse_uri_raw(uri)
                 if item:
                     items.append(item)
                     success_count += 1
@@ -354,7 +355,7 @@ def get_clashgithub_items(session, date_suffix):
         else:
             print("页面中未找到有效的节点链接")
 
-        return items
+        return validate(items)
 
     except Exception as e:
         print(f"获取clashgithub.com节点时发生错误: {str(e)}")
@@ -373,50 +374,10 @@ def save_output_files(all_items, output_filename='good6.txt'):
 
     json_filename = f'data6-{timestamp}.json'
     json_path = os.path.join(OUTPUT_DIR, json_filename)
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(unique_items, f, indent=2, ensure_ascii=False)
-
-    links = []
-    for item in unique_items:
-        try:
-            if item.get("type") == "vless":
-                name_encoded = quote(item.get("name", ""))
-                params = [f"{k}={v}" for k, v in {
-                    "security": "reality",
-                    "sni": "www.microsoft.com",
-                    "fp": "chrome",
-                    "publicKey": "0XqnX5cXAa6isFhTW4eIM_CaAHTXJJ8tbMs9XabxJ1A",
-                    "flow": "xtls-rprx-vision"
-                }.items() if v]
-                link = f"vless://{item['uuid']}@{item['server']}:{item.get('port')}?{'&'.join(params)}#{name_encoded}"
-            elif item.get("type") == "ss":
-                name_encoded = quote(item.get("name", ""))
-                link = f"ss://{item.get('password', '')}@{item.get('server')}:{item.get('port', 443)}#{name_encoded}"
-            elif item.get("type") == "trojan":
-                name_encoded = quote(item.get("name", ""))
-                link = f"trojan://{item.get('password', '')}@{item.get('server')}:{item.get('port', 443)}#{name_encoded}"
-            elif item.get("type") == "vmess":
-                vmess_data = {
-                    "v": "2", "ps": item.get("name", ""), "add": item.get("server", ""),
-                    "port": str(item.get("port", 443)), "id": item.get("uuid", ""),
-                    "aid": str(item.get("alterId", 0)), "scy": item.get("cipher", "auto"),
-                    "net": item.get("network", "tcp"),
-                    "tls": "tls" if item.get("tls") else ""
-                }
-                json_str = json.dumps(vmess_data, separators=(',', ':'))
-                link = f"vmess://{base64.b64encode(json_str.encode('utf-8')).decode('utf-8')}"
-            if link:
-                links.append(link)
-        except:
-            continue
-
-    if links:
-        combined_text = "\n".join(links)
-        encoded_content = base64.b64encode(combined_text.encode('utf-8')).decode('utf-8')
+    write_json(json_path, unique_items, indent=2)
 
-        sub_path = os.path.join(OUTPUT_DIR, output_filename)
-        with open(sub_path, 'w', encoding='utf-8') as f:
-            f.write(encoded_content)
+    sub_path = os.path.join(OUTPUT_DIR, output_filename)
+    write_base64_lines(sub_path, iter_links(unique_items))
 
 
 
@@ -431,11 +392,17 @@ def main():
         beijing_time = datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=8)))
         date_suffix = beijing_time.strftime("%m-%d")
 
-        session = setup_session()
+        session = create_session()
 
         # 获取clashgithub.com节点
         print("获取clashgithub.com节点...")
-        clashgithub_items = get_clashgithub_items(session, date_suffix)
+        breakers = BreakerBoard()
+        with use_budget(Budget(DEFAULT_RUN_SECONDS)):
+            clashgithub_items = breakers.run(
+                "clashgithub",
+                lambda: get_clashgithub_items(session, date_suffix),
+                probe=lambda: probe_source(session, BASE_URL),
+            )
         print(f"已添加 {len(clashgithub_items)} 个clashgithub.com节点")
 
         all_items = clashgithub_items
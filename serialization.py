@@ -0,0 +1,205 @@
+"""可插拔的 YAML / JSON 序列化后端
+
+- YAML: 安装了 libyaml 时使用 CSafeLoader / CSafeDumper, 否则回退到纯 Python 的 SafeLoader / SafeDumper
+- JSON: 安装了 orjson 时用它编码/解码, 否则回退到标准库 json。indent=2 时与 json.dumps(indent=2, ensure_ascii=False)
+  一致, 不缩进时为紧凑格式 (分隔符 "," 与 ":")。除浮点数外两种后端的输出逐字节相同; 需要科学计数法的浮点数
+  (绝对值 >= 1e16 或 < 1e-4) 写法不同 (orjson 为 1e20 / 0.00001, 标准库为 1e+20 / 1e-05, 解码后的值相同),
+  NaN 与 Infinity 在 orjson 中写为 null
+- iter_clash_proxies: 基于事件流逐个产出 Clash 配置中 proxies 列表的节点, 不构建整棵文档树,
+  读完 proxies 后立即停止解析
+
+yaml 只在调用 YAML 相关函数时才导入。
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+def dumps_json(obj, indent=None):
+    """编码为 JSON 文本 (str), 非 ASCII 字符原样输出; 不缩进时为紧凑格式 (浮点数的写法因后端而异, 见模块说明)"""
+    if orjson is not None and indent in (None, 2):
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode('utf-8')
+        except TypeError:
+            pass  # orjson 不支持的类型交给标准库处理
+    separators = (',', ':') if indent is None else None
+    return json.dumps(obj, indent=indent, ensure_ascii=False, separators=separators)
+
+
+def write_json(path, obj, indent=None, chunk_size=1024):
+    """编码并写入文件
+
+    带缩进且顶层是列表时按 chunk_size 个元素分段编码写出, 内存中不会出现整个文件的文本,
+    输出与一次性编码逐字节相同 (每段去掉首尾的 "[\n" 与 "\n]" 后以 ",\n" 相接)。
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        if indent is None or not isinstance(obj, list) or not obj:
+            f.write(dumps_json(obj, indent=indent))
+            return
+        f.write("[\n")
+        for start in range(0, len(obj), chunk_size):
+            if start:
+                f.write(",\n")
+            f.write(dumps_json(obj[start:start + chunk_size], indent=indent)[2:-2])
+        f.write("\n]")
+
+
+def loads_json(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def read_json(path):
+    with open(path, 'rb') as f:
+        return loads_json(f.read())
+
+
+def yaml_backend():
+    """返回 (Loader, Dumper), 优先使用 libyaml 的 C 实现"""
+    import yaml
+    try:
+        return yaml.CSafeLoader, yaml.CSafeDumper
+    except AttributeError:
+        return yaml.SafeLoader, yaml.SafeDumper
+
+
+def load_yaml(stream):
+    import yaml
+    loader, _ = yaml_backend()
+    return yaml.load(stream, Loader=loader)
+
+
+def dump_yaml(data, stream=None):
+    import yaml
+    _, dumper = yaml_backend()
+    return yaml.dump(data, stream, Dumper=dumper, allow_unicode=True, sort_keys=False)
+
+
+class _EventBuilder:
+    """把 YAML 事件流还原为 Python 对象 (与 safe_load 的结果一致)"""
+
+    def __init__(self, events):
+        import yaml
+        self.yaml = yaml
+        self.events = events
+        self.anchors = {}
+        self.resolver = yaml.resolver.Resolver()
+        self.constructor = yaml.constructor.SafeConstructor()
+        self._resolved = {}
+
+    def scalar(self, event):
+        yaml = self.yaml
+        tag = event.tag
+        if tag is None or tag == "!":
+            if event.implicit[0]:
+                # 普通(无引号)标量按内容解析为 int/bool/null/float 等
+                tag = self.resolver.resolve(yaml.ScalarNode, event.value, (True, False))
+            else:
+                return event.value
+        if tag == "tag:yaml.org,2002:str":
+            return event.value
+        if tag == "tag:yaml.org,2002:merge":
+            return "<<"
+        key = (tag, event.value)
+        if key in self._resolved:
+            return self._resolved[key]
+        node = yaml.ScalarNode(tag, event.value, event.start_mark, event.end_mark, event.style)
+        value = self.constructor.yaml_constructors[tag](self.constructor, node)
+        if len(self._resolved) < 4096:
+            self._resolved[key] = value
+        return value
+
+    def build(self, event):
+        yaml = self.yaml
+        if isinstance(event, yaml.AliasEvent):
+            return self.anchors[event.anchor]
+        if isinstance(event, yaml.ScalarEvent):
+            value = self.scalar(event)
+        elif isinstance(event, yaml.SequenceStartEvent):
+            value = []
+            if event.anchor:
+                self.anchors[event.anchor] = value
+            for child in self.events:
+                if isinstance(child, yaml.SequenceEndEvent):
+                    break
+                value.append(self.build(child))
+        elif isinstance(event, yaml.MappingStartEvent):
+            value = {}
+            if event.anchor:
+                self.anchors[event.anchor] = value
+            pairs, merges = [], []
+            for key_event in self.events:
+                if isinstance(key_event, yaml.MappingEndEvent):
+                    break
+                key = self.build(key_event)
+                item = self.build(next(self.events))
+                if key == "<<" and isinstance(item, (dict, list)):
+                    merges.append(item)
+                else:
+                    pairs.append((key, item))
+            # 合并键 (<<: *a 或 <<: [*a, *b]) 与 SafeConstructor.flatten_mapping 一致:
+            # 合并进来的键排在前面, 列表中靠前的映射优先, 显式给出的键最优先
+            for merge in merges:
+                for source in (reversed(merge) if isinstance(merge, list) else (merge,)):
+                    if isinstance(source, dict):
+                        value.update(source)
+            value.update(pairs)
+        else:
+            raise self.yaml.YAMLError(f"意外的 YAML 事件: {event}")
+        if event.anchor:
+            self.anchors[event.anchor] = value
+        return value
+
+    def skip(self, event):
+        """跳过一个值的全部事件, 不构建对象 (但记录锚点以防后面引用)"""
+        yaml = self.yaml
+        if isinstance(event, (yaml.SequenceStartEvent, yaml.MappingStartEvent)) and event.anchor:
+            self.build(event)
+            return
+        depth = 1 if isinstance(event, (yaml.SequenceStartEvent, yaml.MappingStartEvent)) else 0
+        while depth:
+            child = next(self.events)
+            if isinstance(child, (yaml.SequenceStartEvent, yaml.MappingStartEvent)):
+                depth += 1
+            elif isinstance(child, (yaml.SequenceEndEvent, yaml.MappingEndEvent)):
+                depth -= 1
+
+
+def iter_clash_proxies(stream):
+    """逐个产出 Clash 配置中 proxies 列表里的节点字典
+
+    stream 可以是 str / bytes 或文件对象。顶层不是映射或没有 proxies 时不产出任何内容。
+    """
+    import yaml
+    loader, _ = yaml_backend()
+    events = iter(yaml.parse(stream, Loader=loader))
+    builder = _EventBuilder(events)
+
+    for event in events:
+        if isinstance(event, yaml.MappingStartEvent):
+            break
+        if isinstance(event, (yaml.SequenceStartEvent, yaml.ScalarEvent, yaml.StreamEndEvent)):
+            return
+    else:
+        return
+
+    for key_event in events:
+        if isinstance(key_event, yaml.MappingEndEvent):
+            return
+        key = builder.build(key_event)
+        value_event = next(events)
+        if key == "proxies" and isinstance(value_event, yaml.SequenceStartEvent):
+            for item_event in events:
+                if isinstance(item_event, yaml.SequenceEndEvent):
+                    return
+                proxy = builder.build(item_event)
+                if isinstance(proxy, dict):
+                    yield proxy
+            return
+        builder.skip(value_event)
@@ -0,0 +1,430 @@
+"""订阅 HTTP 服务
+
+在内存中保存当前节点集合, 按协议/地区/端口/存活状态建立索引, 按查询条件返回订阅:
+
+    GET /sub?type=vless&region=HK&limit=20&format=clash
+    GET /sub?alive=true
+
+- 存活状态取节点自身的 alive 字段 (best.json), 没有时按建快照时的探测历史 (.cache/probes.json,
+  见 ranking.ProbeHistory.alive) 判断, 一天内没有探测过的节点为 unknown
+
+- 同一查询的渲染结果缓存在 LRU 中, 节点集合更新后自动失效
+- 强 ETag + If-None-Match 返回 304, 按 Accept-Encoding 协商 gzip
+- 基于 asyncio.Protocol 的精简 HTTP/1.1 实现 (keep-alive, pipelining), 单核可达每秒数千请求;
+  吞吐用 bench/loadgen.py 测量
+"""
+import argparse
+import asyncio
+import base64
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qsl
+
+from links import create_link
+from regions import region_of
+from serialization import dump_yaml, dumps_json, read_json
+
+OUTPUT_DIR = 'public'
+DEFAULT_DATA_GLOBS = ('data5-*.json', 'data6-*.json')
+
+FORMATS = {
+    "base64": "text/plain; charset=utf-8",
+    "plain": "text/plain; charset=utf-8",
+    "json": "application/json; charset=utf-8",
+    "clash": "text/yaml; charset=utf-8",
+}
+FILTER_FIELDS = ("type", "region", "port", "alive")
+MAX_LIMIT = 1000
+MAX_HEADER_BYTES = 16 * 1024
+RENDER_CACHE_SIZE = 512
+
+# 节点中不属于 Clash 配置的内部字段
+_INTERNAL_KEYS = frozenset({"alive", "latency", "fingerprint", "score"})
+
+
+def _alive_key(alive):
+    if alive is None:
+        return "unknown"
+    return "1" if alive else "0"
+
+
+class NodeSnapshot:
+    """不可变的节点快照及其索引, 更新时整体替换"""
+
+    def __init__(self, items, version, history=None):
+        """history: ranking.ProbeHistory, 节点没有 alive 字段时据此判断存活"""
+        self.version = version
+        self.items = list(items)
+        if history is not None:
+            from pipeline import fingerprint
+        # 分享链接在建索引时一次性编码, 渲染时直接拼接
+        self.links = []
+        for item in self.items:
+            try:
+                self.links.append(create_link(item))
+            except (KeyError, TypeError, ValueError):
+                self.links.append(None)
+        self.index = {field: {} for field in FILTER_FIELDS}
+        for position, item in enumerate(self.items):
+            alive = item.get("alive")
+            if alive is None and history is not None:
+                alive = history.alive(fingerprint(item))
+            keys = {
+                "type": str(item.get("type", "")).lower(),
+                "region": item.get("region") or region_of(item.get("name", "")),
+                "port": str(item.get("port", "")),
+                "alive": _alive_key(alive),
+            }
+            for field, key in keys.items():
+                self.index[field].setdefault(key, []).append(position)
+
+    def select(self, filters, limit=None):
+        """filters: {字段: 可选值集合}, 返回按原顺序排列的节点下标"""
+        if not filters:
+            positions = range(len(self.items))
+        else:
+            candidates = []
+            for field, values in filters.items():
+                bucket = self.index[field]
+                if len(values) == 1:
+                    candidates.append(bucket.get(next(iter(values)), []))
+                else:
+                    candidates.append(sorted(p for value in values for p in bucket.get(value, [])))
+            candidates.sort(key=len)
+            smallest, others = candidates[0], [set(c) for c in candidates[1:]]
+            positions = [p for p in smallest if all(p in other for other in others)]
+        if limit is not None:
+            positions = positions[:limit]
+        return list(positions)
+
+
+class NodeStore:
+    """线程安全地持有当前快照, 供服务线程读取、刷新线程替换"""
+
+    def __init__(self, items=(), load_history=None):
+        """load_history: 返回 ranking.ProbeHistory 的无参函数, 每次建快照时调用以读取最新的探测历史"""
+        self._version = 0
+        self._lock = threading.Lock()
+        self._load_history = load_history
+        self.snapshot = self._build(items)
+
+    def _build(self, items):
+        history = self._load_history() if self._load_history is not None else None
+        return NodeSnapshot(items, self._version, history)
+
+    def update(self, items):
+        with self._lock:
+            self._version += 1
+            self.snapshot = self._build(items)
+
+
+class QueryError(ValueError):
+    pass
+
+
+def parse_query(query_string):
+    """解析并规范化查询参数, 返回 (filters, limit, format, 缓存键)"""
+    filters = {}
+    limit = None
+    fmt = "base64"
+    for key, value in parse_qsl(query_string, keep_blank_values=False):
+        if key in FILTER_FIELDS:
+            values = {v.strip() for v in value.split(",") if v.strip()}
+            if key == "type":
+                values = {v.lower() for v in values}
+            elif key == "region":
+                values = {v.upper() for v in values}
+            elif key == "alive":
+                values = {{"true": "1", "yes": "1", "false": "0", "no": "0"}.get(v.lower(), v) for v in values}
+            if values:
+                filters[key] = filters.get(key, set()) | values
+        elif key == "limit":
+            if not value.isdigit():
+                raise QueryError("limit 必须是正整数")
+            limit = min(int(value), MAX_LIMIT)
+        elif key == "format":
+            if value not in FORMATS:
+                raise QueryError(f"format 可选: {', '.join(FORMATS)}")
+            fmt = value
+        else:
+            raise QueryError(f"未知参数: {key}")
+    cache_key = (tuple(sorted((k, tuple(sorted(v))) for k, v in filters.items())), limit, fmt)
+    return filters, limit, fmt, cache_key
+
+
+def _clash_proxy(item):
+    return {k: v for k, v in item.items() if k not in _INTERNAL_KEYS}
+
+
+def render(snapshot, positions, fmt):
+    """按格式渲染订阅内容, 返回 bytes"""
+    if fmt in ("base64", "plain"):
+        text = "\n".join(link for link in (snapshot.links[p] for p in positions) if link)
+        body = text.encode('utf-8')
+        return base64.b64encode(body) if fmt == "base64" else body
+    if fmt == "json":
+        return dumps_json([snapshot.items[p] for p in positions]).encode('utf-8')
+    proxies = [_clash_proxy(snapshot.items[p]) for p in positions]
+    return dump_yaml({"proxies": proxies}).encode('utf-8')
+
+
+class Rendered:
+    __slots__ = ("body", "etag", "content_type", "_gzip_body")
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.content_type = content_type
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self._gzip_body = None
+
+    @property
+    def gzip_body(self):
+        if self._gzip_body is None:
+            self._gzip_body = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._gzip_body
+
+    @property
+    def gzip_etag(self):
+        # 强 ETag 需区分不同的内容编码
+        return self.etag[:-1] + '-gz"'
+
+
+class SubscriptionApp:
+    """请求路由与渲染缓存, 与传输层无关"""
+
+    def __init__(self, store, cache_size=RENDER_CACHE_SIZE):
+        self.store = store
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_version = None
+        self.stats = {"requests": 0, "cache_hits": 0, "not_modified": 0}
+
+    def _lookup(self, query_string):
+        snapshot = self.store.snapshot
+        if snapshot.version != self._cache_version:
+            self._cache.clear()
+            self._cache_version = snapshot.version
+        # 先按原始查询串命中, 避免重复解析
+        entry = self._cache.get(query_string)
+        if entry is not None:
+            self._cache.move_to_end(query_string)
+            self.stats["cache_hits"] += 1
+            return entry
+        filters, limit, fmt, cache_key = parse_query(query_string)
+        entry = self._cache.get(cache_key)
+        if entry is None:
+            positions = snapshot.select(filters, limit)
+            entry = Rendered(render(snapshot, positions, fmt), FORMATS[fmt])
+            self._cache[cache_key] = entry
+        else:
+            self.stats["cache_hits"] += 1
+        self._cache[query_string] = entry
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return entry
+
+    def handle(self, method, path, query_string, headers):
+        """返回 (状态码, 响应头列表, 响应体)"""
+        self.stats["requests"] += 1
+        if method not in ("GET", "HEAD"):
+            return 405, [("Allow", "GET, HEAD")], b""
+        if path == "/healthz":
+            return 200, [("Content-Type", "text/plain")], b"ok"
+        if path == "/stats":
+            body = json.dumps(dict(self.stats, nodes=len(self.store.snapshot.items),
+                                   version=self.store.snapshot.version)).encode()
+            return 200, [("Content-Type", "application/json")], body
+        if path != "/sub":
+            return 404, [("Content-Type", "text/plain")], b"not found"
+
+        try:
+            entry = self._lookup(query_string)
+        except QueryError as e:
+            return 400, [("Content-Type", "text/plain; charset=utf-8")], str(e).encode('utf-8')
+
+        use_gzip = _accepts_gzip(headers.get("accept-encoding", ""))
+        etag = entry.gzip_etag if use_gzip else entry.etag
+        response_headers = [("ETag", etag), ("Vary", "Accept-Encoding"), ("Cache-Control", "no-cache")]
+        if _etag_matches(headers.get("if-none-match"), etag):
+            self.stats["not_modified"] += 1
+            return 304, response_headers, b""
+        response_headers.append(("Content-Type", entry.content_type))
+        if use_gzip:
+            response_headers.append(("Content-Encoding", "gzip"))
+            return 200, response_headers, entry.gzip_body
+        return 200, response_headers, entry.body
+
+
+def _accepts_gzip(value):
+    for part in value.split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def _etag_matches(value, etag):
+    if not value:
+        return False
+    if value.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in value.split(","))
+
+
+_REASONS = {200: b"OK", 304: b"Not Modified", 400: b"Bad Request", 404: b"Not Found",
+            405: b"Method Not Allowed", 431: b"Request Header Fields Too Large"}
+
+
+class HTTPProtocol(asyncio.Protocol):
+    """最小 HTTP/1.1 服务端协议: 只处理无请求体的 GET/HEAD, 支持 keep-alive 与 pipelining"""
+
+    def __init__(self, app):
+        self.app = app
+        self.buffer = bytearray()
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.buffer += data
+        while True:
+            end = self.buffer.find(b"\r\n\r\n")
+            if end < 0:
+                if len(self.buffer) > MAX_HEADER_BYTES:
+                    self._respond(431, [], b"", keep_alive=False, head=False)
+                return
+            head = bytes(self.buffer[:end]).decode('latin-1')
+            del self.buffer[:end + 4]
+            if not self._handle(head):
+                return
+
+    def _handle(self, head):
+        lines = head.split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            self._respond(400, [], b"", keep_alive=False, head=False)
+            return False
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("content-length", "0") not in ("", "0") or "transfer-encoding" in headers:
+            self._respond(400, [], b"", keep_alive=False, head=False)
+            return False
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        path, _, query_string = target.partition("?")
+        status, response_headers, body = self.app.handle(method, path, query_string, headers)
+        self._respond(status, response_headers, body, keep_alive, head=method == "HEAD")
+        return keep_alive
+
+    def _respond(self, status, headers, body, keep_alive, head):
+        parts = [b"HTTP/1.1 %d %s\r\n" % (status, _REASONS.get(status, b"OK"))]
+        for name, value in headers:
+            parts.append(f"{name}: {value}\r\n".encode('latin-1'))
+        if status != 304:
+            # 304 没有响应体; 带上 Content-Length: 0 会与 200 表示的长度矛盾 (RFC 9110 §8.6)
+            parts.append(b"Content-Length: %d\r\n" % len(body))
+        parts.append(b"Connection: keep-alive\r\n\r\n" if keep_alive else b"Connection: close\r\n\r\n")
+        if not head and status != 304:
+            parts.append(body)
+        self.transport.write(b"".join(parts))
+        if not keep_alive:
+            self.transport.close()
+
+
+def unique_nodes(groups):
+    """合并多组节点并按 (type, server, port) 去重"""
+    seen_keys = set()
+    items = []
+    for group in groups:
+        for item in group:
+            key = (item.get('type', ''), item.get('server', ''), str(item.get('port', '')))
+            if key not in seen_keys:
+                seen_keys.add(key)
+                items.append(item)
+    return items
+
+
+def load_nodes(paths):
+    """读取 data*.json 并按 (type, server, port) 去重"""
+    return unique_nodes(read_json(path) for path in paths)
+
+
+def output_of(path):
+    """data 文件对应的输出文件名 (dataN-日期.json -> goodN.txt, 见 pipeline.save_output_files), 无法对应时返回路径本身"""
+    match = re.match(r'data(\d+)-\d+\.json\Z', os.path.basename(path))
+    return f"good{match.group(1)}.txt" if match else path
+
+
+def latest_data_files(output_dir=OUTPUT_DIR):
+    """每类 data 文件取最新的一份"""
+    paths = []
+    for pattern in DEFAULT_DATA_GLOBS:
+        matches = sorted(glob.glob(os.path.join(output_dir, pattern)))
+        if matches:
+            paths.append(matches[-1])
+    return paths
+
+
+async def serve(store, host="0.0.0.0", port=8080):
+    loop = asyncio.get_running_loop()
+    app = SubscriptionApp(store)
+    server = await loop.create_server(lambda: HTTPProtocol(app), host, port, reuse_address=True, backlog=1024)
+    print(f"订阅服务已启动: http://{host}:{port}/sub ({len(store.snapshot.items)} 个节点)")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="订阅 HTTP 服务")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data", nargs="*", help="节点 JSON 文件, 默认取 public/ 下最新的 data5/data6")
+    parser.add_argument("--daemon", action="store_true", help="同时运行守护进程, 刷新后自动更新节点集合")
+    args = parser.parse_args(argv)
+
+    paths = args.data if args.data else latest_data_files()
+    from ranking import ProbeHistory
+
+    if not args.daemon:
+        store = NodeStore(load_nodes(paths), load_history=ProbeHistory)
+    else:
+        from daemon import Daemon
+        daemon = Daemon()
+        # 按输出文件分组, 先用磁盘上的节点填充; 守护进程写出某个输出时只替换该组,
+        # 其他输出在各自刷新之前仍使用磁盘上的节点
+        outputs = {}
+        for path in paths:
+            outputs.setdefault(output_of(path), []).extend(read_json(path))
+        store = NodeStore(unique_nodes(outputs.values()), load_history=ProbeHistory)
+
+        def on_publish(output, items):
+            outputs[output] = items
+            store.update(unique_nodes(list(outputs.values())))
+
+        daemon.listeners.append(on_publish)
+        threading.Thread(target=daemon.run_forever, name="daemon", daemon=True).start()
+
+    try:
+        import uvloop  # 可选, 安装后吞吐更高
+        uvloop.install()
+    except ImportError:
+        pass
+    try:
+        asyncio.run(serve(store, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
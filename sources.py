@@ -0,0 +1,88 @@
+"""节点来源注册表
+
+每个来源由所在脚本中的函数组成, 按需导入:
+- discover(session) -> 最新文章URL 或 None
+- articles(session, limit) -> 最近的文章URL列表 (新的在前), 供回填模式使用; 可省略
+- fetch(session, date_suffix, article_url=None) -> 节点列表
+- probe: 熔断器半开时探测的地址
+- output: 写出订阅文件时使用的脚本 (其 save_output_files) 与文件名
+
+只需 "主页 -> 文章 -> 订阅链接" 的站点与本地订阅文件写在 sources.json 中, 由 engine.py 统一抓取。
+本地来源没有 probe, 熔断器半开时直接重试。
+"""
+import datetime
+import importlib
+import json
+import os
+import re
+from collections import namedtuple
+from functools import partial
+
+SOURCES_FILE = os.environ.get(
+    "GETIP_SOURCES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sources.json"))
+
+
+# 用 namedtuple 而非 dataclass: dataclasses 会连带导入 inspect, 拖慢 CLI 冷启动
+class SourceSpec(namedtuple("SourceSpec", "name module discover fetch probe output declarative articles",
+                            defaults=(False, None))):
+    __slots__ = ()
+
+    def load(self, attr):
+        func = getattr(importlib.import_module(self.module), getattr(self, attr))
+        # 声明式来源共用 engine 的函数, 以来源名区分
+        return partial(func, self.name) if self.declarative else func
+
+
+def read_config(path=SOURCES_FILE):
+    """读取来源声明文件, 文件不存在时返回空配置"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+SOURCES = {
+    "nodesdz": SourceSpec(
+        name="nodesdz",
+        module="scraper5",
+        discover="find_nodesdz_article",
+        fetch="get_nodesdz_items",
+        probe="https://nodesdz.com",
+        output="good5.txt",
+        articles="find_nodesdz_articles",
+    ),
+}
+SOURCES.update(
+    (name, SourceSpec(name=name, module="engine", discover="discover", fetch="fetch",
+                      probe=config.get("probe", config.get("entry")), output=config["output"], declarative=True,
+                      articles="articles"))
+    for name, config in read_config().items()
+)
+
+_DATE_PATTERNS = (
+    re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})'),
+    re.compile(r'(?<!\d)(\d{4})(\d{2})(\d{2})(?!\d)'),
+)
+
+
+def article_date(url):
+    """从文章URL中提取发布日期, 没有日期信息时返回 None"""
+    for pattern in _DATE_PATTERNS:
+        match = pattern.search(url or "")
+        if match:
+            try:
+                return datetime.date(*(int(part) for part in match.groups()))
+            except ValueError:
+                continue
+    return None
+
+
+def get_sources(names=None):
+    """按名称取来源定义, names 为空时返回全部"""
+    if not names:
+        return list(SOURCES.values())
+    unknown = [name for name in names if name not in SOURCES]
+    if unknown:
+        raise KeyError(f"未知来源: {', '.join(unknown)} (可选: {', '.join(SOURCES)})")
+    return [SOURCES[name] for name in names]
@@ -0,0 +1,313 @@
+"""分享链接的快速解析
+
+按协议前缀一次分派, 用字符串切分直接取出 userinfo / host / port / query / fragment,
+不经过 urlparse / parse_qs。结果 (包括字段顺序、默认值、名称清理和过滤规则) 与 scraper5.parse_generic_uri
+(parse_uri) 及 scraper6.parse_generic_uri (parse_uri_raw, 不清理名称) 完全一致; 遇到快速路径不处理的
+罕见写法 (大写协议名、IPv6 地址、非 ASCII 主机、控制字符) 时交给原解析函数。
+
+一致性与速度对比见 bench/bench_uriparse.py。
+"""
+import base64
+import codecs
+import json
+import re
+
+DEFAULT_SNI = "www.microsoft.com"
+DEFAULT_PUBLIC_KEY = "0XqnX5cXAa6isFhTW4eIM_CaAHTXJJ8tbMs9XabxJ1A"
+
+_MIBEI_RE = re.compile(r'\(mibei77\.com[^)]*\)')
+_MIBEI_SHARE_RE = re.compile(r'\(米贝节点分享\)')
+_SPACES_RE = re.compile(r'\s+')
+_EMPTY_PARENS_RE = re.compile(r'\(\s*\)')
+_EMPTY_BRACKETS_RE = re.compile(r'\[\s*\]')
+# urlsplit 会删除或特殊处理的字符; 出现时交给原解析函数
+_SLOW_PATH_CHARS = re.compile(r'[\t\r\n\[\]]')
+_PERCENT_RUN_RE = re.compile(r'(?:%[0-9A-Fa-f]{2})+')
+
+
+def _decode_percent_run(match):
+    return bytes.fromhex(match.group().replace('%', '')).decode('utf-8', 'replace')
+
+
+def unquote(text):
+    """与 urllib.parse.unquote 结果相同: 连续的 %XX 按 UTF-8 解码 (错误替换为 U+FFFD), 其余字符原样保留"""
+    if '%' not in text:
+        return text
+    if text.isascii() and '\\' not in text:
+        # 常见情形: 纯 ASCII 且每个 % 后都是两位十六进制, 把 %XX 换成 \xXX 后由 C 实现一次解出字节;
+        # 其余 ASCII 字符不会和相邻字节组成 UTF-8 序列, 所以整体解码与逐段解码结果相同
+        try:
+            return codecs.escape_decode(text.replace('%', '\\x').encode('ascii'))[0].decode('utf-8', 'replace')
+        except ValueError:
+            pass  # 存在不完整的 %XX
+    return _PERCENT_RUN_RE.sub(_decode_percent_run, text)
+
+
+def _is_cn(name):
+    return '🇨🇳' in name or '_CN_' in name or '中国' in name or 'China' in name
+
+
+def _tidy(name):
+    # 各正则只在可能匹配时执行: 除空格外的空白字符都不是 printable, 所以
+    # printable 且没有连续空格的名称不会被 \s+ 改变
+    name = name.replace('|@stairnode', '')
+    if '  ' in name or not name.isprintable():
+        name = _SPACES_RE.sub(' ', name)
+    if '(' in name:
+        name = _EMPTY_PARENS_RE.sub('', name)
+    if '[' in name:
+        name = _EMPTY_BRACKETS_RE.sub('', name)
+    return name.strip()
+
+
+def _clean_ad_brackets(name):
+    """vless / ss 的名称清理, 返回 None 表示过滤掉"""
+    if '(' in name:
+        name = _MIBEI_RE.sub('', name)
+        name = _MIBEI_SHARE_RE.sub('', name)
+    if '机场' in name:
+        return None
+    return _tidy(name)
+
+
+def _clean_ad_words(name):
+    """trojan / vmess 的名称清理, 返回 None 表示过滤掉"""
+    name = name.replace('mibei77.com', '').replace('米贝节点分享', '').strip()
+    if '机场' in name:
+        return None
+    return _tidy(name)
+
+
+def _no_cleaning(name):
+    return name
+
+
+def _split(rest):
+    """把协议前缀之后的部分拆成 (netloc, query, fragment), 规则与 urlsplit 相同"""
+    end = len(rest)
+    for delimiter in '/?#':
+        position = rest.find(delimiter, 0, end)
+        if position >= 0:
+            end = position
+    netloc, remainder = rest[:end], rest[end:]
+    fragment = query = ''
+    if '#' in remainder:
+        remainder, fragment = remainder.split('#', 1)
+    if '?' in remainder:
+        query = remainder.split('?', 1)[1]
+    return netloc, query, fragment
+
+
+def _decode(text):
+    # parse_qs 对键和值都做 "+" -> 空格 与百分号解码
+    if '%' in text or '+' in text:
+        return unquote(text.replace('+', ' '))
+    return text
+
+
+def _query_params(query):
+    """与 parse_qs 相同的规则 (丢弃空值和不含 "=" 的项), 同名参数只保留第一个"""
+    params = {}
+    encoded = '%' in query or '+' in query
+    for part in query.split('&'):
+        key, sep, value = part.partition('=')
+        if not sep or not value:
+            continue
+        if encoded:
+            key, value = _decode(key), _decode(value)
+        if key not in params:
+            params[key] = value
+    return params
+
+
+def _fragment_name(fragment):
+    return unquote(fragment) if '%' in fragment else fragment
+
+
+def _host_port(netloc):
+    """"user@host:port" -> (user, host, port_str), 格式不符时返回 None"""
+    user, at, server_port = netloc.partition('@')
+    if not at:
+        return None
+    server, colon, port_str = server_port.partition(':')
+    if not colon:
+        return None
+    return user, server, port_str
+
+
+def _parse_vless(netloc, query, fragment, clean):
+    parts = _host_port(netloc)
+    if parts is None:
+        return None
+    uuid, server, port_str = parts
+    try:
+        port = int(port_str)
+    except ValueError:
+        return None
+    params = _query_params(query) if query else {}
+
+    name = _fragment_name(fragment) if fragment else "Unnamed"
+    if _is_cn(name):
+        return None
+    name = clean(name)
+    if name is None:
+        return None
+
+    # 没有 security 参数时按 vless 的默认值 none 处理, 不启用 TLS
+    security = params.get('security', '')
+    item = {
+        "type": "vless",
+        "uuid": uuid,
+        "server": server,
+        "port": port,
+        "name": name,
+        "network": "tcp",
+        "tls": security not in ('', 'none'),
+        "udp": True
+    }
+    if security and security != 'reality':
+        # 保留链接中的 security (tls / none 等), 重新编码时原样写回
+        item["security"] = security
+    if security == 'reality':
+        item["flow"] = params.get('flow', "xtls-rprx-vision")
+        item["servername"] = params.get('sni', DEFAULT_SNI) or params.get('servername', DEFAULT_SNI)
+        item["reality-opts"] = {
+            "public-key": params.get('pbk', '') or params.get('publicKey', DEFAULT_PUBLIC_KEY),
+            "short-id": params.get('sid', '') or params.get('shortId', '')
+        }
+        item["client-fingerprint"] = params.get('fp', "chrome")
+    return item
+
+
+def _parse_ss(netloc, query, fragment, clean):
+    parts = _host_port(netloc)
+    if parts is None:
+        return None
+    auth_part, address, port_str = parts
+    try:
+        port = int(port_str)
+    except ValueError:
+        return None
+    name = _fragment_name(fragment) if fragment else f"SS-{address}:{port_str}"
+    if _is_cn(name):
+        return None
+    name = clean(name)
+    if name is None:
+        return None
+    return {
+        "type": "ss",
+        "server": address,
+        "port": port,
+        "name": name,
+        "cipher": "unknown",
+        "password": auth_part
+    }
+
+
+def _parse_trojan(netloc, query, fragment, clean):
+    parts = _host_port(netloc)
+    if parts is None:
+        return None
+    password, address, port_str = parts
+    try:
+        port = int(port_str)
+    except ValueError:
+        return None
+    name = _fragment_name(fragment) if fragment else f"Trojan-{address}:{port_str}"
+    if _is_cn(name):
+        return None
+    name = clean(name)
+    if name is None:
+        return None
+    return {
+        "type": "trojan",
+        "server": address,
+        "port": port,
+        "name": name,
+        "password": password
+    }
+
+
+def _parse_vmess(netloc, query, fragment, clean):
+    try:
+        if not netloc:
+            return None
+        encoded_json = netloc + '=' * (-len(netloc) % 4)
+        try:
+            vmess_data = json.loads(base64.b64decode(encoded_json.encode('utf-8')).decode('utf-8'))
+        except Exception as decode_error:
+            print(f"VMess base64解码失败: {encoded_json}, 错误: {str(decode_error)}")
+            return None
+
+        server = vmess_data.get('add', vmess_data.get('host', ''))
+        if not server:
+            return None
+        try:
+            port = int(vmess_data.get('port', 443))
+        except (ValueError, TypeError):
+            port = 443
+        uuid = vmess_data.get('id', '')
+        if not uuid:
+            return None
+
+        name = vmess_data.get('ps', vmess_data.get('remarks', 'VMess Node'))
+        if _is_cn(name):
+            return None
+        name = clean(name)
+        if name is None:
+            return None
+        return {
+            "type": "vmess",
+            "uuid": uuid,
+            "server": server,
+            "port": port,
+            "name": name,
+            "alterId": vmess_data.get('aid', vmess_data.get('alterId', 0)),
+            "cipher": vmess_data.get('scy', 'auto'),
+            "network": vmess_data.get('net', 'tcp'),
+            "tls": vmess_data.get('tls', False) == 'tls'
+        }
+    except Exception as vmess_error:
+        print(f"VMess解析失败, 错误: {str(vmess_error)}")
+        return None
+
+
+# 协议名 -> (解析函数, parse_uri 使用的名称清理函数)
+_DISPATCH = {
+    'vless': (_parse_vless, _clean_ad_brackets),
+    'ss': (_parse_ss, _clean_ad_brackets),
+    'trojan': (_parse_trojan, _clean_ad_words),
+    'vmess': (_parse_vmess, _clean_ad_words),
+}
+
+
+def _parse(uri, clean_names, fallback):
+    scheme, sep, rest = uri.partition('://')
+    handler = _DISPATCH.get(scheme) if sep else None
+    if handler is None or uri[0] <= ' ' or _SLOW_PATH_CHARS.search(uri):
+        return fallback(uri)  # 未知协议或需要 urlsplit 特殊处理的写法
+    netloc, query, fragment = _split(rest)
+    if not netloc.isascii():
+        return fallback(uri)  # urlsplit 会对非 ASCII 主机做 NFKC 检查
+    parser, clean = handler
+    return parser(netloc, query, fragment, clean if clean_names else _no_cleaning)
+
+
+def _fallback_clean(uri):
+    from scraper5 import parse_generic_uri
+    return parse_generic_uri(uri)
+
+
+def _fallback_raw(uri):
+    from scraper6 import parse_generic_uri
+    return parse_generic_uri(uri)
+
+
+def parse_uri(uri):
+    """解析分享链接为节点字典, 结果与 scraper5.parse_generic_uri 相同 (清理广告名称)"""
+    return _parse(uri, True, _fallback_clean)
+
+
+def parse_uri_raw(uri):
+    """同 parse_uri 但保留原始名称, 结果与 scraper6.parse_generic_uri 相同"""
+    return _parse(uri, False, _fallback_raw)
@@ -0,0 +1,143 @@
+"""解析后的节点校验: 在去重、编码、探测之前丢弃格式错误的节点
+
+紧跟在解析之后执行 (engine.decode_body), 只做预编译正则和集合查找, 不做任何网络或 DNS 请求:
+- type      协议必须是 vless / vmess / trojan / ss
+- server    主机名 (RFC 1123 标签, 允许下划线) 或合法的 IPv4 / IPv6 地址
+- port      1-65535 的整数 (YAML 中的数字字符串也接受)
+- uuid      vless / vmess 的 uuid 必须是标准 UUID 格式
+- password  trojan / ss 必须有密码
+- cipher    ss 的加密方式必须是已知算法; 解析器未拆出加密方式 ("unknown") 时先按 SIP002 解码 userinfo
+            补全 cipher 与 password, 仍无法识别才丢弃
+
+丢弃的节点按原因计数, rejections() 返回累计结果, 运行结束时打印。
+"""
+import base64
+import ipaddress
+import re
+import threading
+from collections import Counter
+
+from profiling import stage
+from uriparse import unquote
+
+_UUID_RE = re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\Z')
+_HOSTNAME_RE = re.compile(r'(?=.{1,253}\Z)(?:[A-Za-z0-9_](?:[A-Za-z0-9_-]{0,61}[A-Za-z0-9_])?\.)*'
+                          r'[A-Za-z0-9_](?:[A-Za-z0-9_-]{0,61}[A-Za-z0-9_])?\.?\Z')
+_IPV4_RE = re.compile(r'(?:(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\.){3}(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\Z')
+_NUMERIC_HOST_RE = re.compile(r'[\d.]+\Z')
+
+SS_CIPHERS = frozenset({
+    "aes-128-gcm", "aes-192-gcm", "aes-256-gcm",
+    "chacha20-ietf-poly1305", "xchacha20-ietf-poly1305", "chacha20-poly1305",
+    "2022-blake3-aes-128-gcm", "2022-blake3-aes-256-gcm", "2022-blake3-chacha20-poly1305",
+    "aes-128-cfb", "aes-192-cfb", "aes-256-cfb", "aes-128-ctr", "aes-192-ctr", "aes-256-ctr",
+    "chacha20-ietf", "xchacha20", "rc4-md5", "none",
+})
+# 各协议必须存在且非空的凭据字段
+_CREDENTIAL = {"vless": "uuid", "vmess": "uuid", "trojan": "password", "ss": "password"}
+
+_lock = threading.Lock()
+_rejections = Counter()
+
+
+def valid_host(host):
+    if not isinstance(host, str) or not host:
+        return False
+    if _NUMERIC_HOST_RE.match(host):
+        return bool(_IPV4_RE.match(host))  # 纯数字的主机名只能是 IPv4
+    if ':' in host:
+        try:
+            ipaddress.IPv6Address(host.strip('[]'))
+        except ValueError:
+            return False
+        return True
+    return bool(_HOSTNAME_RE.match(host))
+
+
+def valid_port(port):
+    if isinstance(port, bool):
+        return False
+    if isinstance(port, str):
+        if not port.isdigit():
+            return False
+        port = int(port)
+    return isinstance(port, int) and 1 <= port <= 65535
+
+
+def split_ss_userinfo(userinfo):
+    """SIP002 userinfo -> (cipher, password): 百分号编码的明文或 base64url("cipher:password") (本身也可能被百分号编码),
+    无法解析时返回 None"""
+    text = unquote(userinfo)
+    if ':' not in text:
+        encoded = text.rstrip('=')
+        try:
+            raw = base64.b64decode(encoded.replace('-', '+').replace('_', '/') + '=' * (-len(encoded) % 4))
+            text = raw.decode('utf-8')
+        except ValueError:
+            return None
+    cipher, sep, password = text.partition(':')
+    if not sep:
+        return None
+    return cipher.lower(), password
+
+
+def check(item):
+    """返回丢弃原因, 合法时返回 None; ss 节点的 cipher/password 可能被就地补全"""
+    node_type = item.get("type")
+    credential = _CREDENTIAL.get(node_type)
+    if credential is None:
+        return "type"
+    if not valid_host(item.get("server")):
+        return "server"
+    if not valid_port(item.get("port")):
+        return "port"
+    value = item.get(credential)
+    if not value or not isinstance(value, str):
+        return credential
+    if credential == "uuid" and not _UUID_RE.match(value):
+        return "uuid"
+    if node_type == "ss":
+        cipher = item.get("cipher")
+        if cipher == "unknown":
+            parts = split_ss_userinfo(value)
+            if parts is None or parts[0] not in SS_CIPHERS or not parts[1]:
+                return "cipher"
+            item["cipher"], item["password"] = parts
+        elif cipher not in SS_CIPHERS:
+            return "cipher"
+    return None
+
+
+def validate(items):
+    """丢弃格式错误的节点, 返回合法节点列表并累计丢弃原因"""
+    valid = []
+    rejected = Counter()
+    with stage("validate"):
+        for item in items:
+            reason = check(item)
+            if reason is None:
+                valid.append(item)
+            else:
+                rejected[reason] += 1
+    if rejected:
+        with _lock:
+            _rejections.update(rejected)
+    return valid
+
+
+def rejections():
+    """累计的丢弃原因 {原因: 个数}"""
+    with _lock:
+        return dict(_rejections)
+
+
+def merge(counts):
+    """并入其他进程 (分布式 worker) 的丢弃计数"""
+    if counts:
+        with _lock:
+            _rejections.update(counts)
+
+
+def reset():
+    with _lock:
+        _rejections.clear()
@@ -0,0 +1,527 @@
+"""分布式运行: SQLite 工作队列 + 协调者 / worker (getip run --workers N, getip worker)
+
+getip run 进程作为协调者, 把三类任务放进队列, 由任意多个 worker 进程领取执行, 结果写回队列后由协调者合并:
+- fetch  抓取并解析一个远程来源 (或回填中的一篇文章); 熔断器、上次成功缓存与文章索引仍只在协调者上读写,
+         worker 只做网络请求与解析, 抛出的异常由协调者的熔断器记为失败
+- parse  本地来源的一块分享链接 (PARSE_CHUNK 条); 本地文件只在协调者上可读, 由协调者经 mmap 切行后分块下发
+- probe  一批节点的 TCP 探测 (PROBE_BATCH 个); ranking 的调度不变, 只是把单个探测攒成批次交给 worker
+
+队列是 .cache/queue.sqlite3 (WAL), 同一台机器上的多个进程可以直接共享; 多台机器需要把它放在共享文件系统上
+(GETIP_QUEUE 指定路径), 并使用相同的 sources.json。worker 按租约领取任务, 进程退出或超时未完成的任务在
+租约到期后重新排队, 最多尝试 MAX_ATTEMPTS 次; worker 定期写心跳, 协调者发现长时间没有在线 worker 时放弃等待。
+每个 worker 一次只执行一个任务, 吞吐随 worker 数近似线性增长 (见 bench/bench_workqueue.py)。
+每个 worker 有自己的每主机限速器, 速率与并发上限按协调者下发的在线 worker 数缩小, 同一站点承受的总压力
+与单进程运行相同: 吞吐的提升来自不同主机并行, 而不是对同一主机加倍请求。
+
+    python workqueue.py [--queue PATH] [--id NAME] [--idle-exit SECONDS]   (即 getip worker)
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from functools import partial
+from pathlib import Path
+
+from breaker import CACHE_DIR
+from budget import BudgetExhausted, current_budget
+
+QUEUE_FILE = Path(os.environ.get("GETIP_QUEUE", CACHE_DIR / "queue.sqlite3"))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# 默认租约(秒); fetch 任务的租约按预算剩余时间计算
+LEASE_SECONDS = 60
+MAX_ATTEMPTS = 3
+PARSE_CHUNK = 5000
+PROBE_BATCH = 16
+# 探测凑批的最长等待(秒), 不足一批时到时即发出
+PROBE_LINGER = 0.02
+# 协调者等待结果、worker 空闲时的轮询间隔(秒), worker 空闲时逐步放慢到 IDLE_POLL_INTERVAL
+POLL_INTERVAL = 0.02
+IDLE_POLL_INTERVAL = 0.2
+HEARTBEAT_INTERVAL = 5
+# 超过该时间没有心跳的 worker 视为离线
+WORKER_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    run TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    lease REAL NOT NULL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    leased_until REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks(state, id);
+CREATE INDEX IF NOT EXISTS tasks_run ON tasks(run);
+
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    seen REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class WorkQueue:
+    """基于 SQLite 的任务队列, 同一连接可在多个线程中使用"""
+
+    def __init__(self, path=QUEUE_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # isolation_level=None: 自动提交, 需要原子性的地方显式 BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def submit_many(self, run, kind, payloads, lease=LEASE_SECONDS):
+        """批量入队, 返回任务 id 列表 (与 payloads 顺序一致)"""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                ids = [self.conn.execute("INSERT INTO tasks (run, kind, payload, lease) VALUES (?, ?, ?, ?)",
+                                         (run, kind, json.dumps(payload, ensure_ascii=False), lease)).lastrowid
+                       for payload in payloads]
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+        return ids
+
+    def claim(self, worker):
+        """领取最早的待执行任务 (含租约已过期的), 返回 (id, kind, payload) 或 None"""
+        now = time.time()
+        with self._lock:
+            # 先用只读查询确认有任务可领, 空闲 worker 的轮询不去争抢写锁
+            if self.conn.execute(
+                    "SELECT 1 FROM tasks WHERE state = ? OR (state = ? AND leased_until < ?) LIMIT 1",
+                    (PENDING, RUNNING, now)).fetchone() is None:
+                return None
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    "UPDATE tasks SET state = ?, error = '租约到期且重试次数用尽' "
+                    "WHERE state = ? AND leased_until < ? AND attempts >= ?",
+                    (FAILED, RUNNING, now, MAX_ATTEMPTS))
+                row = self.conn.execute(
+                    "SELECT id, kind, payload, lease FROM tasks "
+                    "WHERE state = ? OR (state = ? AND leased_until < ?) ORDER BY id LIMIT 1",
+                    (PENDING, RUNNING, now)).fetchone()
+                if row is not None:
+                    self.conn.execute(
+                        "UPDATE tasks SET state = ?, worker = ?, attempts = attempts + 1, leased_until = ? WHERE id = ?",
+                        (RUNNING, worker, now + row[3], row[0]))
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+        return None if row is None else (row[0], row[1], json.loads(row[2]))
+
+    def _finish(self, task_id, worker, state, result=None, error=None):
+        # 租约到期后任务可能已被其他 worker 领走, 只接受当前持有者的结果
+        with self._lock:
+            self.conn.execute(
+                "UPDATE tasks SET state = ?, result = ?, error = ?, leased_until = NULL "
+                "WHERE id = ? AND worker = ? AND state = ?",
+                (state, result, error, task_id, worker, RUNNING))
+
+    def complete(self, task_id, worker, result):
+        self._finish(task_id, worker, DONE, result=json.dumps(result, ensure_ascii=False))
+
+    def fail(self, task_id, worker, error):
+        self._finish(task_id, worker, FAILED, error=error)
+
+    def finished(self, ids):
+        """已结束的任务 {id: (状态, 结果, 错误)}, 未结束的不出现在结果中"""
+        found = {}
+        ids = list(ids)
+        with self._lock:
+            for start in range(0, len(ids), 500):  # SQLite 单条语句的参数个数有限
+                chunk = ids[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT id, state, result, error FROM tasks WHERE state IN (?, ?) "
+                    f"AND id IN ({','.join('?' * len(chunk))})", (DONE, FAILED, *chunk))
+                for task_id, state, result, error in rows:
+                    found[task_id] = (state, json.loads(result) if result is not None else None, error)
+        return found
+
+    def heartbeat(self, worker):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO workers (id, seen) VALUES (?, ?)", (worker, time.time()))
+
+    def retire(self, worker):
+        with self._lock:
+            self.conn.execute("DELETE FROM workers WHERE id = ?", (worker,))
+
+    def live_workers(self, window=WORKER_TIMEOUT):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM workers WHERE seen >= ?",
+                                     (time.time() - window,)).fetchone()[0]
+
+    def purge(self, run):
+        """删除一次运行的全部任务"""
+        with self._lock:
+            self.conn.execute("DELETE FROM tasks WHERE run = ?", (run,))
+
+
+# ---- worker 端 ----
+
+_session = None
+_session_share = None
+_loop = None
+
+
+def _worker_session(share=1):
+    """worker 进程的会话; 限速器按在线 worker 数 share 缩小 (HostLimiter.scaled),
+    所有 worker 对同一主机的总速率与并发上限与单进程运行时相同, 不会随 worker 数成倍增加"""
+    global _session, _session_share
+    if _session is None:
+        from politeness import create_session
+        _session = create_session()
+    if share != _session_share:
+        from politeness import get_limiter
+        _session.limiter = get_limiter().scaled(share)
+        _session_share = share
+    return _session
+
+
+def warm_up():
+    """上线前导入任务要用的模块并建好会话, 第一个任务不必承担导入耗时"""
+    import engine, ranking, sources, uriparse, validation  # noqa: F401
+    _worker_session()
+
+
+def handle_fetch(payload):
+    """抓取一个来源, 返回节点与校验丢弃计数 (由协调者合并)"""
+    from budget import Budget, use_budget
+    from sources import SOURCES
+    import validation
+
+    spec = SOURCES[payload["source"]]
+    validation.reset()
+    with use_budget(Budget(payload["budget"], name=f"run/{spec.name}")):
+        session = _worker_session(payload.get("workers", 1))
+        items = spec.load("fetch")(session, payload["date_suffix"], article_url=payload.get("article_url"))
+    return {"items": items, "rejected": validation.rejections()}
+
+
+def handle_parse(payload):
+    """解析一块分享链接, 校验由协调者统一进行"""
+    import importlib
+    module, _, func = payload["parser"].partition(":")
+    parser = getattr(importlib.import_module(module), func)
+    return [item for item in map(parser, payload["links"]) if item]
+
+
+def handle_probe(payload):
+    """并发探测一批 (server, port), 返回对应的延迟毫秒或 None"""
+    global _loop
+    from ranking import tcp_probe
+
+    async def probe_all():
+        return await asyncio.gather(*(tcp_probe({"server": server, "port": port}, payload["timeout"])
+                                      for server, port in payload["targets"]))
+    # 事件循环在批次之间复用: asyncio.run 退出时会等待超时后仍卡在 getaddrinfo 的解析线程, 拖慢每一批
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(probe_all())
+
+
+HANDLERS = {"fetch": handle_fetch, "parse": handle_parse, "probe": handle_probe}
+
+
+def serve(queue, worker=None, idle_exit=None):
+    """worker 主循环: 领取任务并执行, 空闲超过 idle_exit 秒时退出; 返回完成的任务数"""
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    stopped = threading.Event()
+
+    def beat():
+        # 单独的线程写心跳, 长时间的抓取任务期间 worker 也保持在线
+        while not stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                queue.heartbeat(worker)
+            except sqlite3.Error as e:
+                print(f"worker 心跳失败: {e}")
+
+    queue.heartbeat(worker)
+    threading.Thread(target=beat, name="heartbeat", daemon=True).start()
+    print(f"worker {worker} 已启动, 队列: {queue.path}")
+    completed = 0
+    delay = POLL_INTERVAL
+    idle_since = time.monotonic()
+    try:
+        while True:
+            task = queue.claim(worker)
+            if task is None:
+                if idle_exit is not None and time.monotonic() - idle_since >= idle_exit:
+                    break
+                time.sleep(delay)
+                delay = min(IDLE_POLL_INTERVAL, delay * 2)
+                continue
+            task_id, kind, payload = task
+            try:
+                result = HANDLERS[kind](payload)
+            except Exception as e:
+                queue.fail(task_id, worker, f"{type(e).__name__}: {e}")
+            else:
+                queue.complete(task_id, worker, result)
+            completed += 1
+            delay = POLL_INTERVAL
+            idle_since = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stopped.set()
+        queue.retire(worker)
+    print(f"worker {worker} 退出, 共完成 {completed} 个任务")
+    return completed
+
+
+# ---- 协调者端 ----
+
+def _chunks(iterable, size):
+    chunk = []
+    for value in iterable:
+        chunk.append(value)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Coordinator:
+    """把抓取、解析、探测放进队列并等待结果; pipeline / backfill / ranking 在分布式模式下通过它替换本地执行
+
+    所有等待中的任务由一个轮询线程统一查询, 任务结束时回调对应的等待者, 等待的任务再多也只有一处在轮询队列。
+    """
+
+    def __init__(self, queue=None, run=None):
+        self.queue = queue if queue is not None else WorkQueue()
+        self.run = run or uuid.uuid4().hex
+        self._workers = []
+        self._lock = threading.Lock()
+        self._callbacks = {}  # 任务 id -> callback(任务 id, 状态, 结果, 错误)
+        self._poller = None
+
+    def spawn(self, count):
+        """在本机启动 count 个 worker 子进程, 运行结束时由 close() 终止"""
+        for _ in range(count):
+            self._workers.append(subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--queue", str(self.queue.path)]))
+        if not count and not self.queue.live_workers():
+            print("队列上没有在线的 worker, 等待 worker 加入 (getip worker)")
+
+    def close(self):
+        for process in self._workers:
+            process.terminate()
+        for process in self._workers:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self._workers = []
+        with self._lock:
+            self._callbacks.clear()
+            # 轮询线程发现没有回调时会把 self._poller 置为 None, 先在锁内取出再等待它退出
+            poller = self._poller
+        if poller is not None:
+            poller.join()
+        try:
+            self.queue.purge(self.run)
+        finally:
+            self.queue.close()
+
+    def watch(self, ids, callback):
+        """任务结束 (或长时间没有在线 worker) 时在轮询线程中调用 callback(任务 id, 状态, 结果, 错误)"""
+        with self._lock:
+            for task_id in ids:
+                self._callbacks[task_id] = callback
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll, name="queue-poller", daemon=True)
+                self._poller.start()
+
+    def unwatch(self, ids):
+        with self._lock:
+            for task_id in ids:
+                self._callbacks.pop(task_id, None)
+
+    def _poll(self):
+        checked = seen_worker = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._callbacks:
+                    self._poller = None
+                    return
+                ids = list(self._callbacks)
+            finished = self.queue.finished(ids)
+            now = time.monotonic()
+            if now - checked >= 1:
+                checked = now
+                if self.queue.live_workers():
+                    seen_worker = now
+                elif now - seen_worker > WORKER_TIMEOUT:
+                    error = f"超过 {WORKER_TIMEOUT} 秒没有在线的 worker"
+                    finished.update((task_id, (FAILED, None, error)) for task_id in ids if task_id not in finished)
+            with self._lock:
+                ready = [(self._callbacks.pop(task_id), task_id, outcome)
+                         for task_id, outcome in finished.items() if task_id in self._callbacks]
+            for callback, task_id, outcome in ready:
+                callback(task_id, *outcome)
+            time.sleep(POLL_INTERVAL)
+
+    def map(self, kind, payloads, timeout=None, lease=LEASE_SECONDS):
+        """提交一组任务并等待全部完成, 按提交顺序返回结果; 任一任务失败时抛出 RuntimeError"""
+        ids = self.queue.submit_many(self.run, kind, payloads, lease)
+        if not ids:
+            return []
+        outcomes = {}
+        finished = threading.Event()
+
+        def done(task_id, state, result, error):
+            outcomes[task_id] = (state, result, error)
+            if len(outcomes) == len(ids):
+                finished.set()
+
+        self.watch(ids, done)
+        if not finished.wait(timeout):
+            self.unwatch(ids)
+            raise BudgetExhausted(f"等待 {len(ids) - len(outcomes)} 个 {kind} 任务超时")
+        ordered = []
+        for task_id in ids:
+            state, result, error = outcomes[task_id]
+            if state == FAILED:
+                raise RuntimeError(f"{kind} 任务失败: {error}")
+            ordered.append(result)
+        return ordered
+
+    def fetcher(self, spec):
+        """返回与来源 fetch 签名相同的函数, 供 pipeline.fetch_source 替换本地抓取"""
+        if spec.declarative:
+            from engine import definitions, fetch
+            source = definitions()[spec.name]
+            if source.paths is not None:
+                # 本地文件在协调者上读取, 只把解析分块交给 worker
+                return partial(fetch, spec.name, parse_links=partial(self.parse_links, source.parser_ref))
+        return partial(self._fetch_remote, spec.name)
+
+    def _fetch_remote(self, name, session, date_suffix, article_url=None):
+        import validation
+        budget = current_budget()
+        remaining = budget.remaining() if budget is not None else LEASE_SECONDS
+        # 在线 worker 数随任务下发, 各 worker 据此缩小自己的每主机速率
+        payload = {"source": name, "date_suffix": date_suffix, "article_url": article_url, "budget": remaining,
+                   "workers": max(1, self.queue.live_workers())}
+        [result] = self.map("fetch", [payload], timeout=remaining, lease=remaining + LEASE_SECONDS)
+        validation.merge(result["rejected"])
+        return result["items"]
+
+    def parse_links(self, parser_ref, links):
+        """分享链接按 PARSE_CHUNK 条分块交给 worker 解析, 按原顺序合并"""
+        budget = current_budget()
+        payloads = [{"parser": parser_ref, "links": chunk} for chunk in _chunks(links, PARSE_CHUNK)]
+        results = self.map("parse", payloads, timeout=budget.remaining() if budget is not None else None)
+        return [item for chunk in results for item in chunk]
+
+    def prober(self):
+        return QueueProber(self)
+
+    def probe_concurrency(self):
+        """每个 worker 同时有一批在执行、一批在排队"""
+        return max(1, self.queue.live_workers()) * PROBE_BATCH * 2
+
+
+class QueueProber:
+    """ranking.select_best 的 prober: 把单个探测攒成批次放进队列, 批次结果回来后唤醒对应的协程"""
+
+    def __init__(self, coordinator, batch_size=PROBE_BATCH, linger=PROBE_LINGER):
+        from ranking import PROBE_TIMEOUT
+        self.coordinator = coordinator
+        self.batch_size = batch_size
+        self.linger = linger
+        self.timeout = PROBE_TIMEOUT
+        self._batch = []  # (节点, future)
+        self._timer = None
+
+    async def __call__(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._batch.append((item, future))
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.linger, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = [(item, future) for item, future in self._batch if not future.done()]
+        self._batch = []
+        if not batch:
+            return
+        loop = asyncio.get_running_loop()
+        futures = [future for _, future in batch]
+        payload = {"targets": [[item.get("server"), item.get("port")] for item, _ in batch], "timeout": self.timeout}
+        # worker 卡住时租约到期后由其他 worker 重试, 不必等满默认租约
+        [task_id] = self.coordinator.queue.submit_many(self.coordinator.run, "probe", [payload],
+                                                       lease=self.timeout * 3)
+
+        def done(_, state, result, error):
+            latencies = result if state == DONE else [None] * len(futures)
+            try:
+                loop.call_soon_threadsafe(self._resolve, futures, latencies)
+            except RuntimeError:
+                pass  # 排名已经结束, 事件循环已关闭
+
+        self.coordinator.watch([task_id], done)
+
+    @staticmethod
+    def _resolve(futures, latencies):
+        for future, latency in zip(futures, latencies):
+            if not future.done():
+                future.set_result(latency)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从工作队列领取并执行抓取/解析/探测任务")
+    parser.add_argument("--queue", default=str(QUEUE_FILE), help="队列数据库路径 (多台机器时放在共享文件系统上)")
+    parser.add_argument("--id", default=None, help="worker 标识, 默认 主机名:进程号")
+    parser.add_argument("--idle-exit", type=float, default=None, metavar="SECONDS", help="空闲超过该秒数后退出")
+    args = parser.parse_args(argv)
+
+    # 协调者结束时用 SIGTERM 终止本机 worker, 按 Ctrl-C 处理以便注销心跳
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    warm_up()
+    queue = WorkQueue(args.queue)
+    try:
+        serve(queue, args.id, args.idle_exit)
+    finally:
+        queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())